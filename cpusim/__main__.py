@@ -18,11 +18,15 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import argparse
+import sys
 import typing as t
 
 from cpusim.common import parser
 from cpusim.frontend import cli
 from cpusim.frontend import gui
+from cpusim.frontend.cli import analyze
+from cpusim.frontend.cli import compiler
+from cpusim.frontend.cli import dump
 from cpusim.frontend.cli.interactive import converters
 
 root_parser = argparse.ArgumentParser()
@@ -40,6 +44,40 @@ root_parser.add_argument(
     type=converters.number_string_to_int,
     help="memory address to map the bug trap hardware GPIO port to - defaults to 0xFC",
 )
+root_parser.add_argument(
+    "--record-inputs",
+    action="store",
+    default=None,
+    metavar="PATH",
+    dest="record_inputs",
+    help="log every value read from the GPIO devices to a binary file that --replay-inputs can replay",
+)
+root_parser.add_argument(
+    "--enable-timer",
+    action="store_true",
+    dest="enable_timer",
+    help="enable the programmable timer on the second GPIO port (mapped 2 words after the bug trap)",
+)
+root_parser.add_argument(
+    "--timing", action="store_true", help="count clock cycles with the timing model - see --cycle-costs"
+)
+root_parser.add_argument(
+    "--cycle-costs",
+    action="store",
+    default=None,
+    metavar="FILE",
+    dest="cycle_costs",
+    help="JSON file of the clock cycles each instruction takes, for the timing model - implies --timing",
+)
+
+root_parser.add_argument(
+    "--cache-dir",
+    action="store",
+    default=None,
+    metavar="PATH",
+    dest="cache_dir",
+    help="the directory compiled programs are cached in - defaults to $CPUSIM_CACHE_DIR, or ~/.cache/cpusim",
+)
 
 cli_parser = root_subparsers.add_parser("cli", help="simulate a .dat file in CLI mode")
 cli_parser.add_argument(
@@ -61,6 +99,207 @@ grp.add_argument(
     action="store_true",
     help="run in interactive mode - you will be able to run debug commands and step through instructions one-by-one",
 )
+grp.add_argument(
+    "--script",
+    action="store",
+    metavar="FILE",
+    default=None,
+    help="run the interactive debugger commands in FILE ('-' for stdin) without prompting. exits with a "
+    "non-zero status if any 'assert' command fails",
+)
+
+cli_parser.add_argument(
+    "--progress",
+    action="store",
+    type=float,
+    default=None,
+    metavar="SECONDS",
+    help="print the execution rate and program counter to stderr every SECONDS seconds during long runs",
+)
+cli_parser.add_argument(
+    "--check-interval",
+    action="store",
+    type=int,
+    default=1000,
+    metavar="N",
+    dest="check_interval",
+    help="how many instructions to run between checks for Ctrl-C and progress reports - defaults to 1000",
+)
+cli_parser.add_argument(
+    "--dump-format",
+    action="store",
+    choices=dump.DUMP_FORMATS,
+    default="text",
+    dest="dump_format",
+    help="the format to dump the final processor state in - 'bin' writes the raw memory image as big-endian "
+    "16 bit words. defaults to 'text'",
+)
+cli_parser.add_argument(
+    "--dump-file",
+    action="store",
+    default=None,
+    metavar="PATH",
+    dest="dump_file",
+    help="the file to dump the final processor state to - defaults to stdout",
+)
+cli_parser.add_argument(
+    "--fast-forward-idle",
+    action="store_true",
+    dest="fast_forward_idle",
+    help="skip over loops that only poll inputs, jumping straight to the next scheduled input change or event",
+)
+cli_parser.add_argument(
+    "--accelerate-loops",
+    action="store_true",
+    dest="accelerate_loops",
+    help="compute counted loops of register-only arithmetic directly instead of interpreting every iteration",
+)
+cli_parser.add_argument(
+    "--predecode",
+    action="store_true",
+    dest="predecode",
+    help="run from a cache of decoded instructions, dispatching common instruction sequences as one",
+)
+cli_parser.add_argument(
+    "--jit",
+    action="store_true",
+    dest="jit",
+    help="compile the paths taken around hot loops into Python functions and run those instead",
+)
+cli_parser.add_argument(
+    "--aot",
+    action="store_true",
+    dest="aot",
+    help="run from the ahead-of-time compiled program, compiling it into the cache first if it is not there",
+)
+cli_parser.add_argument(
+    "--xops",
+    action="store",
+    default=None,
+    metavar="FILE",
+    dest="xops",
+    help="Python file defining register_xops(cpu), which binds user-defined instructions to the XOP slots "
+    "(--arch 1d only)",
+)
+cli_parser.add_argument(
+    "--detect-repetition",
+    nargs="?",
+    const=1000,
+    default=None,
+    type=int,
+    metavar="N",
+    dest="detect_repetition",
+    help="stop with a proven infinite loop if the full machine state ever repeats, checking every N "
+    "instructions - defaults to 1000",
+)
+cli_parser.add_argument(
+    "--replay-inputs",
+    action="store",
+    default=None,
+    metavar="PATH",
+    dest="replay_inputs",
+    help="replay GPIO reads from a log written by --record-inputs instead of simulating the devices",
+)
+cli_parser.add_argument(
+    "--stimulus",
+    action="store",
+    default=None,
+    metavar="FILE",
+    dest="stimulus",
+    help="file of timed GPIO device input changes ('CYCLE DEVICE.FIELD VALUE' per line) to apply during the run",
+)
+cli_parser.add_argument(
+    "--output-trace",
+    action="store",
+    default=None,
+    metavar="PATH",
+    dest="output_trace",
+    help="the file to write the time series of GPIO device output changes to - defaults to the log",
+)
+cli_parser.add_argument(
+    "--pipeline",
+    action="store_true",
+    help="estimate the stalls the program would incur on a four stage pipeline - see --forwarding",
+)
+cli_parser.add_argument(
+    "--forwarding",
+    action="store_true",
+    help="forward results between pipeline stages in the pipeline model - implies --pipeline",
+)
+cli_parser.add_argument(
+    "--icache",
+    action="store",
+    default=None,
+    metavar="SPEC",
+    help="simulate an instruction cache of SIZE[,LINE_SIZE[,ASSOCIATIVITY[,POLICY]]] words - for example 64,4,2,lru",
+)
+cli_parser.add_argument(
+    "--dcache",
+    action="store",
+    default=None,
+    metavar="SPEC",
+    help="simulate a data cache, given in the same form as --icache",
+)
+cli_parser.add_argument(
+    "--branch-stats",
+    action="store_true",
+    dest="branch_stats",
+    help="count how often each conditional jump is taken, and how well simple predictors would do",
+)
+cli_parser.add_argument(
+    "--branch-history",
+    action="store",
+    type=int,
+    default=None,
+    metavar="N",
+    dest="branch_history",
+    help="outcomes of recent branches kept by the gshare predictor (default 8) - implies --branch-stats",
+)
+cli_parser.add_argument(
+    "--profile-accesses",
+    action="store_true",
+    dest="profile_accesses",
+    help="count the reads and writes made to each data address, and find instructions that stride through memory",
+)
+
+analyze_parser = root_subparsers.add_parser("analyze", help="statically analyse the control flow of a .dat file")
+analyze_parser.add_argument(
+    "--arch",
+    "-a",
+    action="store",
+    choices=["1a", "1d"],
+    help="the SimpleCPU architecture version to use - defaults to '1a'",
+    default="1a",
+)
+analyze_parser.add_argument(
+    "--format",
+    action="store",
+    choices=analyze.ANALYSIS_FORMATS,
+    default="text",
+    dest="analysis_format",
+    help="the format to write the control-flow graph in - defaults to 'text'",
+)
+analyze_parser.add_argument(
+    "--output",
+    "-o",
+    action="store",
+    default=None,
+    metavar="PATH",
+    dest="analysis_output",
+    help="the file to write the analysis to - defaults to stdout",
+)
+
+compile_parser = root_subparsers.add_parser(
+    "compile", help="compile a .dat file ahead of time into a cached Python module, and print its path"
+)
+compile_parser.add_argument(
+    "--arch",
+    "-a",
+    action="store",
+    choices=["1a", "1d"],
+    help="the SimpleCPU architecture version to use - defaults to '1a'",
+    default="1a",
+)
 
 gui_parser = root_subparsers.add_parser("gui", help="simulate a .dat file in GUI mode")
 gui_parser.add_argument(
@@ -84,12 +323,41 @@ gui_parser.add_argument(
 
 class CliArguments(argparse.Namespace):
     file: str
-    command: t.Literal["cli", "gui"]
+    command: t.Literal["cli", "analyze", "compile", "gui"]
     arch: t.Literal["1a", "1d"] | None
     steps: int | None
     interactive: bool
+    script: str | None
     enable_bug_trap: bool
     bug_trap_address: int
+    enable_timer: bool
+    record_inputs: str | None
+    progress: float | None
+    check_interval: int
+    dump_format: t.Literal["text", "json", "csv", "bin"]
+    dump_file: str | None
+    stimulus: str | None
+    output_trace: str | None
+    replay_inputs: str | None
+    fast_forward_idle: bool
+    accelerate_loops: bool
+    predecode: bool
+    jit: bool
+    aot: bool
+    cache_dir: str | None
+    timing: bool
+    cycle_costs: str | None
+    pipeline: bool
+    forwarding: bool
+    icache: str | None
+    dcache: str | None
+    branch_stats: bool
+    branch_history: int | None
+    profile_accesses: bool
+    xops: str | None
+    detect_repetition: int | None
+    analysis_format: t.Literal["text", "dot", "json"]
+    analysis_output: str | None
 
 
 args = root_parser.parse_args(namespace=CliArguments())
@@ -99,6 +367,10 @@ with open(file) as f:
     machine_code = parser.parse_dat_file(f.read())
 
 if args.command == "cli":
-    cli.run_cli(args, machine_code)
+    sys.exit(cli.run_cli(args, machine_code))
+elif args.command == "analyze":
+    sys.exit(analyze.run_analyze(args, machine_code))
+elif args.command == "compile":
+    sys.exit(compiler.run_compile(args, machine_code))
 else:
     gui.run_gui(args, machine_code)
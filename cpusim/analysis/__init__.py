@@ -0,0 +1,38 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Static analysis of programs loaded into a simulated CPU's memory."""
+
+from cpusim.analysis.cfg import *
+from cpusim.analysis.flags import *
+
+__all__ = [
+    "JUMP_CONDITIONS",
+    "BasicBlock",
+    "ControlFlowGraph",
+    "Flag",
+    "Loop",
+    "WordKind",
+    "build_cfg",
+    "clear_cache",
+    "dead_flag_writes",
+    "flag_effects",
+    "flag_liveness",
+    "image_hash",
+]
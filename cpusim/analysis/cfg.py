@@ -0,0 +1,406 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+import bisect
+import collections
+import contextlib
+import dataclasses
+import enum
+import hashlib
+import json
+import typing as t
+
+from cpusim.common.instructions import base
+from cpusim.common.instructions.v1a import primary as primary_1a
+from cpusim.common.instructions.v1d import primary as primary_1d
+from cpusim.common.instructions.v1d import secondary as secondary_1d
+
+if t.TYPE_CHECKING:
+    from cpusim.backend import simulators
+
+__all__ = [
+    "JUMP_CONDITIONS",
+    "BasicBlock",
+    "ControlFlowGraph",
+    "Loop",
+    "WordKind",
+    "build_cfg",
+    "clear_cache",
+    "image_hash",
+]
+
+JUMP_CONDITIONS: dict[type[object], t.Callable[[bool, bool], bool]] = {
+    primary_1a.JumpU: lambda zero, carry: True,
+    primary_1a.JumpZ: lambda zero, carry: zero,
+    primary_1a.JumpNZ: lambda zero, carry: not zero,
+    primary_1d.JumpU: lambda zero, carry: True,
+    primary_1d.JumpZ: lambda zero, carry: zero,
+    primary_1d.JumpNZ: lambda zero, carry: not zero,
+    primary_1d.JumpC: lambda zero, carry: carry,
+}
+"""Whether each jump instruction is taken, given the (zero, carry) flags."""
+
+_UNCONDITIONAL_JUMPS = (primary_1a.JumpU, primary_1d.JumpU)
+# number of graphs kept by the in-process build_cfg cache
+_CACHE_SIZE = 16
+
+
+class WordKind(enum.Enum):
+    CODE = "code"
+    """Reachable from the entry point."""
+    DATA = "data"
+    """Read or written by a reachable instruction, or not a valid instruction."""
+    UNREACHABLE = "unreachable"
+    """A valid, non-zero instruction that can never be executed."""
+    EMPTY = "empty"
+    """An unreferenced zero word."""
+    MAPPED = "mapped"
+    """A mem-mapped device address."""
+
+
+@dataclasses.dataclass(slots=True)
+class BasicBlock:
+    start: int
+    end: int  # exclusive
+    successors: list[int] = dataclasses.field(default_factory=list[int])
+    predecessors: list[int] = dataclasses.field(default_factory=list[int])
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    @property
+    def last(self) -> int:
+        return self.end - 1
+
+
+@dataclasses.dataclass(slots=True)
+class Loop:
+    head: int
+    # blocks with a back edge to the head
+    latches: list[int]
+    # start address of every block in the loop, including the head
+    body: frozenset[int]
+
+
+class ControlFlowGraph:
+    """
+    Control-flow graph of a memory image, split into basic blocks. Blocks are keyed by their start address.
+
+    Analysis is purely static, so computed jumps (there are none in v1a/v1d) and returns cannot be followed -
+    a ``ret`` ends a block with no successors.
+    """
+
+    __slots__ = (
+        "_block_starts",
+        "blocks",
+        "data_references",
+        "disassembly",
+        "entry",
+        "idom",
+        "image_hash",
+        "loops",
+        "word_kinds",
+    )
+
+    def __init__(
+        self,
+        entry: int,
+        blocks: dict[int, BasicBlock],
+        word_kinds: list[WordKind],
+        data_references: set[int],
+        disassembly: dict[int, str],
+        image_hash: str,
+    ) -> None:
+        self.entry = entry
+        self.blocks = blocks
+        self.word_kinds = word_kinds
+        self.data_references = data_references
+        self.disassembly = disassembly
+        self.image_hash = image_hash
+
+        self._block_starts = sorted(blocks)
+        # immediate dominator of each block - the entry block is its own
+        self.idom = self._compute_dominators()
+        self.loops = self._find_loops()
+
+    def __repr__(self) -> str:
+        return f"ControlFlowGraph({len(self.blocks)} blocks, {len(self.loops)} loops)"
+
+    def block_at(self, address: int) -> BasicBlock | None:
+        # the block containing the given address, if it is reachable code
+        idx = bisect.bisect_right(self._block_starts, address) - 1
+        if idx >= 0 and address < (block := self.blocks[self._block_starts[idx]]).end:
+            return block
+        return None
+
+    def _reverse_postorder(self) -> list[int]:
+        order: list[int] = []
+        visited: set[int] = {self.entry}
+        stack: list[tuple[int, t.Iterator[int]]] = [(self.entry, iter(self.blocks[self.entry].successors))]
+        while stack:
+            node, children = stack[-1]
+            if (child := next(children, None)) is None:
+                stack.pop()
+                order.append(node)
+            elif child not in visited:
+                visited.add(child)
+                stack.append((child, iter(self.blocks[child].successors)))
+
+        order.reverse()
+        return order
+
+    def _compute_dominators(self) -> dict[int, int]:
+        # Cooper, Harvey & Kennedy - "A Simple, Fast Dominance Algorithm"
+        if self.entry not in self.blocks:
+            return {}
+
+        order = self._reverse_postorder()
+        index = {node: i for i, node in enumerate(order)}
+        idom: dict[int, int] = {self.entry: self.entry}
+
+        def intersect(a: int, b: int) -> int:
+            while a != b:
+                while index[a] > index[b]:
+                    a = idom[a]
+                while index[b] > index[a]:
+                    b = idom[b]
+            return a
+
+        changed = True
+        while changed:
+            changed = False
+            for node in order[1:]:
+                preds = [p for p in self.blocks[node].predecessors if p in idom]
+                new_idom = preds[0]
+                for pred in preds[1:]:
+                    new_idom = intersect(pred, new_idom)
+                if idom.get(node) != new_idom:
+                    idom[node] = new_idom
+                    changed = True
+
+        return idom
+
+    def dominates(self, a: int, b: int) -> bool:
+        # whether block a dominates block b
+        if b not in self.idom:
+            return False
+
+        while True:
+            if a == b:
+                return True
+            if (b := self.idom[b]) == self.entry:
+                return a == self.entry
+
+    def _find_loops(self) -> list[Loop]:
+        latches: dict[int, list[int]] = collections.defaultdict(list)
+        for start, block in self.blocks.items():
+            for succ in block.successors:
+                if self.dominates(succ, start):
+                    latches[succ].append(start)
+
+        loops: list[Loop] = []
+        for head, sources in sorted(latches.items()):
+            # natural loop - the head plus everything that reaches a latch without passing through the head
+            body = {head}
+            stack = [s for s in sources if s != head]
+            while stack:
+                node = stack.pop()
+                if node not in body:
+                    body.add(node)
+                    stack.extend(self.blocks[node].predecessors)
+            loops.append(Loop(head, sorted(sources), frozenset(body)))
+
+        return loops
+
+    def unreachable_ranges(self) -> list[tuple[int, int]]:
+        # (start, end exclusive) runs of unreachable instructions
+        ranges: list[tuple[int, int]] = []
+        for address, kind in enumerate(self.word_kinds):
+            if kind is not WordKind.UNREACHABLE:
+                continue
+            if ranges and ranges[-1][1] == address:
+                ranges[-1] = (ranges[-1][0], address + 1)
+            else:
+                ranges.append((address, address + 1))
+        return ranges
+
+    def to_dict(self) -> dict[str, t.Any]:
+        return {
+            "image_hash": self.image_hash,
+            "entry": self.entry,
+            "blocks": [
+                {
+                    "start": block.start,
+                    "end": block.end,
+                    "successors": block.successors,
+                    "predecessors": block.predecessors,
+                    "idom": self.idom.get(start),
+                    "instructions": [self.disassembly[a] for a in range(block.start, block.end)],
+                }
+                for start, block in sorted(self.blocks.items())
+            ],
+            "loops": [{"head": loop.head, "latches": loop.latches, "body": sorted(loop.body)} for loop in self.loops],
+            "data": sorted(a for a, kind in enumerate(self.word_kinds) if kind is WordKind.DATA),
+            "unreachable": [list(r) for r in self.unreachable_ranges()],
+        }
+
+    def to_json(self, indent: int | None = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_dot(self) -> str:
+        loop_heads = {loop.head for loop in self.loops}
+        back_edges = {(latch, loop.head) for loop in self.loops for latch in loop.latches}
+
+        lines = ["digraph cfg {", '    node [shape=box, fontname="monospace"];']
+        for start, block in sorted(self.blocks.items()):
+            body = "\\l".join(f"{hex(a)}: {self.disassembly[a]}" for a in range(block.start, block.end))
+            style = ", style=bold" if start in loop_heads else ""
+            lines.append(f'    b{start} [label="{body}\\l"{style}];')
+        for start, block in sorted(self.blocks.items()):
+            for succ in block.successors:
+                style = " [style=dashed]" if (start, succ) in back_edges else ""
+                lines.append(f"    b{start} -> b{succ}{style};")
+        lines.append("}")
+        return "\n".join(lines)
+
+
+def image_hash(cpu: simulators.CPU[t.Any]) -> str:
+    """Digest of everything the CFG depends on - the architecture, the memory image and the mapped addresses."""
+    memory = cpu.memory
+    digest = hashlib.blake2b(type(cpu).__name__.encode(), digest_size=16)
+    words = bytearray()
+    for address in range(memory.size):
+        # mapped addresses hash as a value no 16-bit word can have
+        words += (
+            b"\xff\xff\xff"
+            if memory.is_mapped(address)
+            else b"\x00" + memory.get(address).unsigned_value.to_bytes(2, "big")
+        )
+    digest.update(words)
+    return digest.hexdigest()
+
+
+_cache: collections.OrderedDict[tuple[str, int], ControlFlowGraph] = collections.OrderedDict()
+
+
+def clear_cache() -> None:
+    _cache.clear()
+
+
+def _successors(instruction: base.Instruction[t.Any], args: tuple[int, ...], address: int) -> tuple[list[int], bool]:
+    # (successor addresses, whether the instruction ends a basic block)
+    if instruction.addressing_mode is not base.AddressingMode.DIRECT:
+        return [address + 1], False
+
+    kind: type[object] = type(instruction)
+    if kind in _UNCONDITIONAL_JUMPS:
+        return [args[0]], True
+    if kind in JUMP_CONDITIONS or kind is primary_1d.Call:
+        return [args[0], address + 1], True
+    if kind is secondary_1d.Ret:
+        return [], True
+    return [address + 1], False
+
+
+def build_cfg(cpu: simulators.CPU[t.Any], entry: int = 0) -> ControlFlowGraph:
+    """
+    Build the control-flow graph of the CPU's current memory image, starting from ``entry``.
+
+    Graphs are cached by :func:`image_hash` for the lifetime of the process, so analysing an unchanged image
+    again is cheap. The cache is not persisted between processes - a build is only a few passes over memory,
+    not much more than computing the hash that a persisted graph would be looked up by.
+    """
+    key = (image_hash(cpu), entry)
+    if (cached := _cache.get(key)) is not None:
+        _cache.move_to_end(key)
+        return cached
+
+    memory = cpu.memory
+    size = memory.size
+
+    decoded: dict[int, tuple[base.Instruction[t.Any], tuple[int, ...]]] = {}
+    for address in range(size):
+        if memory.is_mapped(address):
+            continue
+        with contextlib.suppress(NotImplementedError):
+            decoded[address] = cpu.decode_word(memory.get(address).unsigned_value)
+
+    def successors_of(address: int) -> tuple[list[int], bool]:
+        if (entry_ := decoded.get(address)) is None:
+            # invalid instructions stop execution
+            return [], True
+        succs, ends_block = _successors(*entry_, address)
+        return [s for s in succs if s in decoded], ends_block
+
+    # reachability, and every address which starts a basic block
+    reachable: set[int] = set()
+    leaders: set[int] = {entry}
+    data_references: set[int] = set()
+    stack = [entry] if 0 <= entry < size and not memory.is_mapped(entry) else []
+    while stack:
+        address = stack.pop()
+        if address in reachable:
+            continue
+        reachable.add(address)
+
+        if (entry_ := decoded.get(address)) is not None and entry_[0].addressing_mode is base.AddressingMode.ABSOLUTE:
+            data_references.add(entry_[1][0])
+
+        succs, ends_block = successors_of(address)
+        if ends_block:
+            leaders.update(succs)
+        stack.extend(succs)
+
+    blocks: dict[int, BasicBlock] = {}
+    for start in sorted(leaders & reachable):
+        end = start
+        while True:
+            succs, ends_block = successors_of(end)
+            end += 1
+            if ends_block or end not in reachable or end in leaders:
+                break
+        blocks[start] = BasicBlock(start, end, successors=list(dict.fromkeys(succs)))
+
+    for start, block in blocks.items():
+        for succ in block.successors:
+            blocks[succ].predecessors.append(start)
+
+    word_kinds: list[WordKind] = []
+    for address in range(size):
+        if address in reachable:
+            kind = WordKind.CODE
+        elif memory.is_mapped(address):
+            kind = WordKind.MAPPED
+        elif address in data_references or address not in decoded:
+            kind = WordKind.DATA
+        elif memory.get(address).unsigned_value == 0:
+            kind = WordKind.EMPTY
+        else:
+            kind = WordKind.UNREACHABLE
+        word_kinds.append(kind)
+
+    disassembly = {a: decoded[a][0].repr(decoded[a][1]) if a in decoded else "????" for a in reachable}
+    graph = ControlFlowGraph(entry, blocks, word_kinds, data_references, disassembly, key[0])
+
+    _cache[key] = graph
+    if len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+    return graph
@@ -0,0 +1,163 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+import enum
+import typing as t
+
+from cpusim.common.instructions import base
+from cpusim.common.instructions import xops
+from cpusim.common.instructions.v1a import primary as primary_1a
+from cpusim.common.instructions.v1d import primary as primary_1d
+from cpusim.common.instructions.v1d import secondary as secondary_1d
+
+if t.TYPE_CHECKING:
+    from cpusim.analysis import cfg as cfg_
+    from cpusim.backend import simulators
+
+__all__ = ["Flag", "dead_flag_writes", "flag_effects", "flag_liveness"]
+
+
+class Flag(enum.IntFlag):
+    NEGATIVE = 1
+    POSITIVE = 2
+    OVERFLOW = 4
+    CARRY = 8
+    ZERO = 16
+    ALL = NEGATIVE | POSITIVE | OVERFLOW | CARRY | ZERO
+
+
+_NONE = Flag(0)
+
+# every ALU operation sets all five flags
+_FLAG_SETTERS: frozenset[type[object]] = frozenset(
+    {
+        primary_1a.Add,
+        primary_1a.Sub,
+        primary_1a.And,
+        primary_1a.AddM,
+        primary_1a.SubM,
+        primary_1d.Add,
+        primary_1d.Sub,
+        primary_1d.And,
+        primary_1d.Or,
+        primary_1d.AddM,
+        primary_1d.SubM,
+        secondary_1d.Add,
+        secondary_1d.Sub,
+        secondary_1d.And,
+        secondary_1d.Or,
+        secondary_1d.Xor,
+        secondary_1d.Rol,
+        secondary_1d.Ror,
+        secondary_1d.Asl,
+    }
+)
+
+_FLAG_READERS: dict[type[object], Flag] = {
+    primary_1a.JumpZ: Flag.ZERO,
+    primary_1a.JumpNZ: Flag.ZERO,
+    primary_1d.JumpZ: Flag.ZERO,
+    primary_1d.JumpNZ: Flag.ZERO,
+    primary_1d.JumpC: Flag.CARRY,
+}
+
+
+def flag_effects(kind: type[object]) -> tuple[Flag, Flag]:
+    """The (read, written) flags of an instruction type."""
+    if issubclass(kind, xops.ExtendedInstruction):
+        # whether a user-defined instruction uses the flags depends on what is bound to it - assume it reads them all,
+        # which keeps every earlier write alive
+        return Flag.ALL, _NONE
+    return _FLAG_READERS.get(kind, _NONE), Flag.ALL if kind in _FLAG_SETTERS else _NONE
+
+
+def flag_liveness(
+    cpu: simulators.CPU[t.Any], cfg: cfg_.ControlFlowGraph, *, observed: t.Iterable[int] = ()
+) -> dict[int, Flag]:
+    """
+    Backward dataflow analysis of which flags may still be read after each reachable instruction.
+
+    Flags are read by conditional jumps, and by anything that can inspect the CPU once control leaves the
+    graph - every flag is live at a block with no successors (a ``ret`` or an invalid instruction), after a
+    jump to itself (a halt loop) and after each address in ``observed`` (for example breakpoints, or anywhere
+    else the debugger may stop). A flag write whose flags are not live afterwards is dead.
+    """
+    observed = set(observed)
+    memory = cpu.memory
+    effects: dict[int, tuple[Flag, Flag]] = {}
+    for block in cfg.blocks.values():
+        for address in range(block.start, block.end):
+            instruction, args = cpu.decode_word(memory.get(address).unsigned_value)
+            kind: type[object] = type(instruction)
+            effects[address] = flag_effects(kind)
+            # a jump to itself is where a program halts, leaving the final state for the user to inspect
+            if instruction.addressing_mode is base.AddressingMode.DIRECT and args == (address,):
+                observed.add(address)
+
+    def transfer(block: cfg_.BasicBlock, live: Flag, out: dict[int, Flag] | None) -> Flag:
+        # walk a block backwards from the flags live at its end, returning those live at its start
+        for address in range(block.last, block.start - 1, -1):
+            if address in observed:
+                live = Flag.ALL
+            if out is not None:
+                out[address] = live
+            reads, writes = effects[address]
+            live = (live & ~writes) | reads
+        return live
+
+    live_in: dict[int, Flag] = dict.fromkeys(cfg.blocks, _NONE)
+
+    def live_out(block: cfg_.BasicBlock) -> Flag:
+        if not block.successors:
+            return Flag.ALL
+        live = _NONE
+        for succ in block.successors:
+            live |= live_in[succ]
+        return live
+
+    # iterate to a fixed point, visiting blocks in reverse address order as a cheap approximation of postorder
+    order = sorted(cfg.blocks, reverse=True)
+    changed = True
+    while changed:
+        changed = False
+        for start in order:
+            block = cfg.blocks[start]
+            if (new := transfer(block, live_out(block), None)) != live_in[start]:
+                live_in[start] = new
+                changed = True
+
+    liveness: dict[int, Flag] = {}
+    for block in cfg.blocks.values():
+        transfer(block, live_out(block), liveness)
+    return liveness
+
+
+def dead_flag_writes(cpu: simulators.CPU[t.Any], liveness: dict[int, Flag]) -> list[int]:
+    """Addresses of the reachable instructions whose flag writes are never read."""
+    memory = cpu.memory
+    dead: list[int] = []
+    for address in sorted(liveness):
+        instruction, _ = cpu.decode_word(memory.get(address).unsigned_value)
+        kind: type[object] = type(instruction)
+        _, writes = flag_effects(kind)
+        if writes and not (writes & liveness[address]):
+            dead.append(address)
+    return dead
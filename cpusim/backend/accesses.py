@@ -0,0 +1,150 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+__all__ = ["AccessProfiler", "AccessStream"]
+
+import array
+import typing as t
+
+if t.TYPE_CHECKING:
+    from cpusim.backend import simulators
+
+StreamKind = t.Literal["fixed", "sequential", "strided", "irregular"]
+
+# the share of an instruction's successive accesses that have to be the same distance apart for it to be a stream
+_STREAM_COVERAGE = 0.75
+
+
+class AccessStream(t.NamedTuple):
+    pc: int
+    accesses: int
+    # the most common distance between successive accesses made by the instruction, and the share of them it covers
+    stride: int
+    coverage: float
+
+    @property
+    def kind(self) -> StreamKind:
+        if self.coverage < _STREAM_COVERAGE:
+            return "irregular"
+        if not self.stride:
+            return "fixed"
+        return "sequential" if abs(self.stride) == 1 else "strided"
+
+
+class AccessProfiler:
+    """
+    Counts the reads and writes the program makes to each address of data memory, while it is set as the CPU's
+    ``access_profiler``. The successive addresses accessed by each instruction are also compared, to find those
+    that walk memory in a stream - such as a register indirect ``load`` or ``store`` stepping through an array.
+
+    Only accesses made by instructions are counted - instruction fetches, and accesses made by the debugger or by
+    devices between instructions, are not.
+    """
+
+    __slots__ = ("_fetching", "_last", "_memory", "_pc", "_strides", "pc_accesses", "reads", "writes")
+
+    def __init__(self, cpu: simulators.CPU[t.Any]) -> None:
+        self._memory = cpu.memory
+        size = cpu.memory.size
+        self.reads = array.array("Q", bytes(8 * size))
+        self.writes = array.array("Q", bytes(8 * size))
+        # accesses made by the instruction at each address
+        self.pc_accesses = array.array("Q", bytes(8 * size))
+
+        # the address of the instruction being run (-1 outside of an instruction), and whether its fetch is still
+        # to come
+        self._pc = -1
+        self._fetching = False
+        # the address each instruction last accessed, and how often each distance between its accesses came up
+        self._last = array.array("q", [-1]) * size
+        self._strides: dict[int, dict[int, int]] = {}
+
+    def __repr__(self) -> str:
+        return f"AccessProfiler(reads={sum(self.reads)}, writes={sum(self.writes)})"
+
+    def attach(self) -> None:
+        """Start observing the memory of the CPU."""
+        self._memory.observe(self._access)
+
+    def detach(self) -> None:
+        self._memory.unobserve(self._access)
+        self._pc = -1
+
+    def begin(self, pc: int) -> None:
+        """Attribute accesses to the instruction at ``pc`` until it ends, other than the fetch of the instruction."""
+        self._pc = pc
+        self._fetching = True
+
+    def end(self) -> None:
+        self._pc = -1
+
+    def _access(self, address: int, write: bool) -> None:
+        if (pc := self._pc) < 0:
+            return
+        if self._fetching:
+            self._fetching = False
+            return
+
+        if write:
+            self.writes[address] += 1
+        else:
+            self.reads[address] += 1
+        self.pc_accesses[pc] += 1
+
+        if (last := self._last[pc]) >= 0:
+            if (strides := self._strides.get(pc)) is None:
+                strides = self._strides[pc] = {}
+            stride = address - last
+            strides[stride] = strides.get(stride, 0) + 1
+        self._last[pc] = address
+
+    def hottest(self, n: int | None = None) -> list[tuple[int, int, int]]:
+        """The (address, reads, writes) of the ``n`` (or all) most accessed addresses, most accessed first."""
+        reads, writes = self.reads, self.writes
+        accessed = [(address, reads[address], writes[address]) for address in range(len(reads))]
+        accessed = [entry for entry in accessed if entry[1] or entry[2]]
+        accessed.sort(key=lambda entry: -(entry[1] + entry[2]))
+        return accessed[:n]
+
+    def histogram(self, bucket_size: int = 16) -> list[tuple[int, int, int]]:
+        """The (first address, reads, writes) of each run of ``bucket_size`` addresses that was accessed."""
+        buckets: list[tuple[int, int, int]] = []
+        for start in range(0, len(self.reads), bucket_size):
+            reads = sum(self.reads[start : start + bucket_size])
+            writes = sum(self.writes[start : start + bucket_size])
+            if reads or writes:
+                buckets.append((start, reads, writes))
+        return buckets
+
+    def streams(self) -> list[AccessStream]:
+        """How each instruction that accessed memory more than once walked through it, by address."""
+        streams: list[AccessStream] = []
+        for pc, strides in sorted(self._strides.items()):
+            stride, count = max(strides.items(), key=lambda item: (item[1], -abs(item[0])))
+            streams.append(AccessStream(pc, self.pc_accesses[pc], stride, count / sum(strides.values())))
+        return streams
+
+    def to_dict(self) -> dict[str, t.Any]:
+        return {
+            "reads": {str(address): n for address, n in enumerate(self.reads) if n},
+            "writes": {str(address): n for address, n in enumerate(self.writes) if n},
+            "streams": [{**stream._asdict(), "kind": stream.kind} for stream in self.streams()],
+        }
@@ -0,0 +1,226 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+__all__ = ["Arch", "CompiledProgram", "cache_path", "compile_source", "default_cache_dir", "load", "program_hash"]
+
+import hashlib
+import importlib.util
+import os
+import tempfile
+import typing as t
+
+import cpusim
+from cpusim import analysis
+from cpusim.backend import simulators
+from cpusim.common.instructions import isa
+
+if t.TYPE_CHECKING:
+    import types
+
+    from cpusim.common.types import FixedWidthInt
+
+Arch = t.Literal["1a", "1d"]
+
+# (function executing the instruction, the word it was compiled from, whether it is a jump)
+_Entry = tuple[t.Callable[[t.Any], None], int, bool]
+
+
+def _new_cpu(machine_code: list[int], arch: Arch) -> simulators.CPU[t.Any]:
+    return simulators.CPU1a(machine_code) if arch == "1a" else simulators.CPU1d(machine_code)
+
+
+def program_hash(machine_code: list[int], arch: Arch) -> str:
+    """Digest of a program image - the words as loaded into memory, and the architecture they are run on."""
+    size = _new_cpu([], arch).memory.size
+    digest = hashlib.blake2b(arch.encode(), digest_size=16)
+    digest.update(b"".join((word & 0xFFFF).to_bytes(2, "big") for word in machine_code[:size]))
+    return digest.hexdigest()
+
+
+def compile_source(machine_code: list[int], arch: Arch) -> str:
+    """
+    Translate a whole program image into the source of a standalone Python module.
+
+    The module defines one function per address, taking the CPU, and a ``TABLE`` of them indexed by address -
+    ``None`` wherever the word does not decode to an instruction that can be compiled, which the interpreter is
+    left to run. Every word is compiled, as there is no telling ahead of time which are code.
+    """
+    cpu = _new_cpu(machine_code, arch)
+    image = [cpu.memory.get(address).unsigned_value for address in range(min(len(machine_code), cpu.memory.size))]
+
+    constants: dict[tuple[str, int], str] = {}
+    functions: list[str] = []
+    table: list[str] = []
+    jumps: list[int] = []
+
+    def constant(value: FixedWidthInt) -> str:
+        # immediates are folded into module-level constants, shared between every instruction using them
+        return constants.setdefault((type(value).__name__, value.unsigned_value), f"_k{len(constants)}")
+
+    for address, word in enumerate(image):
+        try:
+            instruction, args = cpu.decode_word(word)
+        except NotImplementedError:
+            table.append("None")
+            continue
+
+        kind: type[object] = type(instruction)
+        if (spec := isa.spec_for(kind)) is None or not spec.implemented:
+            table.append("None")
+            continue
+
+        name = f"_{address:04x}"
+        lines = [f"def {name}(cpu):", f"    # {isa.disassemble(spec, args)}"]
+        lines += [f"    {line}" for line in isa.statements(spec, arch == "1d", args, constant)]
+        if spec.incr_pc:
+            lines.append("    cpu.pc.incr()")
+        functions.append("\n".join(lines))
+        table.append(name)
+        if kind in analysis.JUMP_CONDITIONS:
+            jumps.append(address)
+
+    out = [
+        f"# Compiled by cpusim {cpusim.__version__} - do not edit. Regenerated whenever the program changes.",
+        "from cpusim.common.types import Int8",
+        "from cpusim.common.types import Int16",
+        "",
+        f"CPUSIM_VERSION = {cpusim.__version__!r}",
+        f"ARCH = {arch!r}",
+        f"PROGRAM_HASH = {program_hash(machine_code, arch)!r}",
+        f"IMAGE = ({''.join(f'{word:#06x}, ' for word in image)})",
+        "# addresses of the jumps, which get the halt-loop check before they run",
+        f"JUMPS = frozenset(({''.join(f'{address}, ' for address in jumps)}))",
+        "",
+        *(f"{name} = {kind}({value})" for (kind, value), name in constants.items()),
+        "",
+        *(f"\n{function}\n" for function in functions),
+        "",
+        f"TABLE = ({''.join(f'{entry}, ' for entry in table)})",
+        "",
+    ]
+    return "\n".join(out)
+
+
+def default_cache_dir() -> str:
+    # CPUSIM_CACHE_DIR if set, otherwise the cpusim directory of the user's cache directory
+    if (path := os.environ.get("CPUSIM_CACHE_DIR")) is not None:
+        return path
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "cpusim")
+
+
+def cache_path(machine_code: list[int], arch: Arch, cache_dir: str | None = None) -> str:
+    """Path of the cached module for a program - keyed by both the program and the cpusim version."""
+    directory = os.path.join(cache_dir or default_cache_dir(), cpusim.__version__)
+    return os.path.join(directory, f"program_{arch}_{program_hash(machine_code, arch)}.py")
+
+
+def _import(path: str) -> types.ModuleType:
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Cannot import compiled program {path}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load(machine_code: list[int], arch: Arch, cache_dir: str | None = None) -> types.ModuleType:
+    """
+    Import the compiled module for a program from the cache, compiling it into the cache first if it is not
+    there (or does not belong to this program and cpusim version).
+    """
+    path = cache_path(machine_code, arch, cache_dir)
+    expected = (cpusim.__version__, program_hash(machine_code, arch))
+    if os.path.exists(path):
+        module = _import(path)
+        if (getattr(module, "CPUSIM_VERSION", None), getattr(module, "PROGRAM_HASH", None)) == expected:
+            return module
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # written under a temporary name and renamed into place, so concurrent runs never import half a module
+    fd, temp = tempfile.mkstemp(suffix=".py", dir=os.path.dirname(path))
+    with os.fdopen(fd, "w") as f:
+        f.write(compile_source(machine_code, arch))
+    os.replace(temp, path)
+    return _import(path)
+
+
+class CompiledProgram:
+    """
+    Runs a program from its ahead-of-time compiled module, one function call per instruction with no fetch or
+    decode.
+
+    Every instruction is still recorded in the history and halt loops are still detected, so a run matches the
+    interpreter exactly. Addresses the module has no function for, mem-mapped addresses, and any word that is
+    overwritten with something different (self-modifying code) are left to the interpreter.
+    """
+
+    __slots__ = ("_cpu", "_table", "_writes", "instructions")
+
+    def __init__(self, cpu: simulators.CPU[t.Any], module: types.ModuleType) -> None:
+        memory = cpu.memory
+        arch = "1a" if isinstance(cpu, simulators.CPU1a) else "1d"
+        image: tuple[int, ...] = module.IMAGE
+        if arch != module.ARCH or any(memory.get(a).unsigned_value != word for a, word in enumerate(image)):
+            raise ValueError("compiled program does not match the program in memory")
+
+        self._cpu = cpu
+        self._writes = memory.track_writes()
+        jumps: frozenset[int] = module.JUMPS
+        self._table: list[_Entry | None] = [
+            None if fn is None or memory.is_mapped(address) else (fn, image[address], address in jumps)
+            for address, fn in enumerate(module.TABLE)
+        ]
+        self.instructions = 0
+
+    def close(self) -> None:
+        self._cpu.memory.untrack_writes(self._writes)
+
+    def _invalidate(self) -> None:
+        memory, table = self._cpu.memory, self._table
+        for address in self._writes:
+            entry = table[address] if address < len(table) else None
+            if entry is not None and memory.get(address).unsigned_value != entry[1]:
+                table[address] = None
+        self._writes.clear()
+
+    def dispatch(self, budget: int, detect_halt_loop: bool) -> tuple[int, bool]:
+        # Execute the instruction at the PC with the same accounting as CPU.step, returning the number run (one,
+        # whatever the budget) and whether the CPU halted - or nothing run if the interpreter has to take over.
+        if self._writes:
+            self._invalidate()
+
+        cpu = self._cpu
+        pc = cpu.pc.value
+        if pc >= len(self._table) or (entry := self._table[pc]) is None:
+            return 0, False
+
+        fn, word, jump = entry
+        cpu.history.record(pc, word)
+        cpu.ir.set(word)
+        self.instructions += 1
+        if jump and detect_halt_loop:
+            table = cpu.halt_table
+            if table.masks[pc] and table.halts(pc, *cpu.jump_flags):
+                return 1, True
+
+        fn(cpu)
+        return 1, False
@@ -0,0 +1,176 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+__all__ = ["PREDICTORS", "BranchProfiler"]
+
+import array
+import typing as t
+
+from cpusim.common.instructions import isa
+
+if t.TYPE_CHECKING:
+    from cpusim.backend import simulators
+
+Predictor = t.Literal["static", "one_bit", "two_bit", "gshare"]
+PREDICTORS: tuple[Predictor, ...] = ("static", "one_bit", "two_bit", "gshare")
+"""
+The predictors simulated - ``static`` predicts backward branches taken and forward ones not taken, ``one_bit``
+predicts each branch goes the same way as last time, ``two_bit`` keeps a saturating counter per branch and
+``gshare`` a table of saturating counters indexed by the branch address XORed with the global history.
+"""
+
+# a saturating counter of 2 or more predicts taken - counters start out weakly not taken
+_WEAKLY_NOT_TAKEN = 1
+
+
+def _branch(instruction: t.Any, args: tuple[int, ...]) -> tuple[str, int] | None:
+    # the flag a conditional jump tests (as isa.Op.a) and its target, or None for anything else
+    kind: type[object] = type(instruction)
+    if (spec := isa.spec_for(kind)) is None:
+        return None
+    condition = next((op.a for op in spec.semantics if op.name == "jump" and op.a), None)
+    return None if condition is None else (condition, args[0])
+
+
+class BranchProfiler:
+    """
+    Counts how often each conditional jump (``jumpz``, ``jumpnz`` and ``jumpc``) is taken and not taken, and how
+    many of its outcomes each of :data:`PREDICTORS` predicted correctly, while it is set as the CPU's
+    ``branches``. The gshare predictor keeps the last ``history_length`` outcomes, and a table of
+    ``2 ** history_length`` counters.
+
+    Counts are kept in arrays indexed by the address of the branch.
+    """
+
+    __slots__ = (
+        "_branches",
+        "_counters",
+        "_cpu",
+        "_gshare",
+        "_history",
+        "_history_mask",
+        "_last",
+        "correct",
+        "history_length",
+        "not_taken",
+        "taken",
+    )
+
+    def __init__(self, cpu: simulators.CPU[t.Any], *, history_length: int = 8) -> None:
+        if not 1 <= history_length <= 16:
+            raise ValueError("the history length must be between 1 and 16")
+
+        self._cpu = cpu
+        size = cpu.memory.size
+        # instruction word -> the condition and target of a conditional jump, or None
+        self._branches: dict[int, tuple[str, int] | None] = {}
+
+        self.history_length = history_length
+        self.taken = array.array("Q", bytes(8 * size))
+        self.not_taken = array.array("Q", bytes(8 * size))
+        # predictor -> correct predictions at each address
+        self.correct: dict[Predictor, array.array[int]] = {
+            predictor: array.array("Q", bytes(8 * size)) for predictor in PREDICTORS
+        }
+
+        # the last outcome and the saturating counter of each branch
+        self._last = bytearray(size)
+        self._counters = bytearray([_WEAKLY_NOT_TAKEN]) * size
+        self._history = 0
+        self._history_mask = (1 << history_length) - 1
+        self._gshare = bytearray([_WEAKLY_NOT_TAKEN]) * (1 << history_length)
+
+    def __repr__(self) -> str:
+        return f"BranchProfiler(branches={self.branches}, history_length={self.history_length})"
+
+    @property
+    def branches(self) -> int:
+        """The number of conditional jumps run."""
+        return sum(self.taken) + sum(self.not_taken)
+
+    def addresses(self) -> list[int]:
+        """The address of every conditional jump that was run, in order."""
+        taken, not_taken = self.taken, self.not_taken
+        return [address for address in range(len(taken)) if taken[address] or not_taken[address]]
+
+    def accuracy(self, predictor: Predictor, address: int | None = None) -> float:
+        """The fraction of the outcomes of the branch at ``address`` (or of every branch) ``predictor`` got right."""
+        if address is None:
+            runs, correct = self.branches, sum(self.correct[predictor])
+        else:
+            runs, correct = self.taken[address] + self.not_taken[address], self.correct[predictor][address]
+        return correct / runs if runs else 0.0
+
+    def to_dict(self) -> dict[str, t.Any]:
+        return {
+            "history_length": self.history_length,
+            "taken": sum(self.taken),
+            "not_taken": sum(self.not_taken),
+            "accuracy": {predictor: self.accuracy(predictor) for predictor in PREDICTORS},
+            "branches": [
+                {
+                    "address": address,
+                    "taken": self.taken[address],
+                    "not_taken": self.not_taken[address],
+                    "accuracy": {predictor: self.accuracy(predictor, address) for predictor in PREDICTORS},
+                }
+                for address in self.addresses()
+            ],
+        }
+
+    def record(self, address: int, word: int, zero: bool, carry: bool) -> None:
+        """
+        Account for the instruction ``word`` at ``address`` being run, with the (zero, carry) flags as they were
+        before it ran.
+        """
+        if word in self._branches:
+            branch = self._branches[word]
+        else:
+            branch = self._branches[word] = _branch(*self._cpu.decode_word(word))
+        if branch is None:
+            return
+
+        condition, target = branch
+        taken = zero if condition == "zero" else not zero if condition == "!zero" else carry
+        if taken:
+            self.taken[address] += 1
+        else:
+            self.not_taken[address] += 1
+
+        correct = self.correct
+        # backward taken, forward not taken
+        if (target <= address) == taken:
+            correct["static"][address] += 1
+        if self._last[address] == taken:
+            correct["one_bit"][address] += 1
+        self._last[address] = taken
+
+        counter = self._counters[address]
+        if (counter >= 2) == taken:
+            correct["two_bit"][address] += 1
+        self._counters[address] = min(counter + 1, 3) if taken else max(counter - 1, 0)
+
+        index = (address ^ self._history) & self._history_mask
+        counter = self._gshare[index]
+        if (counter >= 2) == taken:
+            correct["gshare"][address] += 1
+        self._gshare[index] = min(counter + 1, 3) if taken else max(counter - 1, 0)
+        self._history = ((self._history << 1) | taken) & self._history_mask
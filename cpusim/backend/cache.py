@@ -0,0 +1,260 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+__all__ = ["REPLACEMENT_POLICIES", "Cache", "CacheConfig", "CacheSimulator"]
+
+import typing as t
+
+if t.TYPE_CHECKING:
+    from cpusim.backend import simulators
+
+ReplacementPolicy = t.Literal["lru", "fifo"]
+REPLACEMENT_POLICIES: tuple[ReplacementPolicy, ...] = ("lru", "fifo")
+
+
+def _is_power_of_two(n: int) -> bool:
+    return n > 0 and not n & (n - 1)
+
+
+class CacheConfig:
+    """
+    The shape of a cache - ``size`` and ``line_size`` in (16 bit) words, the number of lines in each set (each a
+    power of two) and the policy that picks which line of a full set is replaced.
+    """
+
+    __slots__ = ("associativity", "line_size", "policy", "size")
+
+    def __init__(
+        self, size: int, line_size: int = 4, associativity: int = 1, policy: ReplacementPolicy = "lru"
+    ) -> None:
+        if not all(_is_power_of_two(n) for n in (size, line_size, associativity)):
+            raise ValueError("the cache size, line size and associativity must be powers of two")
+        if size < line_size * associativity:
+            raise ValueError(f"{size} words cannot hold a set of {associativity} lines of {line_size} words")
+        if policy not in REPLACEMENT_POLICIES:
+            raise ValueError(
+                f"unknown replacement policy {policy!r} - expected one of {', '.join(REPLACEMENT_POLICIES)}"
+            )
+
+        self.size = size
+        self.line_size = line_size
+        self.associativity = associativity
+        self.policy: ReplacementPolicy = policy
+
+    def __repr__(self) -> str:
+        return f"CacheConfig({self.size}, {self.line_size}, {self.associativity}, {self.policy!r})"
+
+    @classmethod
+    def parse(cls, spec: str) -> CacheConfig:
+        """Parse ``SIZE[,LINE_SIZE[,ASSOCIATIVITY[,POLICY]]]`` - for example ``256,4,2,lru``."""
+        parts = [part.strip() for part in spec.split(",")]
+        if not 1 <= len(parts) <= 4:
+            raise ValueError(f"expected SIZE[,LINE_SIZE[,ASSOCIATIVITY[,POLICY]]], got {spec!r}")
+
+        try:
+            numbers = [int(part, 0) for part in parts[:3]]
+        except ValueError:
+            raise ValueError(f"expected whole numbers for the sizes and associativity, got {spec!r}") from None
+        policy = parts[3].lower() if len(parts) == 4 else "lru"
+        return cls(*numbers, policy=t.cast("ReplacementPolicy", policy))
+
+
+class Cache:
+    """
+    A set-associative cache of ``config``, keeping only which lines it holds. Reads and writes are treated alike -
+    a write to a line that is not cached allocates it. Hits and misses are counted in total, and per region of
+    ``region_size`` words of the ``memory_size`` words it sits in front of.
+    """
+
+    __slots__ = (
+        "_lru",
+        "_region_shift",
+        "_set_mask",
+        "_sets",
+        "_shift",
+        "_ways",
+        "config",
+        "hits",
+        "misses",
+        "region_hits",
+        "region_misses",
+        "region_size",
+    )
+
+    def __init__(self, config: CacheConfig, memory_size: int, region_size: int = 256) -> None:
+        if not _is_power_of_two(region_size):
+            raise ValueError("the region size must be a power of two")
+
+        self.config = config
+        self._shift = config.line_size.bit_length() - 1
+        self._set_mask = config.size // (config.line_size * config.associativity) - 1
+        self._ways = config.associativity
+        self._lru = config.policy == "lru"
+        # the lines held by each set, oldest (or least recently used) first
+        self._sets: list[list[int]] = [[] for _ in range(self._set_mask + 1)]
+
+        self.hits = 0
+        self.misses = 0
+        self.region_size = region_size
+        self._region_shift = region_size.bit_length() - 1
+        regions = (memory_size + region_size - 1) // region_size
+        self.region_hits = [0] * regions
+        self.region_misses = [0] * regions
+
+    def __repr__(self) -> str:
+        return f"Cache({self.config}, hits={self.hits}, misses={self.misses})"
+
+    @property
+    def accesses(self) -> int:
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.accesses if self.accesses else 0.0
+
+    def regions(self) -> t.Iterator[tuple[int, int, int]]:
+        """Yield the (start address, hits, misses) of each region that was accessed."""
+        for region, (hits, misses) in enumerate(zip(self.region_hits, self.region_misses)):
+            if hits or misses:
+                yield region * self.region_size, hits, misses
+
+    def to_dict(self) -> dict[str, t.Any]:
+        config = self.config
+        return {
+            "size": config.size,
+            "line_size": config.line_size,
+            "associativity": config.associativity,
+            "policy": config.policy,
+            "hits": self.hits,
+            "misses": self.misses,
+            "regions": [{"start": start, "hits": hits, "misses": misses} for start, hits, misses in self.regions()],
+        }
+
+    def access(self, address: int) -> bool:
+        """Look up ``address``, bringing its line in on a miss. Returns whether it was a hit."""
+        line = address >> self._shift
+        lines = self._sets[line & self._set_mask]
+        if line in lines:
+            if self._lru and lines[-1] != line:
+                lines.remove(line)
+                lines.append(line)
+            self.hits += 1
+            self.region_hits[address >> self._region_shift] += 1
+            return True
+
+        if len(lines) == self._ways:
+            del lines[0]
+        lines.append(line)
+        self.misses += 1
+        self.region_misses[address >> self._region_shift] += 1
+        return False
+
+
+class CacheSimulator:
+    """
+    Simulates an instruction cache and a data cache (either can be left out) in front of the memory of ``cpu``,
+    while it is set as the CPU's ``cache``. Instruction fetches go to the instruction cache, and the reads and
+    writes each instruction makes to the data cache. Mem-mapped addresses are never cached - accesses to them
+    are counted per mapped region instead.
+
+    As well as the per region counts of each cache, the data cache hits and misses of each instruction are
+    counted against its address, as are the instruction cache misses of fetching it.
+    """
+
+    __slots__ = ("_memory", "_pc", "data", "data_hits", "data_misses", "fetch_misses", "instruction", "uncached")
+
+    def __init__(
+        self,
+        cpu: simulators.CPU[t.Any],
+        *,
+        instruction: CacheConfig | None = None,
+        data: CacheConfig | None = None,
+        region_size: int = 256,
+    ) -> None:
+        self._memory = memory = cpu.memory
+        size = memory.size
+        self.instruction = Cache(instruction, size, region_size) if instruction is not None else None
+        self.data = Cache(data, size, region_size) if data is not None else None
+
+        # the address of the instruction being run, or -1 outside of an instruction - accesses made by anything
+        # else (the debugger, or devices between instructions) are not counted
+        self._pc = -1
+        self.data_hits = [0] * size
+        self.data_misses = [0] * size
+        self.fetch_misses = [0] * size
+        # mem-mapped region id -> accesses
+        self.uncached: dict[str, int] = {}
+
+    def __repr__(self) -> str:
+        return f"CacheSimulator(instruction={self.instruction}, data={self.data})"
+
+    def instructions(self) -> t.Iterator[tuple[int, int, int, int]]:
+        """Yield the (address, fetch misses, data hits, data misses) of each instruction that hit or missed."""
+        for address, counts in enumerate(zip(self.fetch_misses, self.data_hits, self.data_misses)):
+            if any(counts):
+                yield address, *counts
+
+    def to_dict(self) -> dict[str, t.Any]:
+        return {
+            "instruction": None if self.instruction is None else self.instruction.to_dict(),
+            "data": None if self.data is None else self.data.to_dict(),
+            "uncached": dict(sorted(self.uncached.items())),
+            "instructions": [
+                {"address": address, "fetch_misses": fetch_misses, "data_hits": hits, "data_misses": misses}
+                for address, fetch_misses, hits, misses in self.instructions()
+            ],
+        }
+
+    def attach(self) -> None:
+        """Start observing the memory of the CPU."""
+        self._memory.observe(self._access)
+
+    def detach(self) -> None:
+        self._memory.unobserve(self._access)
+        self._pc = -1
+
+    def fetch(self, pc: int) -> None:
+        """Account for the instruction at ``pc`` being fetched, and attribute data accesses to it until retired."""
+        self._pc = pc
+        if (cache := self.instruction) is None:
+            return
+        if self._memory.is_mapped(pc):
+            self._uncached(pc)
+        elif not cache.access(pc):
+            self.fetch_misses[pc] += 1
+
+    def retire(self) -> None:
+        self._pc = -1
+
+    def _uncached(self, address: int) -> None:
+        region = self._memory.region_at(address)
+        name = "?" if region is None else region.id
+        self.uncached[name] = self.uncached.get(name, 0) + 1
+
+    def _access(self, address: int, write: bool) -> None:
+        if (pc := self._pc) < 0 or (cache := self.data) is None:
+            return
+        if self._memory.is_mapped(address):
+            self._uncached(address)
+        elif cache.access(address):
+            self.data_hits[pc] += 1
+        else:
+            self.data_misses[pc] += 1
@@ -18,7 +18,18 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 from cpusim.backend.components.alu import *
+from cpusim.backend.components.history import *
 from cpusim.backend.components.memory import *
 from cpusim.backend.components.registers import *
+from cpusim.backend.components.scheduler import *
 
-__all__ = ["ALU", "IntRegister", "Memory", "Registers"]
+__all__ = [
+    "ALU",
+    "EventHandle",
+    "EventScheduler",
+    "InstructionHistory",
+    "IntRegister",
+    "Memory",
+    "MemoryRegion",
+    "Registers",
+]
@@ -47,6 +47,10 @@ class ALU(abc.ABC, t.Generic[T]):
             ")"
         )
 
+    @property
+    def flags(self) -> tuple[bool, bool, bool, bool, bool]:
+        return self.negative, self.positive, self.overflow, self.carry, self.zero
+
     def _set_basic_flags(self, result: T) -> None:
         self.negative = result.signed_value < 0
         self.positive = result.signed_value > 0
@@ -17,11 +17,12 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
+import bisect
 import typing as t
 
 from cpusim.common.types import Int16
 
-__all__ = ["Memory"]
+__all__ = ["AccessProbe", "Memory", "MemoryRegion"]
 
 ReadHookFn = t.Callable[[int], Int16]
 """
@@ -33,6 +34,44 @@ WriteHookFn = t.Callable[[int, Int16], None]
 A hook function that can be called on memory write to a mapped address. Takes two parameters,
 the first is the address written to, the second is the value written.
 """
+AccessObserverFn = t.Callable[[int, bool], None]
+"""
+A function called on every memory access while it observes the memory - see Memory.observe. Takes two
+parameters, the first is the address accessed, the second is whether it was a write.
+"""
+PureReadFn = t.Callable[[int], bool]
+"""
+A function that reports whether reading from a mapped address is currently free of side effects, and will
+keep returning the same value until the next scheduled event or write to the device.
+"""
+
+# mem-mapped regions are tracked per page of (1 << _PAGE_SHIFT) words so that accesses to pages
+# containing only RAM can skip the hook lookup entirely
+_PAGE_SHIFT = 4
+
+
+class MemoryRegion(t.NamedTuple):
+    start: int
+    end: int  # exclusive
+    id: str
+    on_read: ReadHookFn
+    on_write: WriteHookFn
+    is_pure_read: PureReadFn | None = None
+
+
+class AccessProbe:
+    # Result of observing memory accesses over a span of execution - see Memory.begin_probe
+    __slots__ = ("impure_reads", "side_effects")
+
+    def __init__(self) -> None:
+        # reads from mapped addresses which may have side effects or return a changing value
+        self.impure_reads = 0
+        # writes to mapped addresses, and writes which changed the value stored in RAM
+        self.side_effects = 0
+
+    @property
+    def clean(self) -> bool:
+        return not (self.impure_reads or self.side_effects)
 
 
 class Memory:
@@ -42,8 +81,22 @@ class Memory:
         if len(data) < max_size:
             self._data.extend([Int16(0) for _ in range(max_size - len(data))])
 
-        self._memmap_addr: dict[int, str] = {}
-        self._memmap_hooks: dict[str, tuple[ReadHookFn, WriteHookFn]] = {}
+        # sorted, non-overlapping mem-mapped regions - the source of truth for the lookup tables below
+        self._regions: list[MemoryRegion] = []
+        # nonzero for each page that contains at least one mem-mapped address
+        self._mmio_pages = bytearray((max_size >> _PAGE_SHIFT) + 1)
+        # mem-mapped address -> hook, so that an access resolves to its bound hook with a single lookup
+        self._read_hooks: dict[int, ReadHookFn] = {}
+        self._write_hooks: dict[int, WriteHookFn] = {}
+
+        self._write_trackers: list[set[int]] = []
+        # number of reads and writes of mem-mapped addresses so far
+        self.mmio_accesses = 0
+
+        self._probe: AccessProbe | None = None
+        self._observers: tuple[AccessObserverFn, ...] = ()
+        # the real page bitmap, while every page is flagged as mem-mapped for a probe or an observer
+        self._saved_pages: bytearray | None = None
 
     def __repr__(self) -> str:
         return f"Memory(...{len(self._data)} entries)"
@@ -69,30 +122,179 @@ class Memory:
     def size(self) -> int:
         return len(self._data)
 
-    def memmap(self, id: str, addrs: t.Collection[int], on_read: ReadHookFn, on_write: WriteHookFn) -> None:
-        for i in addrs:
-            self._memmap_addr[i] = id
+    @property
+    def regions(self) -> tuple[MemoryRegion, ...]:
+        return tuple(self._regions)
+
+    def _rebuild_lookup(self, start: int, end: int) -> None:
+        # recompute the hook tables and page bitmap for the pages overlapping [start, end)
+        first_page, last_page = start >> _PAGE_SHIFT, (end - 1) >> _PAGE_SHIFT
+        pages = self._mmio_pages if self._saved_pages is None else self._saved_pages
+        for page in range(first_page, last_page + 1):
+            pages[page] = 0
+
+        for addr in range(start, end):
+            self._read_hooks.pop(addr, None)
+            self._write_hooks.pop(addr, None)
+
+        for region in self._regions:
+            if region.end <= (first_page << _PAGE_SHIFT) or region.start >= ((last_page + 1) << _PAGE_SHIFT):
+                continue
 
-        self._memmap_hooks[id] = (on_read, on_write)
+            for addr in range(region.start, region.end):
+                self._read_hooks[addr] = region.on_read
+                self._write_hooks[addr] = region.on_write
+                pages[addr >> _PAGE_SHIFT] = 1
+
+    def memmap(
+        self,
+        id: str,
+        addrs: t.Collection[int],
+        on_read: ReadHookFn,
+        on_write: WriteHookFn,
+        *,
+        is_pure_read: PureReadFn | None = None,
+    ) -> None:
+        # group the addresses into contiguous ranges, each of which becomes one region
+        new_regions: list[MemoryRegion] = []
+        for addr in sorted(set(addrs)):
+            if addr < 0 or addr >= len(self._data):
+                raise ValueError(f"Mem-mapped address {hex(addr)} is out of bounds")
+
+            if new_regions and new_regions[-1].end == addr:
+                new_regions[-1] = new_regions[-1]._replace(end=addr + 1)
+            else:
+                new_regions.append(MemoryRegion(addr, addr + 1, id, on_read, on_write, is_pure_read))
+
+        for region in new_regions:
+            idx = bisect.bisect_left(self._regions, region.start, key=lambda r: r.start)
+            if (idx > 0 and self._regions[idx - 1].end > region.start) or (
+                idx < len(self._regions) and self._regions[idx].start < region.end
+            ):
+                raise ValueError(f"Mem-mapped region {hex(region.start)}-{hex(region.end - 1)} overlaps another")
+
+        for region in new_regions:
+            bisect.insort(self._regions, region, key=lambda r: r.start)
+            self._rebuild_lookup(region.start, region.end)
 
     def unmemmap(self, id: str) -> None:
-        self._memmap_addr = {addr: id_ for addr, id_ in self._memmap_addr.items() if id_ != id}
-        del self._memmap_hooks[id]
+        removed = [r for r in self._regions if r.id == id]
+        self._regions = [r for r in self._regions if r.id != id]
+
+        for region in removed:
+            self._rebuild_lookup(region.start, region.end)
+
+    def region_at(self, address: int) -> MemoryRegion | None:
+        idx = bisect.bisect_right(self._regions, address, key=lambda r: r.start) - 1
+        if idx >= 0 and address < self._regions[idx].end:
+            return self._regions[idx]
+        return None
+
+    def is_mapped(self, address: int) -> bool:
+        return self._mmio_pages[address >> _PAGE_SHIFT] != 0 and address in self._read_hooks
+
+    def track_writes(self) -> set[int]:
+        # the returned set has the address of every subsequent (non mem-mapped) write added to it - the caller
+        # is responsible for clearing it once it has consumed the addresses
+        tracker: set[int] = set()
+        self._write_trackers.append(tracker)
+        return tracker
+
+    def untrack_writes(self, tracker: set[int]) -> None:
+        # called once the owner of a set returned by track_writes is discarded, so that writes stop paying for it
+        self._write_trackers = [other for other in self._write_trackers if other is not tracker]
+
+    def _divert_accesses(self) -> None:
+        # flag every page as mem-mapped, so that all accesses take the slow path where they can be observed
+        if self._saved_pages is None:
+            self._saved_pages, self._mmio_pages = self._mmio_pages, bytearray(b"\x01" * len(self._mmio_pages))
+
+    def _restore_accesses(self) -> None:
+        if self._saved_pages is not None and self._probe is None and not self._observers:
+            self._mmio_pages, self._saved_pages = self._saved_pages, None
+
+    def begin_probe(self) -> AccessProbe:
+        # Observe every access until end_probe is called. Every page is flagged as mem-mapped for the duration
+        # so that all accesses take the slow path, leaving ordinary accesses without any extra checks.
+        if self._probe is not None:
+            raise RuntimeError("A memory probe is already active")
+
+        self._probe = AccessProbe()
+        self._divert_accesses()
+        return self._probe
+
+    def end_probe(self) -> AccessProbe:
+        if self._probe is None:
+            raise RuntimeError("No memory probe is active")
+
+        probe, self._probe = self._probe, None
+        self._restore_accesses()
+        return probe
+
+    def observe(self, observer: AccessObserverFn) -> None:
+        """
+        Call ``observer`` with every address read or written (mem-mapped or not) until it is passed to unobserve.
+        Like a probe, accesses only pay for this while there is an observer.
+        """
+        self._observers = (*self._observers, observer)
+        self._divert_accesses()
+
+    def unobserve(self, observer: AccessObserverFn) -> None:
+        self._observers = tuple(o for o in self._observers if o != observer)
+        self._restore_accesses()
+
+    def _get_slow(self, address: int) -> Int16:
+        hook = self._read_hooks.get(address)
+        if hook is not None:
+            self.mmio_accesses += 1
+        for observer in self._observers:
+            observer(address, False)
+        if (probe := self._probe) is not None and hook is not None:
+            region = self.region_at(address)
+            if region is None or region.is_pure_read is None or not region.is_pure_read(address):
+                probe.impure_reads += 1
+
+        return self._data[address] if hook is None else hook(address)
+
+    def _set_slow(self, address: int, value: Int16) -> None:
+        hook = self._write_hooks.get(address)
+        for observer in self._observers:
+            observer(address, True)
+        if (probe := self._probe) is not None and (hook is not None or self._data[address] != value):
+            probe.side_effects += 1
+
+        if hook is not None:
+            self.mmio_accesses += 1
+            return hook(address, value)
+
+        self._data[address] = value
+        for tracker in self._write_trackers:
+            tracker.add(address)
 
     def get(self, address: int) -> Int16:
-        if address in self._memmap_addr:
-            return self._memmap_hooks[self._memmap_addr[address]][0](address)
+        if address >= len(self._data):
+            raise ValueError("Address out of bounds")
+
+        if self._mmio_pages[address >> _PAGE_SHIFT]:
+            return self._get_slow(address)
+
+        return self._data[address]
 
+    def peek(self, address: int) -> Int16:
+        # read the RAM behind an address without running its hook or being seen by probes and observers - for
+        # analyses of the loaded image, whose reads must not be taken for accesses made by the program
         if address >= len(self._data):
             raise ValueError("Address out of bounds")
 
         return self._data[address]
 
     def set(self, address: int, value: Int16) -> None:
-        if address in self._memmap_addr:
-            return self._memmap_hooks[self._memmap_addr[address]][1](address, value)
-
         if address >= len(self._data):
             raise ValueError("Address out of bounds")
 
+        if self._mmio_pages[address >> _PAGE_SHIFT]:
+            return self._set_slow(address, value)
+
         self._data[address] = value
+        for tracker in self._write_trackers:
+            tracker.add(address)
@@ -50,6 +50,10 @@ class Registers:
     def __repr__(self) -> str:
         return f"Registers(...{len(self._values)} entries)"
 
+    def values(self) -> tuple[int, ...]:
+        # unsigned value of every register, in index order
+        return tuple(self._values[idx].unsigned_value for idx in range(self._register_limit))
+
     def get(self, idx: int) -> Int16:
         if idx >= self._register_limit:
             raise ValueError("Index out of range")
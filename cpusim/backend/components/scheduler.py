@@ -0,0 +1,136 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+import heapq
+import itertools
+import typing as t
+
+if t.TYPE_CHECKING:
+    from cpusim.backend.components import history as history_
+
+__all__ = ["EventHandle", "EventScheduler"]
+
+EventCallbackFn = t.Callable[[int], None]
+"""
+A callback scheduled to run at a future cycle. Takes a single parameter, the cycle the event was due at.
+"""
+
+_NEVER = 1 << 62
+
+
+class EventHandle:
+    __slots__ = ("callback", "cancelled", "due")
+
+    def __init__(self, due: int, callback: EventCallbackFn) -> None:
+        self.due = due
+        self.callback = callback
+        self.cancelled = False
+
+    def __repr__(self) -> str:
+        return f"EventHandle(due={self.due}, cancelled={self.cancelled})"
+
+
+class EventScheduler:
+    # Simulated clock (one cycle per executed instruction) plus a min-heap of pending events. The run loop only
+    # has to compare the clock against next_due, so CPUs with no scheduled events pay nothing per step.
+    #
+    # The run loop advances the clock once per chunk of instructions, so cycle lags behind while a chunk runs.
+    # Given the CPU's instruction history, now is exact at any point - devices use it, and anything scheduled
+    # in the middle of a chunk moves next_due forwards for the run loop to cut the chunk short.
+    __slots__ = ("_counter", "_history", "_queue", "_synced", "cycle", "next_due")
+
+    def __init__(self, history: history_.InstructionHistory | None = None) -> None:
+        self._history = history
+        # history total when the clock was last advanced
+        self._synced = history.total if history is not None else 0
+        self.cycle = 0
+        # cycle of the earliest pending event, or a very large value when nothing is scheduled
+        self.next_due = _NEVER
+        self._queue: list[tuple[int, int, EventHandle]] = []
+        # tiebreaker so events due on the same cycle fire in the order they were scheduled
+        self._counter = itertools.count()
+
+    def __repr__(self) -> str:
+        return f"EventScheduler(cycle={self.cycle}, pending={len(self)})"
+
+    def __len__(self) -> int:
+        return sum(1 for _, _, handle in self._queue if not handle.cancelled)
+
+    @property
+    def cycles_until_next(self) -> int:
+        return self.next_due - self.cycle
+
+    @property
+    def now(self) -> int:
+        """
+        The current cycle - while an instruction runs, the cycle it runs on, counting every instruction run since
+        the clock was last advanced.
+        """
+        if self._history is None:
+            return self.cycle
+        # the running instruction has already been recorded, but has not finished yet
+        return self.cycle + max(0, self._history.total - self._synced - 1)
+
+    def schedule_at(self, cycle: int, callback: EventCallbackFn) -> EventHandle:
+        if cycle <= self.now:
+            raise ValueError("Events must be scheduled for a future cycle")
+
+        handle = EventHandle(cycle, callback)
+        heapq.heappush(self._queue, (cycle, next(self._counter), handle))
+        self.next_due = min(self.next_due, cycle)
+        return handle
+
+    def schedule(self, delay: int, callback: EventCallbackFn) -> EventHandle:
+        return self.schedule_at(self.now + delay, callback)
+
+    def cancel(self, handle: EventHandle) -> None:
+        # cancelled events are discarded lazily when they reach the top of the heap
+        handle.cancelled = True
+        self._drop_cancelled()
+
+    def _drop_cancelled(self) -> None:
+        queue = self._queue
+        while queue and queue[0][2].cancelled:
+            heapq.heappop(queue)
+        self.next_due = queue[0][0] if queue else _NEVER
+
+    def advance(self, cycles: int) -> None:
+        # move the clock forwards, firing every event that becomes due in order - callbacks see the clock at
+        # the cycle the event was due, and may schedule further events
+        target = self.cycle + cycles
+        if self._history is not None:
+            self._synced = self._history.total
+        queue = self._queue
+        while queue and queue[0][0] <= target:
+            due, _, handle = heapq.heappop(queue)
+            if handle.cancelled:
+                continue
+
+            self.cycle = due
+            self.next_due = queue[0][0] if queue else _NEVER
+            handle.callback(due)
+
+        self.cycle = target
+        self._drop_cancelled()
+
+    def clear(self) -> None:
+        self._queue.clear()
+        self.next_due = _NEVER
@@ -0,0 +1,83 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+__all__ = ["DisassemblyCache"]
+
+import typing as t
+
+if t.TYPE_CHECKING:
+    from cpusim.backend import simulators
+
+
+class DisassemblyCache:
+    # Caches the disassembly of every (non mem-mapped) memory word, keyed by address and the word stored there.
+    # Only addresses written since the previous refresh are decoded again, so rendering the memory table costs
+    # time proportional to the number of writes rather than the size of memory.
+    __slots__ = ("_by_word", "_cpu", "_entries", "_written")
+
+    def __init__(self, cpu: simulators.CPU[t.Any]) -> None:
+        self._cpu = cpu
+        self._written = cpu.memory.track_writes()
+        # address -> (word, disassembly); None for mem-mapped addresses which must not be read when rendering
+        self._entries: list[tuple[int, str] | None] = []
+        # many addresses hold the same word (zeroes especially), so share the decoded text between them
+        self._by_word: dict[int, str] = {}
+
+    def __repr__(self) -> str:
+        return f"DisassemblyCache({len(self._entries)} entries, {len(self._by_word)} unique words)"
+
+    def close(self) -> None:
+        self._cpu.memory.untrack_writes(self._written)
+
+    def _load(self, address: int) -> tuple[int, str] | None:
+        memory = self._cpu.memory
+        if memory.is_mapped(address):
+            return None
+
+        word = memory.get(address).unsigned_value
+        if (text := self._by_word.get(word)) is None:
+            text = self._by_word[word] = self._cpu.disassemble(word)
+
+        return word, text
+
+    def refresh(self) -> set[int]:
+        """
+        Bring the cache up to date with memory.
+
+        Returns:
+            The addresses that were written since the previous refresh. On the first refresh every address is
+            returned.
+        """
+        if not self._entries:
+            self._written.clear()
+            self._entries = [self._load(addr) for addr in range(self._cpu.memory.size)]
+            return set(range(len(self._entries)))
+
+        written = set(self._written)
+        self._written.clear()
+
+        for addr in written:
+            self._entries[addr] = self._load(addr)
+
+        return written
+
+    def get(self, address: int) -> tuple[int, str] | None:
+        return self._entries[address]
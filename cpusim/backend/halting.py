@@ -0,0 +1,124 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+import typing as t
+
+from cpusim import analysis
+
+if t.TYPE_CHECKING:
+    from cpusim.backend import simulators
+
+__all__ = ["HaltLoopTable"]
+
+# every combination of the flags that jumps can test, in flag-index order (see HaltLoopTable.halts)
+_FLAG_STATES = ((False, False), (False, True), (True, False), (True, True))
+
+
+class HaltLoopTable:
+    """
+    Static analysis of the loaded memory image that finds every address which, once reached with a given
+    flag state, can never be left and does nothing while looping.
+
+    Such a loop can only consist of jump instructions - they are the only instructions with neither data nor
+    flag side effects - so the flags are constant inside it and each conditional jump always goes the same way.
+    For every flag state the jumps form a graph with at most one successor per address, and any address on a
+    cycle of that graph is a halt loop. This covers ``jumpu self``, multi-instruction ``jumpu`` rings and
+    conditional cycles like ``jumpz self`` entered with the zero flag set.
+
+    The table watches memory writes and is rebuilt if code that could take part in a loop is overwritten.
+    """
+
+    __slots__ = ("_cpu", "_jumps", "_writes", "masks")
+
+    def __init__(self, cpu: simulators.CPU[t.Any]) -> None:
+        self._cpu = cpu
+        self._writes = cpu.memory.track_writes()
+        # address -> jump-taken predicate for every jump instruction in the image
+        self._jumps: dict[int, tuple[t.Callable[[bool, bool], bool], int]] = {}
+        # bit n of masks[address] is set if entering the address with flag index n halts
+        self.masks = bytearray(cpu.memory.size)
+
+        self.rebuild()
+
+    def _decode_jump(self, address: int) -> tuple[t.Callable[[bool, bool], bool], int] | None:
+        memory = self._cpu.memory
+        if memory.is_mapped(address):
+            return None
+
+        try:
+            instruction, args = self._cpu.decode_word(memory.peek(address).unsigned_value)
+        except NotImplementedError:
+            return None
+
+        kind: type[object] = type(instruction)
+        if (taken := analysis.JUMP_CONDITIONS.get(kind)) is None:
+            return None
+        return taken, args[0]
+
+    def rebuild(self) -> None:
+        self._writes.clear()
+        size = self._cpu.memory.size
+
+        self._jumps.clear()
+        for address in range(size):
+            if (jump := self._decode_jump(address)) is not None:
+                self._jumps[address] = jump
+
+        masks = bytearray(size)
+        for index, (zero, carry) in enumerate(_FLAG_STATES):
+            successors = {
+                address: (target if taken(zero, carry) else address + 1)
+                for address, (taken, target) in self._jumps.items()
+            }
+
+            # walk from every jump, colouring addresses by the walk that first reached them - a walk that runs
+            # into an address it coloured itself has found a cycle
+            walk_of: dict[int, int] = {}
+            for start in successors:
+                if start in walk_of:
+                    continue
+
+                path: list[int] = []
+                address: int | None = start
+                while address is not None and address not in walk_of:
+                    walk_of[address] = start
+                    path.append(address)
+                    address = successors.get(address)
+
+                if address is not None and walk_of[address] == start:
+                    for on_cycle in path[path.index(address) :]:
+                        masks[on_cycle] |= 1 << index
+
+        self.masks = masks
+
+    def refresh(self) -> None:
+        # only writes to existing jumps, or writes which create new ones, can change the result
+        if any(address in self._jumps or self._decode_jump(address) is not None for address in self._writes):
+            self.rebuild()
+        self._writes.clear()
+
+    def halts(self, address: int, zero: bool, carry: bool) -> bool:
+        if not self.masks[address]:
+            return False
+
+        if self._writes:
+            self.refresh()
+        return bool((self.masks[address] >> ((zero << 1) | carry)) & 1)
@@ -0,0 +1,461 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+import typing as t
+
+from cpusim import analysis
+from cpusim.common.instructions import base
+from cpusim.common.instructions import utils
+from cpusim.common.instructions import xops
+from cpusim.common.instructions.v1a import primary as primary_1a
+from cpusim.common.instructions.v1d import primary as primary_1d
+from cpusim.common.instructions.v1d import secondary as secondary_1d
+from cpusim.common.types import Int16
+
+if t.TYPE_CHECKING:
+    from cpusim.backend import simulators
+
+__all__ = ["Trace", "TraceJIT"]
+
+# number of times a loop head must be reached by a backward branch before a trace through it is compiled
+HOT_THRESHOLD = 8
+# longest path (in instructions) that will be traced
+_MAX_TRACE_LENGTH = 64
+
+# (registers, flags, budget) -> (whole iterations run, instructions run of the final partial one, exit PC)
+_TraceFn = t.Callable[[list[int], list[bool], int], tuple[int, int, int]]
+
+
+# the condition, over the flag locals, under which each conditional jump is taken
+_GUARDS: dict[type[object], str] = {
+    primary_1a.JumpZ: "z",
+    primary_1a.JumpNZ: "not z",
+    primary_1d.JumpZ: "z",
+    primary_1d.JumpNZ: "not z",
+    primary_1d.JumpC: "c",
+}
+
+
+class _Unsupported(Exception):
+    """Raised while compiling a path that contains something a trace cannot handle."""
+
+
+class Trace:
+    """One compiled path around a hot loop, starting and ending at its head."""
+
+    __slots__ = ("_fn", "head", "jumps", "path", "source")
+
+    def __init__(
+        self, head: int, path: tuple[tuple[int, int], ...], jumps: tuple[int, ...], source: str, fn: _TraceFn
+    ) -> None:
+        self.head = head
+        # (address, instruction word) of every instruction on the path, in execution order
+        self.path = path
+        # addresses of every jump on the path, which must not be halt loops for the trace to be used
+        self.jumps = jumps
+        # the generated Python source, kept for debugging
+        self.source = source
+        self._fn = fn
+
+    @property
+    def length(self) -> int:
+        return len(self.path)
+
+    def __call__(self, regs: list[int], flags: list[bool], budget: int) -> tuple[int, int, int]:
+        return self._fn(regs, flags, budget)
+
+
+class _Compiler:
+    # Generates the source of a trace function. Registers and flags live in local variables (r0-r3 and n, p, o,
+    # c, z) for the whole run and are written back once at the end. Arithmetic mirrors the ALU and
+    # FixedWidthInt on plain unsigned ints. Every conditional jump becomes a guard that leaves the loop if it
+    # goes the other way than it did when the path was recorded.
+
+    __slots__ = ("_breakpoints", "_code", "_lines", "_memory", "_wide", "handlers")
+
+    def __init__(
+        self, cpu: simulators.CPU[t.Any], wide: bool, code: frozenset[int], breakpoints: t.AbstractSet[int]
+    ) -> None:
+        self._memory = cpu.memory
+        # whether this is a v1d CPU, with four 16 bit registers rather than an 8 bit accumulator
+        self._wide = wide
+        self._code = code
+        self._breakpoints = breakpoints
+        self._lines: list[str] = []
+        # name in the generated source -> user-defined XOP handler called by it
+        self.handlers: dict[str, xops.XopHandler] = {}
+
+    @property
+    def _mask(self) -> int:
+        return 0xFFFF if self._wide else 0xFF
+
+    @property
+    def _sign(self) -> int:
+        return 0x8000 if self._wide else 0x80
+
+    def _emit(self, line: str) -> None:
+        self._lines.append("        " + line)
+
+    def _exit(self, executed: int, pc: int, condition: str | None = None) -> None:
+        # leave the loop with `executed` instructions of the current iteration run and the CPU at pc
+        if condition is None:
+            self._emit(f"pos = {executed}; pc = {pc}; break")
+        else:
+            self._emit(f"if {condition}: pos = {executed}; pc = {pc}; break")
+
+    def _flags(self, result: str, overflow: str, carry: str) -> None:
+        self._emit(f"n = bool({result} & {self._sign}); z = {result} == 0; p = not n and not z")
+        self._emit(f"o = {overflow}; c = {carry}")
+
+    def _static_address(self, address: int, *, write: bool) -> int:
+        memory = self._memory
+        if address >= memory.size or memory.is_mapped(address):
+            raise _Unsupported("mem-mapped or out of bounds memory operand")
+        if write and address in self._code:
+            raise _Unsupported("stores into its own code")
+        return address
+
+    def _alu(self, op: str, dst: str, operand: str, live: bool) -> None:
+        mask, sign = self._mask, self._sign
+        if op in ("+", "-"):
+            self._emit(f"a = {dst}; b = {operand}")
+            if op == "+":
+                self._emit(f"raw = a + b; {dst} = raw & {mask}")
+                if live:
+                    self._flags(dst, f"not ((a ^ b) & {sign}) and bool((a ^ {dst}) & {sign})", f"raw > {mask}")
+            else:
+                self._emit(f"{dst} = (a - b) & {mask}")
+                if live:
+                    self._flags(dst, f"bool((a ^ b) & {sign}) and bool((a ^ {dst}) & {sign})", "False")
+            return
+
+        self._emit(f"{dst} = ({op.format(a=dst, b=operand)}) & {mask}")
+        if live:
+            self._flags(dst, "False", "False")
+
+    def instruction(
+        self,
+        index: int,
+        address: int,
+        instruction: base.Instruction[t.Any],
+        args: tuple[int, ...],
+        next_pc: int,
+        live: bool,
+    ) -> None:
+        kind: type[object] = type(instruction)
+        if index and address in self._breakpoints:
+            # stop in front of the breakpoint, exactly where the debugger would
+            self._exit(index, address)
+            return
+
+        if isinstance(instruction, xops.ExtendedInstruction):
+            self._xop(instruction, args)
+        elif self._wide:
+            self._instruction_1d(index, address, kind, args, live)
+        else:
+            self._instruction_1a(kind, args, live)
+
+        if kind in analysis.JUMP_CONDITIONS and kind not in (primary_1a.JumpU, primary_1d.JumpU):
+            taken = next_pc == args[0]
+            other = address + 1 if taken else args[0]
+            condition = _GUARDS[kind]
+            self._exit(index + 1, other, f"not ({condition})" if taken else condition)
+        elif next_pc != (args[0] if kind in analysis.JUMP_CONDITIONS else address + 1):
+            raise _Unsupported("path does not follow the program")
+
+    def _instruction_1a(self, kind: type[object], args: tuple[int, ...], live: bool) -> None:
+        # immediate instructions have args (0, KK), everything else (AA,)
+        if kind is primary_1a.Move:
+            self._emit(f"r0 = {args[1] & 0xFF}")
+        elif kind is primary_1a.Add:
+            self._alu("+", "r0", str(args[1] & 0xFF), live)
+        elif kind is primary_1a.Sub:
+            self._alu("-", "r0", str(args[1] & 0xFF), live)
+        elif kind is primary_1a.And:
+            self._alu("{a} & {b}", "r0", str(args[1] & 0xFF), live)
+        elif kind is primary_1a.Load:
+            self._emit(f"r0 = mget({self._static_address(args[0], write=False)}).unsigned_value & 0xFF")
+        elif kind is primary_1a.Store:
+            self._emit(f"mset({self._static_address(args[0], write=True)}, Int16(r0))")
+        elif kind in (primary_1a.AddM, primary_1a.SubM):
+            operand = f"mget({self._static_address(args[0], write=False)}).unsigned_value & 0xFF"
+            self._alu("+" if kind is primary_1a.AddM else "-", "r0", operand, live)
+        elif kind not in analysis.JUMP_CONDITIONS:
+            raise _Unsupported(f"cannot trace {kind.__name__}")
+
+    def _instruction_1d(self, index: int, address: int, kind: type[object], args: tuple[int, ...], live: bool) -> None:
+        if kind in analysis.JUMP_CONDITIONS:
+            return
+
+        if kind is primary_1d.Move:
+            self._emit(f"r{args[0]} = {utils.sign_extend_8_to_16_bits(args[1]).unsigned_value}")
+        elif kind in (primary_1d.Add, primary_1d.Sub):
+            constant = str(utils.sign_extend_8_to_16_bits(args[1]).unsigned_value)
+            self._alu("+" if kind is primary_1d.Add else "-", f"r{args[0]}", constant, live)
+        elif kind in (primary_1d.And, primary_1d.Or):
+            self._alu("{a} & {b}" if kind is primary_1d.And else "{a} | {b}", f"r{args[0]}", str(args[1]), live)
+        elif kind is primary_1d.Load:
+            self._emit(f"r0 = mget({self._static_address(args[0], write=False)}).unsigned_value")
+        elif kind is primary_1d.Store:
+            self._emit(f"mset({self._static_address(args[0], write=True)}, Int16(r0))")
+        elif kind in (primary_1d.AddM, primary_1d.SubM):
+            operand = f"mget({self._static_address(args[0], write=False)}).unsigned_value"
+            self._alu("+" if kind is primary_1d.AddM else "-", "r0", operand, live)
+        elif kind is secondary_1d.Move:
+            self._emit(f"r{args[0]} = r{args[1]}")
+        elif kind in _REGISTER_OPS_1D:
+            self._alu(_REGISTER_OPS_1D[kind], f"r{args[0]}", f"r{args[1]}", live)
+        elif kind in (secondary_1d.Load, secondary_1d.Store):
+            # the address is only known at run time - leave it to the interpreter if it is not plain RAM
+            self._emit(f"addr = r{args[1]}")
+            self._exit(index, address, "addr >= size or is_mapped(addr)")
+            if kind is secondary_1d.Load:
+                self._emit(f"r{args[0]} = mget(addr).unsigned_value")
+            else:
+                self._emit(f"mset(addr, Int16(r{args[0]}))")
+                # a store into the trace's own code ends it, so the new code is decoded before it runs
+                self._exit(index + 1, address + 1, "addr in code")
+        else:
+            raise _Unsupported(f"cannot trace {kind.__name__}")
+
+    def _xop(self, instruction: xops.ExtendedInstruction, args: tuple[int, ...]) -> None:
+        # the handler is called on the CPU itself, so whatever it declares it uses is written back to the CPU
+        # before the call and loaded again after it
+        definition = instruction.definition
+        if definition.writes_memory:
+            raise _Unsupported(f"{definition.name} writes to memory, which could be the trace's own code")
+        if definition.reads_memory and self._memory.regions:
+            raise _Unsupported(f"{definition.name} reads from memory, which could be mem-mapped")
+
+        name = f"xop{len(self.handlers)}"
+        self.handlers[name] = definition.handler
+        for register in instruction.reads(args):
+            self._emit(f"cpu.registers.set({register}, Int16(r{register}))")
+        if definition.flags:
+            self._emit("alu.negative, alu.positive, alu.overflow, alu.carry, alu.zero = n, p, o, c, z")
+        self._emit(f"{name}({args!r}, cpu)")
+        for register in instruction.writes(args):
+            self._emit(f"r{register} = cpu.registers.get({register}).unsigned_value")
+        if definition.flags:
+            self._emit("n, p, o, c, z = alu.flags")
+
+    def source(self, head: int, length: int, registers: int) -> str:
+        names = ", ".join(f"r{i}" for i in range(registers))
+        loads = ", ".join(f"regs[{i}]" for i in range(registers))
+        lines = [
+            "def trace(regs, flags, budget):",
+            f"    {names}, = {loads},",
+            "    n, p, o, c, z = flags",
+            f"    k, pos, pc = 0, 0, {head}",
+            f"    limit = budget // {length}",
+            "    while k < limit:",
+            *self._lines,
+            "        k += 1",
+            f"    {loads}, = {names},",
+            "    flags[:] = n, p, o, c, z",
+            "    return k, pos, pc",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+_REGISTER_OPS_1D: dict[type[object], str] = {
+    secondary_1d.Add: "+",
+    secondary_1d.Sub: "-",
+    secondary_1d.And: "{a} & {b}",
+    secondary_1d.Or: "{a} | {b}",
+    secondary_1d.Xor: "{a} ^ {b}",
+    secondary_1d.Rol: "({a} << 1) | ({a} >> 15)",
+    secondary_1d.Ror: "({a} >> 1) | (({a} & 1) << 15)",
+    secondary_1d.Asl: "({a} << 1) & 0xFFFE",
+}
+
+
+class TraceJIT:
+    """
+    Tracing tier for hot loops, including loops made of several basic blocks.
+
+    Every backward branch counts a hit on its target. Once a loop head is hot, the path of the iteration that
+    just ran is read back out of the instruction history and compiled into a single Python function (see
+    _Compiler), which runs whole iterations internally until a guard fails, the budget runs out, or it reaches a
+    breakpoint. Checks for breakpoints are only compiled into traces which pass over one.
+
+    Traces never run a mem-mapped access - those are left to the interpreter - so the history can be filled in
+    once the trace returns and no device sees a stale instruction count. Traces through a jump that could be a
+    halt loop are not run, and traces are dropped when their code is overwritten or the breakpoints change.
+    """
+
+    __slots__ = (
+        "_arrivals",
+        "_breakpoints",
+        "_cpu",
+        "_hits",
+        "_owners",
+        "_traces",
+        "_writes",
+        "instructions_traced",
+        "threshold",
+    )
+
+    def __init__(self, cpu: simulators.CPU[t.Any], threshold: int = HOT_THRESHOLD) -> None:
+        self._cpu = cpu
+        self.threshold = threshold
+        self._writes = cpu.memory.track_writes()
+        self._breakpoints: frozenset[int] = frozenset()
+        # loop head -> compiled trace, or None if the loop cannot be traced
+        self._traces: dict[int, Trace | None] = {}
+        # loop head -> backward branches to it so far, and the history total when it was last reached
+        self._hits: dict[int, int] = {}
+        self._arrivals: dict[int, int] = {}
+        # address -> loop heads whose trace (or failure to trace) depends on the word at that address
+        self._owners: dict[int, list[int]] = {}
+
+        self.instructions_traced = 0
+
+    def close(self) -> None:
+        self._cpu.memory.untrack_writes(self._writes)
+
+    @property
+    def traces(self) -> dict[int, Trace]:
+        return {head: trace for head, trace in self._traces.items() if trace is not None}
+
+    def _invalidate(self) -> None:
+        for address in self._writes:
+            for head in self._owners.pop(address, ()):
+                self._traces.pop(head, None)
+                self._hits.pop(head, None)
+        self._writes.clear()
+
+    def _record(self, head: int, since: int) -> Trace | None:
+        cpu = self._cpu
+        history, memory = cpu.history, cpu.memory
+
+        length = history.total - since
+        path = tuple(history.entries()[-length:]) if 0 < length <= min(_MAX_TRACE_LENGTH, len(history)) else ()
+        for address, _ in path or ((head, 0),):
+            self._owners.setdefault(address, []).append(head)
+        if not path or path[0][0] != head:
+            return None
+
+        decoded: list[tuple[base.Instruction[t.Any], tuple[int, ...]]] = []
+        for address, word in path:
+            if memory.is_mapped(address) or memory.get(address).unsigned_value != word:
+                return None
+            try:
+                decoded.append(cpu.decode_word(word))
+            except NotImplementedError:
+                return None
+
+        # flag liveness along the path - every exit from the trace (a guard, an access left to the interpreter,
+        # a breakpoint, or the end of an iteration) can be observed, so flags are live at each of them
+        live = analysis.Flag.ALL
+        live_after: list[bool] = [True] * len(path)
+        for i in range(len(path) - 1, -1, -1):
+            instruction, _ = decoded[i]
+            kind: type[object] = type(instruction)
+            reads, writes = analysis.flag_effects(kind)
+            if reads:
+                live = analysis.Flag.ALL
+            live_after[i] = bool(writes & live)
+            live = (live & ~writes) | reads
+            if kind in (secondary_1d.Load, secondary_1d.Store) or (i and path[i][0] in self._breakpoints):
+                live = analysis.Flag.ALL
+
+        wide = isinstance(decoded[0][0], base.Instruction1d)
+        compiler = _Compiler(cpu, wide, frozenset(address for address, _ in path), self._breakpoints)
+        try:
+            for i, ((address, _), (instruction, args)) in enumerate(zip(path, decoded)):
+                next_pc = path[i + 1][0] if i + 1 < len(path) else head
+                compiler.instruction(i, address, instruction, args, next_pc, live_after[i])
+        except _Unsupported:
+            return None
+
+        source = compiler.source(head, len(path), 4 if wide else 1)
+        namespace: dict[str, t.Any] = {
+            "mget": memory.get,
+            "mset": memory.set,
+            "is_mapped": memory.is_mapped,
+            "size": memory.size,
+            "code": frozenset(address for address, _ in path),
+            "Int16": Int16,
+            "cpu": cpu,
+            "alu": getattr(cpu, "alu", None),
+            **compiler.handlers,
+        }
+        exec(compile(source, f"<trace {hex(head)}>", "exec"), namespace)
+        jumps = tuple(
+            address
+            for (address, _), (instruction, _) in zip(path, decoded)
+            if type(instruction) in analysis.JUMP_CONDITIONS
+        )
+        return Trace(head, path, jumps, source, namespace["trace"])
+
+    def enter(self, head: int, budget: int, detect_halt_loop: bool) -> int:
+        # Called when a backward branch lands on head. Runs the trace starting there, if there is one and it is
+        # safe to, for at most budget instructions - returns the number run.
+        if self._writes:
+            self._invalidate()
+
+        cpu = self._cpu
+        if self._breakpoints.symmetric_difference(cpu.breakpoints):
+            # traces have the breakpoints they pass over compiled in
+            self._breakpoints = frozenset(cpu.breakpoints)
+            self._traces.clear()
+            self._owners.clear()
+        if head in self._breakpoints:
+            return 0
+
+        if (trace := self._traces.get(head)) is None:
+            if head in self._traces:
+                return 0
+
+            hits = self._hits[head] = self._hits.get(head, 0) + 1
+            since, self._arrivals[head] = self._arrivals.get(head), cpu.history.total
+            if hits < self.threshold or since is None:
+                return 0
+            trace = self._traces[head] = self._record(head, since)
+            if trace is None:
+                return 0
+
+        if detect_halt_loop:
+            masks = cpu.halt_table.masks
+            if any(masks[address] for address in trace.jumps):
+                return 0
+
+        state = cpu.architectural_state()
+        regs, flags = [int(value) for value in state[1:-5]], [bool(flag) for flag in state[-5:]]
+        iterations, partial, pc = trace(regs, flags, budget)
+        if not (iterations or partial):
+            return 0
+
+        history, path, length = cpu.history, trace.path, trace.length
+        if iterations:
+            for address, word in path:
+                history.record(address, word)
+            history.repeat(length, iterations - 1)
+        for address, word in path[:partial]:
+            history.record(address, word)
+
+        cpu.restore_architectural_state((pc, *regs, *flags))
+        cpu.ir.set(path[partial - 1][1] if partial else path[-1][1])
+
+        executed = iterations * length + partial
+        self.instructions_traced += executed
+        return executed
@@ -0,0 +1,361 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+import math
+import typing as t
+
+from cpusim import analysis
+from cpusim.common.instructions import base
+from cpusim.common.instructions import utils
+from cpusim.common.instructions.v1a import primary as primary_1a
+from cpusim.common.instructions.v1d import primary as primary_1d
+from cpusim.common.instructions.v1d import secondary as secondary_1d
+
+if t.TYPE_CHECKING:
+    from cpusim.backend import simulators
+
+__all__ = ["CountedLoop", "LoopAccelerator"]
+
+# longest loop (in instructions, including the closing jump) that will be considered for acceleration
+_MAX_LOOP_LENGTH = 64
+
+# (negative, positive, overflow, carry, zero) - the same order as ALU.flags
+_Flags = tuple[bool, bool, bool, bool, bool]
+# applies one instruction to the register values in place, returning the new flags or None if it sets none
+_OpFn = t.Callable[[list[int]], "_Flags | None"]
+
+
+class _Op(t.NamedTuple):
+    fn: _OpFn
+    dst: int
+    # the constant added to dst modulo the register width, if the instruction is a plain add or subtract
+    delta: int | None
+
+
+def _result_flags(result: int, sign: int, overflow: bool, carry: bool) -> _Flags:
+    negative = bool(result & sign)
+    return negative, not negative and result != 0, overflow, carry, result == 0
+
+
+# The builders below mirror the ALU and FixedWidthInt arithmetic on plain unsigned ints - a src of None means
+# the operand is the immediate constant instead of a register.
+
+
+def _move(dst: int, src: int | None, const: int) -> _OpFn:
+    def op(regs: list[int]) -> _Flags | None:
+        regs[dst] = const if src is None else regs[src]
+        return None
+
+    return op
+
+
+def _add(dst: int, src: int | None, const: int, mask: int, flags: bool) -> _OpFn:
+    sign = (mask >> 1) + 1
+
+    def op_without_flags(regs: list[int]) -> _Flags | None:
+        regs[dst] = (regs[dst] + (const if src is None else regs[src])) & mask
+        return None
+
+    def op(regs: list[int]) -> _Flags | None:
+        a, b = regs[dst], const if src is None else regs[src]
+        raw = a + b
+        regs[dst] = result = raw & mask
+        # overflow if both operands have the same sign and the result does not
+        return _result_flags(result, sign, not ((a ^ b) & sign) and bool((a ^ result) & sign), raw > mask)
+
+    return op if flags else op_without_flags
+
+
+def _sub(dst: int, src: int | None, const: int, mask: int, flags: bool) -> _OpFn:
+    sign = (mask >> 1) + 1
+
+    def op_without_flags(regs: list[int]) -> _Flags | None:
+        regs[dst] = (regs[dst] - (const if src is None else regs[src])) & mask
+        return None
+
+    def op(regs: list[int]) -> _Flags | None:
+        a, b = regs[dst], const if src is None else regs[src]
+        regs[dst] = result = (a - b) & mask
+        # overflow if the operands differ in sign and the result does not have the sign of the first
+        return _result_flags(result, sign, bool((a ^ b) & sign) and bool((a ^ result) & sign), False)
+
+    return op if flags else op_without_flags
+
+
+def _logic(fn: t.Callable[[int, int], int], dst: int, src: int | None, const: int, mask: int, flags: bool) -> _OpFn:
+    sign = (mask >> 1) + 1
+
+    def op_without_flags(regs: list[int]) -> _Flags | None:
+        regs[dst] = fn(regs[dst], const if src is None else regs[src]) & mask
+        return None
+
+    def op(regs: list[int]) -> _Flags | None:
+        regs[dst] = result = fn(regs[dst], const if src is None else regs[src]) & mask
+        return _result_flags(result, sign, False, False)
+
+    return op if flags else op_without_flags
+
+
+def _imm_8(args: tuple[int, ...]) -> int:
+    return args[1] & 0xFF
+
+
+def _imm_16(args: tuple[int, ...]) -> int:
+    return utils.sign_extend_8_to_16_bits(args[1]).unsigned_value
+
+
+_OP_BUILDERS: dict[type[object], t.Callable[[tuple[int, ...], bool], _Op]] = {
+    # v1a - the only register is the 8 bit accumulator
+    primary_1a.Move: lambda args, flags: _Op(_move(0, None, _imm_8(args)), 0, None),
+    primary_1a.Add: lambda args, flags: _Op(_add(0, None, _imm_8(args), 0xFF, flags), 0, _imm_8(args)),
+    primary_1a.Sub: lambda args, flags: _Op(_sub(0, None, _imm_8(args), 0xFF, flags), 0, -_imm_8(args) & 0xFF),
+    primary_1a.And: lambda args, flags: _Op(_logic(int.__and__, 0, None, _imm_8(args), 0xFF, flags), 0, None),
+    # v1d immediate mode - and/or constants are not sign extended
+    primary_1d.Move: lambda args, flags: _Op(_move(args[0], None, _imm_16(args)), args[0], None),
+    primary_1d.Add: lambda args, flags: _Op(_add(args[0], None, _imm_16(args), 0xFFFF, flags), args[0], _imm_16(args)),
+    primary_1d.Sub: lambda args, flags: _Op(
+        _sub(args[0], None, _imm_16(args), 0xFFFF, flags), args[0], -_imm_16(args) & 0xFFFF
+    ),
+    primary_1d.And: lambda args, flags: _Op(_logic(int.__and__, args[0], None, args[1], 0xFFFF, flags), args[0], None),
+    primary_1d.Or: lambda args, flags: _Op(_logic(int.__or__, args[0], None, args[1], 0xFFFF, flags), args[0], None),
+    # v1d register mode
+    secondary_1d.Move: lambda args, flags: _Op(_move(args[0], args[1], 0), args[0], None),
+    secondary_1d.Add: lambda args, flags: _Op(_add(args[0], args[1], 0, 0xFFFF, flags), args[0], None),
+    secondary_1d.Sub: lambda args, flags: _Op(_sub(args[0], args[1], 0, 0xFFFF, flags), args[0], None),
+    secondary_1d.And: lambda args, flags: _Op(_logic(int.__and__, args[0], args[1], 0, 0xFFFF, flags), args[0], None),
+    secondary_1d.Or: lambda args, flags: _Op(_logic(int.__or__, args[0], args[1], 0, 0xFFFF, flags), args[0], None),
+    secondary_1d.Xor: lambda args, flags: _Op(_logic(int.__xor__, args[0], args[1], 0, 0xFFFF, flags), args[0], None),
+    secondary_1d.Rol: lambda args, flags: _Op(
+        _logic(lambda a, _: (a << 1) | (a >> 15), args[0], None, 0, 0xFFFF, flags), args[0], None
+    ),
+    secondary_1d.Ror: lambda args, flags: _Op(
+        _logic(lambda a, _: (a >> 1) | (a << 15), args[0], None, 0, 0xFFFF, flags), args[0], None
+    ),
+    secondary_1d.Asl: lambda args, flags: _Op(
+        _logic(lambda a, _: (a << 1) & 0xFFFE, args[0], None, 0, 0xFFFF, flags), args[0], None
+    ),
+}
+
+
+_UNCONDITIONAL_JUMPS = (primary_1a.JumpU, primary_1d.JumpU)
+_NON_ZERO_JUMPS = (primary_1a.JumpNZ, primary_1d.JumpNZ)
+
+
+class CountedLoop:
+    """
+    A loop made of a single straight run of register-only arithmetic, closed by a jump back to its first
+    instruction. Nothing in it touches memory, so an iteration depends only on the registers and flags.
+    """
+
+    __slots__ = ("_unconditional", "batch_ops", "head", "latch", "modulus", "ops", "taken", "translation", "words")
+
+    def __init__(
+        self,
+        head: int,
+        words: tuple[int, ...],
+        ops: tuple[_Op, ...],
+        batch_ops: tuple[_Op, ...],
+        jump: type[object],
+        modulus: int,
+    ) -> None:
+        self.head = head
+        # address of the closing jump
+        self.latch = head + len(ops)
+        # raw instruction words from the head to the closing jump, for the instruction history
+        self.words = words
+        self.ops = ops
+        # the same operations with dead flag writes removed, for running iterations back to back
+        self.batch_ops = batch_ops
+        self.taken = analysis.JUMP_CONDITIONS[jump]
+        self.modulus = modulus
+        self._unconditional = jump in _UNCONDITIONAL_JUMPS
+
+        # If every instruction is an add or subtract of a constant, an iteration just adds a fixed amount to
+        # each register it touches, so any number of iterations can be computed in closed form. That is only
+        # used when the loop either never exits or exits once the last register written reaches zero.
+        self.translation: dict[int, int] | None = None
+        if all(op.delta is not None for op in ops) and (self._unconditional or jump in _NON_ZERO_JUMPS):
+            translation: dict[int, int] = {}
+            for op in ops:
+                translation[op.dst] = (translation.get(op.dst, 0) + (op.delta or 0)) % modulus
+            self.translation = translation
+
+    @property
+    def length(self) -> int:
+        return len(self.words)
+
+    def trip_count(self, regs: t.Sequence[int]) -> int | None:
+        # the iteration in which a closed form loop exits when entered with the given registers, or None if it
+        # never does
+        assert self.translation is not None
+        if self._unconditional:
+            return None
+
+        # the loop exits once counter + k * delta == 0 (mod 2**width) - solve for the smallest k >= 1
+        counter = self.ops[-1].dst
+        delta, target = self.translation[counter], -regs[counter] % self.modulus
+        g = math.gcd(delta, self.modulus)
+        if target % g:
+            return None
+
+        period = self.modulus // g
+        k = (target // g) * pow(delta // g, -1, period) % period if period > 1 else 0
+        return k or period
+
+
+def _batch_ops(
+    decoded: list[tuple[t.Callable[[tuple[int, ...], bool], _Op], tuple[int, ...], type[object]]],
+) -> tuple[_Op, ...]:
+    # Flag liveness around the loop: all flags are live after the final iteration, and the closing jump reads
+    # them after every other one, so only the flags of the last flag-setting instruction are ever read. Any
+    # earlier flag write is overwritten by it within the same iteration and is dead.
+    ops: list[_Op] = []
+    live = analysis.Flag.ALL
+    for builder, args, kind in reversed(decoded):
+        reads, writes = analysis.flag_effects(kind)
+        ops.append(builder(args, bool(writes & live)))
+        live = (live & ~writes) | reads
+    return tuple(reversed(ops))
+
+
+class LoopAccelerator:
+    """
+    Runs counted loops without going through the interpreter.
+
+    Loops are recognised lazily at the target of each backward branch and cached until the code is overwritten.
+    An accelerated run computes the registers and flags on plain ints - in closed form for loops which only add
+    constants, otherwise in a tight Python loop - and leaves the CPU in exactly the state, and with exactly the
+    instruction history, that interpreting the same instructions would have. If the loop exits within the
+    budget the CPU is left on the closing jump, so the interpreter still executes it and any halt-loop check
+    there behaves as normal.
+    """
+
+    __slots__ = ("_cpu", "_loops", "_owners", "_writes")
+
+    def __init__(self, cpu: simulators.CPU[t.Any]) -> None:
+        self._cpu = cpu
+        self._writes = cpu.memory.track_writes()
+        # head -> the loop starting there, or None if there is not one
+        self._loops: dict[int, CountedLoop | None] = {}
+        # address -> heads whose cached entry depends on the word at that address
+        self._owners: dict[int, list[int]] = {}
+
+    def close(self) -> None:
+        self._cpu.memory.untrack_writes(self._writes)
+
+    def _invalidate(self) -> None:
+        for address in self._writes:
+            for head in self._owners.pop(address, ()):
+                self._loops.pop(head, None)
+        self._writes.clear()
+
+    def _recognise(self, head: int) -> tuple[CountedLoop | None, int]:
+        # returns the loop at head (if any) and the last address that was looked at
+        cpu, memory = self._cpu, self._cpu.memory
+        limit = min(head + min(_MAX_LOOP_LENGTH, cpu.history.size), memory.size)
+
+        decoded: list[tuple[t.Callable[[tuple[int, ...], bool], _Op], tuple[int, ...], type[object]]] = []
+        words: list[int] = []
+        for address in range(head, limit):
+            if memory.is_mapped(address):
+                return None, address
+
+            word = memory.get(address).unsigned_value
+            try:
+                instruction, args = cpu.decode_word(word)
+            except NotImplementedError:
+                return None, address
+
+            kind: type[object] = type(instruction)
+            words.append(word)
+            if kind in analysis.JUMP_CONDITIONS:
+                if args[0] != head or not decoded:
+                    return None, address
+                modulus = 0x100 if isinstance(instruction, base.Instruction1a) else 0x10000
+                ops = tuple(builder(args_, True) for builder, args_, _ in decoded)
+                return CountedLoop(head, tuple(words), ops, _batch_ops(decoded), kind, modulus), address
+
+            if (builder := _OP_BUILDERS.get(kind)) is None:
+                return None, address
+            decoded.append((builder, args, kind))
+
+        return None, limit - 1
+
+    def find(self, head: int) -> CountedLoop | None:
+        if self._writes:
+            self._invalidate()
+
+        if head in self._loops:
+            return self._loops[head]
+
+        loop, end = self._recognise(head)
+        self._loops[head] = loop
+        for address in range(head, end + 1):
+            self._owners.setdefault(address, []).append(head)
+        return loop
+
+    def run(self, loop: CountedLoop, budget: int) -> int:
+        # Runs the loop from its head for at most budget instructions, returning the number accounted for. Only
+        # whole iterations are run, except that the closing jump of the final iteration is left to the caller.
+        length = loop.length
+        if budget < length:
+            return 0
+
+        cpu = self._cpu
+        state = cpu.architectural_state()
+        regs, flags = list(state[1:-5]), t.cast("_Flags", state[-5:])
+        taken, ops, batch_ops = loop.taken, loop.ops, loop.batch_ops
+
+        iterations, max_iterations, exited = 0, budget // length, False
+        if loop.translation is not None:
+            trips = loop.trip_count(regs)
+            exited = trips is not None and trips <= max_iterations
+            iterations = trips if exited and trips is not None else max_iterations
+            # jump straight to the start of the last iteration, then run it for real to get the flags
+            for register, delta in loop.translation.items():
+                regs[register] = (regs[register] + delta * (iterations - 1)) % loop.modulus
+            for op in ops:
+                if (new_flags := op.fn(regs)) is not None:
+                    flags = new_flags
+        else:
+            while iterations < max_iterations:
+                iterations += 1
+                for op in batch_ops:
+                    if (new_flags := op.fn(regs)) is not None:
+                        flags = new_flags
+                if not taken(flags[4], flags[3]):
+                    exited = True
+                    break
+
+        history = cpu.history
+        full = iterations - exited
+        if full:
+            for offset, word in enumerate(loop.words):
+                history.record(loop.head + offset, word)
+            history.repeat(length, full - 1)
+        if exited:
+            for offset, word in enumerate(loop.words[:-1]):
+                history.record(loop.head + offset, word)
+
+        cpu.restore_architectural_state((loop.latch if exited else loop.head, *regs, *flags))
+        # IR holds the last instruction run - the closing jump, or the one before it if the loop is left
+        cpu.ir.set(loop.words[-2 if exited else -1])
+        return full * length + exited * (length - 1)
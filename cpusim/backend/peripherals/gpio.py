@@ -31,12 +31,29 @@ if t.TYPE_CHECKING:
 class GPIODevice(abc.ABC):
     __slots__ = ()
 
+    # boolean attributes driven from outside the simulation (e.g. by stimulus files) and those driven by the
+    # program, for tools which need to set or observe device state without knowing the device type
+    INPUTS: t.ClassVar[tuple[str, ...]] = ()
+    OUTPUTS: t.ClassVar[tuple[str, ...]] = ()
+
     @abc.abstractmethod
     def on_gpio_read(self, offset: t.Literal[0, 1]) -> Int16: ...
 
     @abc.abstractmethod
     def on_gpio_write(self, offset: t.Literal[0, 1], val: Int16) -> None: ...
 
+    def snapshot(self) -> tuple[t.Any, ...]:
+        # everything about the device that can influence the program - by default its inputs and outputs
+        return tuple(getattr(self, field) for field in (*self.INPUTS, *self.OUTPUTS))
+
+    def is_pure_read(self, offset: t.Literal[0, 1]) -> bool:
+        # whether reading the given offset has no side effects and returns a value which can only change
+        # through a write or a scheduled event - devices opt in to allow idle polling loops to be skipped
+        return False
+
+
+DeviceT = t.TypeVar("DeviceT", bound=GPIODevice)
+
 
 class GPIOConfig(t.NamedTuple):
     ports: int
@@ -47,24 +64,61 @@ DEFAULT_CONFIG = GPIOConfig(2, 0xFC)
 
 
 class GPIO:
-    __slots__ = ("_cfg", "_cpu", "_devices")
+    __slots__ = ("_cfg", "_cpu", "_devices", "_read_listeners", "_write_listeners")
 
     def __init__(self, cpu: simulators.CPU[t.Any], cfg: GPIOConfig = DEFAULT_CONFIG) -> None:
         self._cpu = cpu
-        cpu.memory.memmap("gpio", list(range(cfg.map_to, cfg.map_to + (2 * cfg.ports))), self.on_read, self.on_write)
+        cpu.memory.memmap(
+            "gpio",
+            range(cfg.map_to, cfg.map_to + (2 * cfg.ports)),
+            self.on_read,
+            self.on_write,
+            is_pure_read=self.is_pure_read,
+        )
         self._cfg = cfg
 
         self._devices: list[GPIODevice | None] = [None for _ in range(cfg.ports)]
+        self._read_listeners: list[t.Callable[[int, Int16], None]] = []
+        self._write_listeners: list[t.Callable[[GPIODevice], None]] = []
+
+    @property
+    def config(self) -> GPIOConfig:
+        return self._cfg
 
     def set_device(self, port: int, device: GPIODevice | None) -> None:
         self._devices[port] = device
 
+    def add_read_listener(self, listener: t.Callable[[int, Int16], None]) -> None:
+        # listeners are called with the address and the value returned to the program after every read
+        self._read_listeners.append(listener)
+
+    def add_write_listener(self, listener: t.Callable[[GPIODevice], None]) -> None:
+        # listeners are called with the device after every write to one of its ports
+        self._write_listeners.append(listener)
+
+    def find_device(self, device_type: type[DeviceT]) -> DeviceT | None:
+        return next((d for d in self._devices if isinstance(d, device_type)), None)
+
     def on_read(self, address: int) -> Int16:
         port, offset = (rel := (address - self._cfg.map_to)) // 2, rel % 2
-        if (device := self._devices[port]) is None:
-            return Int16(0)
+        device = self._devices[port]
+        value = Int16(0) if device is None else device.on_gpio_read(offset)  # type: ignore[reportArgumentType]
+
+        for listener in self._read_listeners:
+            listener(address, value)
+        return value
+
+    def snapshot(self) -> tuple[tuple[t.Any, ...] | None, ...]:
+        return tuple(None if device is None else device.snapshot() for device in self._devices)
 
-        return device.on_gpio_read(offset)  # type: ignore[reportArgumentType]
+    def is_pure_read(self, address: int) -> bool:
+        if self._read_listeners:
+            # listeners expect to see every read
+            return False
+
+        port, offset = (rel := (address - self._cfg.map_to)) // 2, rel % 2
+        device = self._devices[port]
+        return device is None or device.is_pure_read(offset)  # type: ignore[reportArgumentType]
 
     def on_write(self, address: int, val: Int16) -> None:
         port, offset = (rel := (address - self._cfg.map_to)) // 2, rel % 2
@@ -72,6 +126,8 @@ class GPIO:
             return
 
         device.on_gpio_write(offset, val)  # type: ignore[reportArgumentType]
+        for listener in self._write_listeners:
+            listener(device)
 
 
 class BugTrap(GPIODevice):
@@ -84,6 +140,9 @@ class BugTrap(GPIODevice):
         "trap_closed",
     )
 
+    INPUTS = ("sensor_1_triggered", "sensor_2_triggered", "mode_switch_manual", "fire_button_pressed")
+    OUTPUTS = ("trap_closed", "led_on")
+
     def __init__(self) -> None:
         self.sensor_1_triggered = False
         self.sensor_2_triggered = False
@@ -105,6 +164,10 @@ class BugTrap(GPIODevice):
             + (int(self.fire_button_pressed))
         )
 
+    def is_pure_read(self, offset: t.Literal[0, 1]) -> bool:
+        # inputs only change when toggled in the GUI between runs, or by scheduled stimulus events
+        return True
+
     def on_gpio_write(self, offset: t.Literal[0, 1], val: Int16) -> None:
         if offset == 1:
             return
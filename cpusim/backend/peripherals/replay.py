@@ -0,0 +1,146 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+import struct
+import typing as t
+
+from cpusim.common.types import Int16
+
+if t.TYPE_CHECKING:
+    from cpusim.backend import simulators
+    from cpusim.backend.peripherals import gpio
+
+__all__ = ["InputRecorder", "InputReplayer", "ReplayError"]
+
+# Log layout: a fixed header of (magic, version, GPIO base address, port count) followed by one entry per
+# read - the number of instructions executed since the previous entry as an unsigned LEB128 varint, the
+# word offset from the base address as a byte, and the value returned as a big-endian 16-bit word. Reads
+# are usually close together so a typical entry is four bytes.
+_MAGIC = b"CPSR"
+_VERSION = 1
+_HEADER = struct.Struct(">4sBHH")
+
+
+class ReplayError(Exception):
+    """Raised when a replay log is malformed, or the replayed program diverges from the recorded one."""
+
+
+class InputRecorder:
+    """
+    Logs every value returned to the program by GPIO reads, together with the instruction count at which the
+    read happened, so that the run can later be replayed without the devices that produced the values.
+    """
+
+    __slots__ = ("_cpu", "_data", "_last_cycle", "_map_to", "count")
+
+    def __init__(self, cpu: simulators.CPU[t.Any], gpio_: gpio.GPIO) -> None:
+        self._cpu = cpu
+        self._map_to = gpio_.config.map_to
+        self._data = bytearray(_HEADER.pack(_MAGIC, _VERSION, gpio_.config.map_to, gpio_.config.ports))
+        self._last_cycle = 0
+        self.count = 0
+
+        gpio_.add_read_listener(self._on_read)
+
+    def _on_read(self, address: int, value: Int16) -> None:
+        cycle = self._cpu.history.total
+        delta, self._last_cycle = cycle - self._last_cycle, cycle
+
+        data = self._data
+        while delta >= 0x80:
+            data.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        data.append(delta)
+        data.append(address - self._map_to)
+        data += value.unsigned_value.to_bytes(2, "big")
+        self.count += 1
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._data)
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(self._data)
+
+
+class InputReplayer:
+    """
+    Stands in for the GPIO block of a recorded run, returning the logged values to the program in order.
+    Writes are discarded. Every read is checked against the instruction count and address it was recorded
+    at, so a program that behaves differently to the recorded one fails loudly instead of silently drifting.
+    """
+
+    __slots__ = ("_addresses", "_cpu", "_cycles", "_index", "_values")
+
+    def __init__(self, cpu: simulators.CPU[t.Any], data: bytes) -> None:
+        if len(data) < _HEADER.size:
+            raise ReplayError("replay log is truncated")
+
+        magic, version, map_to, ports = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ReplayError("not a replay log, or written by an incompatible version")
+
+        self._cpu = cpu
+        self._cycles: list[int] = []
+        self._addresses: list[int] = []
+        self._values: list[Int16] = []
+        self._index = 0
+
+        pos, cycle = _HEADER.size, 0
+        try:
+            while pos < len(data):
+                delta, shift = 0, 0
+                while data[pos] & 0x80:
+                    delta |= (data[pos] & 0x7F) << shift
+                    pos, shift = pos + 1, shift + 7
+                cycle += delta | (data[pos] << shift)
+                if pos + 4 > len(data):
+                    raise IndexError
+
+                self._cycles.append(cycle)
+                self._addresses.append(map_to + data[pos + 1])
+                self._values.append(Int16(int.from_bytes(data[pos + 2 : pos + 4], "big")))
+                pos += 4
+        except IndexError:
+            raise ReplayError("replay log is truncated") from None
+
+        cpu.memory.memmap("gpio-replay", range(map_to, map_to + (2 * ports)), self._on_read, self._on_write)
+
+    @property
+    def remaining(self) -> int:
+        return len(self._values) - self._index
+
+    def _on_read(self, address: int) -> Int16:
+        if (i := self._index) >= len(self._values):
+            raise ReplayError(f"program read {hex(address)} after the end of the replay log")
+
+        cycle = self._cpu.history.total
+        if self._cycles[i] != cycle or self._addresses[i] != address:
+            raise ReplayError(
+                f"replay diverged: read {hex(address)} at instruction {cycle}, "
+                f"but the log expects {hex(self._addresses[i])} at instruction {self._cycles[i]}"
+            )
+
+        self._index += 1
+        return self._values[i]
+
+    def _on_write(self, address: int, value: Int16) -> None:
+        pass
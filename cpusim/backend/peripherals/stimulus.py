@@ -0,0 +1,160 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+import collections
+import typing as t
+
+from cpusim.backend.peripherals import gpio
+
+if t.TYPE_CHECKING:
+    from cpusim.backend import simulators
+
+__all__ = ["DEVICE_TYPES", "OutputRecorder", "Stimulus", "StimulusError", "parse_stimulus", "schedule_stimulus"]
+
+DEVICE_TYPES: dict[str, type[gpio.GPIODevice]] = {"bugtrap": gpio.BugTrap}
+"""Names that stimulus files use to refer to each type of GPIO device."""
+
+_BOOL_VALUES = {"0": False, "1": True, "false": False, "true": True, "off": False, "on": True}
+
+
+class StimulusError(Exception):
+    """Raised when a stimulus file is malformed or refers to a device that is not attached."""
+
+
+class Stimulus(t.NamedTuple):
+    cycle: int
+    device: str
+    field: str
+    value: bool
+
+
+def parse_stimulus(contents: str) -> list[Stimulus]:
+    """
+    Parse a stimulus file. Each non-blank line that does not start with '#' has the form
+    ``CYCLE DEVICE.FIELD VALUE``, e.g. ``1200 bugtrap.sensor_1_triggered 1``. The value is applied once
+    ``CYCLE`` instructions have been executed. Values may be 0/1, true/false or on/off.
+
+    Args:
+        contents: The stimulus file source.
+
+    Returns:
+        The parsed input changes, ordered by cycle (lines sharing a cycle keep their file order).
+
+    Raises:
+        :obj:`StimulusError`: If any line could not be parsed.
+    """
+    stimuli: list[Stimulus] = []
+    for lineno, line in enumerate(contents.splitlines(), start=1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+
+        parts = line.split()
+        if len(parts) != 3 or "." not in parts[1]:
+            raise StimulusError(f"line {lineno}: expected 'CYCLE DEVICE.FIELD VALUE', got {line!r}")
+
+        cycle_str, target, value_str = parts
+        device, field = target.split(".", 1)
+        if not cycle_str.isdigit():
+            raise StimulusError(f"line {lineno}: invalid cycle {cycle_str!r}")
+        if (device_type := DEVICE_TYPES.get(device)) is None:
+            raise StimulusError(f"line {lineno}: unknown device {device!r}")
+        if field not in device_type.INPUTS:
+            raise StimulusError(
+                f"line {lineno}: {device!r} has no input {field!r} - expected one of {', '.join(device_type.INPUTS)}"
+            )
+        if (value := _BOOL_VALUES.get(value_str.lower())) is None:
+            raise StimulusError(f"line {lineno}: invalid value {value_str!r}")
+
+        stimuli.append(Stimulus(int(cycle_str), device, field, value))
+
+    stimuli.sort(key=lambda s: s.cycle)
+    return stimuli
+
+
+def _find_device(cpu: simulators.CPU[t.Any], name: str) -> gpio.GPIODevice:
+    device = cpu.gpio.find_device(DEVICE_TYPES[name]) if cpu.gpio is not None else None
+    if device is None:
+        raise StimulusError(f"device {name!r} is not attached to the CPU")
+    return device
+
+
+def schedule_stimulus(cpu: simulators.CPU[t.Any], stimuli: t.Sequence[Stimulus]) -> None:
+    """
+    Schedule each input change on the CPU's event scheduler, so that it is applied exactly when the
+    simulated clock reaches its cycle. Changes at or before the current cycle are applied immediately.
+
+    Raises:
+        :obj:`StimulusError`: If a referenced device is not attached to the CPU.
+    """
+    by_cycle: dict[int, list[tuple[gpio.GPIODevice, str, bool]]] = collections.defaultdict(list)
+    for stimulus in stimuli:
+        by_cycle[stimulus.cycle].append((_find_device(cpu, stimulus.device), stimulus.field, stimulus.value))
+
+    def apply(cycle: int) -> None:
+        for device, field, value in by_cycle.pop(cycle):
+            setattr(device, field, value)
+
+    scheduler = cpu.scheduler
+    for cycle in sorted(by_cycle):
+        if cycle <= scheduler.cycle:
+            apply(cycle)
+        else:
+            scheduler.schedule_at(cycle, apply)
+
+
+class OutputRecorder:
+    """
+    Records every change to the outputs of the CPU's GPIO devices as a compact time series. Changes are
+    timestamped with the number of instructions executed, including the one that wrote the new value.
+    """
+
+    __slots__ = ("_cpu", "_last", "changes")
+
+    def __init__(self, cpu: simulators.CPU[t.Any]) -> None:
+        self._cpu = cpu
+        self._last: dict[tuple[str, str], bool] = {}
+        self.changes: list[tuple[int, str, str, bool]] = []
+
+        if cpu.gpio is None:
+            return
+
+        for name, device_type in DEVICE_TYPES.items():
+            if (device := cpu.gpio.find_device(device_type)) is not None:
+                self._record(name, device)
+        cpu.gpio.add_write_listener(self._on_write)
+
+    def _record(self, name: str, device: gpio.GPIODevice) -> None:
+        # instructions recorded so far, including the one writing the new value
+        cycle = self._cpu.history.total
+        for field in device.OUTPUTS:
+            value = bool(getattr(device, field))
+            if self._last.get((name, field)) is not value:
+                self._last[name, field] = value
+                self.changes.append((cycle, name, field, value))
+
+    def _on_write(self, device: gpio.GPIODevice) -> None:
+        for name, device_type in DEVICE_TYPES.items():
+            if isinstance(device, device_type):
+                self._record(name, device)
+
+    def format(self) -> str:
+        return "\n".join(f"{cycle} {name}.{field} {int(value)}" for cycle, name, field, value in self.changes)
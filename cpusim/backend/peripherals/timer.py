@@ -0,0 +1,94 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+import typing as t
+
+from cpusim.backend.peripherals import gpio
+from cpusim.common.types import Int16
+
+if t.TYPE_CHECKING:
+    from cpusim.backend import components
+
+__all__ = ["Timer"]
+
+
+class Timer(gpio.GPIODevice):
+    """
+    Programmable interval timer driven by the CPU's simulated clock.
+
+    Offset 0 - write the reload period in cycles to (re)start the timer, or 0 to stop it. Reads return the
+    number of cycles remaining until the next expiry (saturating at 0xFFFF), or 0 when stopped.
+
+    Offset 1 - reads return the number of times the timer has expired since it was last acknowledged
+    (saturating at 0xFFFF). Any write acknowledges, clearing the count.
+    """
+
+    __slots__ = ("_event", "_scheduler", "expirations", "period")
+
+    def __init__(self, scheduler: components.EventScheduler) -> None:
+        self._scheduler = scheduler
+        self._event: components.EventHandle | None = None
+
+        self.period = 0
+        self.expirations = 0
+
+    @property
+    def running(self) -> bool:
+        return self._event is not None
+
+    def start(self, period: int) -> None:
+        self.stop()
+        self.period = period
+        if period > 0:
+            self._event = self._scheduler.schedule(period, self._on_expire)
+
+    def stop(self) -> None:
+        if self._event is not None:
+            self._scheduler.cancel(self._event)
+            self._event = None
+        self.period = 0
+
+    def _on_expire(self, cycle: int) -> None:
+        self.expirations += 1
+        # reschedule relative to the due cycle rather than the current one so the period never drifts
+        self._event = self._scheduler.schedule_at(cycle + self.period, self._on_expire)
+
+    def on_gpio_read(self, offset: t.Literal[0, 1]) -> Int16:
+        if offset == 1:
+            return Int16(min(self.expirations, 0xFFFF))
+
+        if self._event is None:
+            return Int16(0)
+        return Int16(min(self._event.due - self._scheduler.now, 0xFFFF))
+
+    def snapshot(self) -> tuple[t.Any, ...]:
+        return self.period, self.expirations
+
+    def is_pure_read(self, offset: t.Literal[0, 1]) -> bool:
+        # the expiration count only changes on scheduled expiry, but the remaining count changes every cycle
+        return offset == 1
+
+    def on_gpio_write(self, offset: t.Literal[0, 1], val: Int16) -> None:
+        if offset == 1:
+            self.expirations = 0
+            return
+
+        self.start(val.unsigned_value)
@@ -0,0 +1,190 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+__all__ = ["PipelineModel"]
+
+import typing as t
+
+from cpusim.common.instructions import isa
+from cpusim.common.instructions import xops
+
+if t.TYPE_CHECKING:
+    from cpusim.backend import simulators
+
+# the flags are tracked as one more register - every ALU operation writes all of them
+_FLAGS = 4
+_REGISTER_OPERANDS = ("acc", "ra", "r1", "r2")
+_MEMORY_OPERANDS = ("m", "mi")
+
+
+class _Operands(t.NamedTuple):
+    reads: tuple[int, ...]
+    writes: tuple[int, ...]
+    # whether the results are read from memory, so are not ready until writeback even with forwarding
+    loads: bool
+    # the condition of a jump (as isa.Op.a - empty if unconditional), or None for anything else
+    jump: str | None
+
+
+def _register(operand: str, args: tuple[int, ...]) -> int:
+    if operand == "r1":
+        return args[0]
+    if operand == "r2":
+        return args[1]
+    # the v1a accumulator and v1d register A
+    return 0
+
+
+def _operands(instruction: t.Any, args: tuple[int, ...]) -> _Operands:
+    if isinstance(instruction, xops.ExtendedInstruction):
+        definition = instruction.definition
+        flags = (_FLAGS,) if definition.flags else ()
+        return _Operands(
+            (*instruction.reads(args), *flags), (*instruction.writes(args), *flags), definition.reads_memory, None
+        )
+
+    kind: type[object] = type(instruction)
+    if (spec := isa.spec_for(kind)) is None:
+        return _Operands((), (), False, None)
+
+    reads: set[int] = set()
+    writes: set[int] = set()
+    loads, jump = False, None
+    for op in spec.semantics:
+        if op.name == "jump":
+            jump = op.a
+            if jump:
+                reads.add(_FLAGS)
+            continue
+        if op.name not in ("move", "trap"):
+            writes.add(_FLAGS)
+        for operand in (op.a, op.b):
+            if operand in _REGISTER_OPERANDS:
+                reads.add(_register(operand, args))
+            loads = loads or operand in _MEMORY_OPERANDS
+        if op.dst in _REGISTER_OPERANDS:
+            writes.add(_register(op.dst, args))
+        if "mi" in (op.dst, op.a, op.b):
+            # the address of a register indirect access
+            reads.add(args[1])
+    return _Operands(tuple(sorted(reads)), tuple(sorted(writes)), loads, jump)
+
+
+class PipelineModel:
+    """
+    Estimates the stalls a program would incur on an in-order pipeline of four single-cycle stages - fetch,
+    decode, execute and writeback - from the instructions the interpreter runs. It only observes, so the
+    architectural results of a program are the same with or without it.
+
+    Registers and flags are read in decode and written in writeback, in the first half of the cycle so that a
+    value written can be decoded in the same cycle. An instruction waits in decode until everything it reads
+    has been written by the instructions ahead of it - without forwarding one instruction stalls the next that
+    reads its result for a cycle. With ``forwarding``, results are passed straight from the end of execute to
+    the instruction behind, and only a value loaded from memory (ready at the end of writeback) causes a stall.
+
+    Jumps are resolved in execute. A taken jump flushes the two instructions fetched behind it, and the target
+    is fetched in the next cycle.
+    """
+
+    __slots__ = (
+        "_cpu",
+        "_decode",
+        "_fetch",
+        "_operands",
+        "_ready",
+        "cycles",
+        "flush_cycles",
+        "flushes",
+        "forwarding",
+        "instructions",
+        "stall_cycles",
+        "stalls",
+    )
+
+    def __init__(self, cpu: simulators.CPU[t.Any], *, forwarding: bool = False) -> None:
+        self._cpu = cpu
+        self.forwarding = forwarding
+        # instruction word -> its operands, cleared whenever the instruction set changes
+        self._operands: dict[int, _Operands] = {}
+
+        # the cycle the next instruction is fetched in, and the cycle the last one was decoded in
+        self._fetch: int = 0
+        self._decode: int = -1
+        # register (or _FLAGS) -> the first cycle an instruction can be decoded in to read its latest value
+        self._ready = [0] * (_FLAGS + 1)
+
+        # cycles until the last instruction observed leaves writeback
+        self.cycles: int = 0
+        self.instructions = 0
+        self.stall_cycles: int = 0
+        self.flush_cycles: int = 0
+        # address -> cycles lost there, to waiting in decode for operands and to flushes after a taken jump
+        self.stalls: dict[int, int] = {}
+        self.flushes: dict[int, int] = {}
+
+    def __repr__(self) -> str:
+        return (
+            f"PipelineModel(instructions={self.instructions}, cycles={self.cycles}, "
+            f"stall_cycles={self.stall_cycles}, flush_cycles={self.flush_cycles})"
+        )
+
+    def forget_decoded(self) -> None:
+        """Drop everything decoded so far - called when the instruction set changes."""
+        self._operands.clear()
+
+    def issue(self, address: int, word: int, zero: bool, carry: bool) -> None:
+        """
+        Account for the instruction ``word`` at ``address`` being run, with the (zero, carry) flags as they were
+        before it ran.
+        """
+        if (operands := self._operands.get(word)) is None:
+            operands = self._operands[word] = _operands(*self._cpu.decode_word(word))
+
+        fetch = self._fetch
+        # without hazards an instruction is decoded the cycle after it was fetched, behind the one before it
+        decode = earliest = max(fetch, self._decode) + 1
+        ready = self._ready
+        for register in operands.reads:
+            if ready[register] > decode:
+                decode = ready[register]
+        if decode != earliest:
+            stalled = decode - earliest
+            self.stall_cycles += stalled
+            self.stalls[address] = self.stalls.get(address, 0) + stalled
+
+        # execute in decode + 1, writeback in decode + 2
+        writeback = decode + 2
+        available = writeback if not self.forwarding or operands.loads else decode + 1
+        for register in operands.writes:
+            ready[register] = available
+
+        self._decode = decode
+        self._fetch = decode
+        if (jump := operands.jump) is not None and (
+            not jump or (zero if jump == "zero" else not zero if jump == "!zero" else carry)
+        ):
+            # the target is fetched after the jump executes, instead of alongside its decode
+            self._fetch = decode + 2
+            self.flush_cycles += 2
+            self.flushes[address] = self.flushes.get(address, 0) + 2
+
+        self.instructions += 1
+        self.cycles = writeback + 1
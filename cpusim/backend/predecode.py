@@ -0,0 +1,380 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+import collections
+import typing as t
+
+from cpusim import analysis
+from cpusim.common.instructions import base
+from cpusim.common.instructions import isa
+from cpusim.common.instructions import utils
+from cpusim.common.instructions import xops
+from cpusim.common.instructions.v1a import primary as primary_1a
+from cpusim.common.instructions.v1d import primary as primary_1d
+from cpusim.common.instructions.v1d import secondary as secondary_1d
+from cpusim.common.types import Int16
+
+if t.TYPE_CHECKING:
+    from cpusim.backend import simulators
+
+__all__ = ["DEFAULT_FUSIONS", "DecodedProgram", "FusionTable", "learn_fusions"]
+
+FusionTable = frozenset[tuple[type[object], ...]]
+"""Sequences of instruction types that are dispatched as a single superinstruction when they appear in order."""
+
+# longest sequence that may be fused
+_MAX_FUSION_LENGTH = 3
+
+# instructions that can write memory - they may only end a fused sequence, so that a write to one of the later
+# instructions of the same sequence can never be missed
+_MEMORY_WRITERS = (primary_1a.Store, primary_1d.Store, secondary_1d.Store)
+
+_FLAG_SETTERS_1A = (primary_1a.Add, primary_1a.Sub, primary_1a.And, primary_1a.AddM, primary_1a.SubM)
+_FLAG_SETTERS_1D = (
+    primary_1d.Add,
+    primary_1d.Sub,
+    primary_1d.And,
+    primary_1d.Or,
+    primary_1d.AddM,
+    primary_1d.SubM,
+    secondary_1d.Add,
+    secondary_1d.Sub,
+    secondary_1d.And,
+    secondary_1d.Or,
+    secondary_1d.Xor,
+    secondary_1d.Rol,
+    secondary_1d.Ror,
+    secondary_1d.Asl,
+)
+
+DEFAULT_FUSIONS: FusionTable = frozenset(
+    [
+        # read-modify-write of a memory variable
+        (primary_1a.Load, primary_1a.AddM, primary_1a.Store),
+        (primary_1a.Load, primary_1a.SubM, primary_1a.Store),
+        (primary_1d.Load, primary_1d.AddM, primary_1d.Store),
+        (primary_1d.Load, primary_1d.SubM, primary_1d.Store),
+        (primary_1a.Load, primary_1a.Add),
+        (primary_1a.Add, primary_1a.Store),
+        (primary_1d.Load, primary_1d.Add),
+        (primary_1d.Add, primary_1d.Store),
+        # constant set-up
+        (primary_1a.Move, primary_1a.Add),
+        (primary_1d.Move, primary_1d.Add),
+        (primary_1d.Move, primary_1d.Move),
+        # back-to-back arithmetic - the flags of the first are dead, so it runs without computing them
+        *((a, b) for a in _FLAG_SETTERS_1A for b in _FLAG_SETTERS_1A),
+        *((a, b) for a in _FLAG_SETTERS_1D for b in _FLAG_SETTERS_1D),
+        *(
+            (a, b, jump)
+            for a in _FLAG_SETTERS_1D
+            for b in _FLAG_SETTERS_1D
+            for jump in (primary_1d.JumpZ, primary_1d.JumpNZ, primary_1d.JumpC)
+        ),
+        # compare and branch
+        *((op, jump) for op in _FLAG_SETTERS_1A for jump in (primary_1a.JumpZ, primary_1a.JumpNZ)),
+        *((op, jump) for op in _FLAG_SETTERS_1D for jump in (primary_1d.JumpZ, primary_1d.JumpNZ, primary_1d.JumpC)),
+    ]
+)
+"""Fusions for the instruction sequences most common in SimpleCPU programs."""
+
+
+_ExecuteFn = t.Callable[[tuple[int, ...], t.Any], None]
+
+# executors compiled from the instruction set specs, used in place of the instruction classes' execute - they do
+# the same thing without unpacking the arguments into a named tuple first
+_EXECUTORS: dict[type[object], _ExecuteFn] = {
+    **{spec.kind: isa.build_executor(spec, False) for spec in isa.ISA_1A if spec.implemented},
+    **{spec.kind: isa.build_executor(spec, True) for spec in isa.ISA_1D if spec.implemented},
+}
+
+
+class _Member(t.NamedTuple):
+    address: int
+    word: int
+    execute: _ExecuteFn
+    args: tuple[int, ...]
+    incr_pc: bool
+    # whether the instruction is a jump, and so needs the halt-loop check before it runs
+    jump: bool
+
+
+# the instructions run by one dispatch - a superinstruction, or a single instruction
+_Group = tuple[_Member, ...]
+
+
+def _flag_free_1a(fn: t.Callable[[int, int], int], memory_operand: bool) -> _ExecuteFn:
+    def execute(args: tuple[int, ...], cpu: simulators.CPU1a) -> None:
+        operand = cpu.memory.get(args[0]).unsigned_value if memory_operand else args[1]
+        cpu.acc.set(fn(cpu.acc.value & 0xFF, operand & 0xFF) & 0xFF)
+
+    return execute
+
+
+def _flag_free_1d(
+    fn: t.Callable[[int, int], int], operand: t.Callable[[tuple[int, ...], simulators.CPU1d], int], memory: bool
+) -> _ExecuteFn:
+    def execute(args: tuple[int, ...], cpu: simulators.CPU1d) -> None:
+        dst = 0 if memory else args[0]
+        registers = cpu.registers
+        registers.set(dst, Int16(fn(registers.get(dst).unsigned_value, operand(args, cpu))))
+
+    return execute
+
+
+def _sign_extended(args: tuple[int, ...], _: simulators.CPU1d) -> int:
+    return utils.sign_extend_8_to_16_bits(args[1]).unsigned_value
+
+
+def _constant(args: tuple[int, ...], _: simulators.CPU1d) -> int:
+    return args[1]
+
+
+def _register(args: tuple[int, ...], cpu: simulators.CPU1d) -> int:
+    return cpu.registers.get(args[1]).unsigned_value
+
+
+def _memory(args: tuple[int, ...], cpu: simulators.CPU1d) -> int:
+    return cpu.memory.get(args[0]).unsigned_value
+
+
+def _unused(args: tuple[int, ...], _: simulators.CPU1d) -> int:
+    return 0
+
+
+# Versions of the ALU instructions which produce the same register result but leave the flags alone, used
+# where a later instruction in the same superinstruction overwrites the flags before anything reads them.
+# Results are masked by Int16 (or explicitly to 8 bits for v1a), giving the same wrap-around as the ALU.
+_FLAG_FREE: dict[type[object], _ExecuteFn] = {
+    primary_1a.Add: _flag_free_1a(int.__add__, False),
+    primary_1a.Sub: _flag_free_1a(int.__sub__, False),
+    primary_1a.And: _flag_free_1a(int.__and__, False),
+    primary_1a.AddM: _flag_free_1a(int.__add__, True),
+    primary_1a.SubM: _flag_free_1a(int.__sub__, True),
+    primary_1d.Add: _flag_free_1d(int.__add__, _sign_extended, False),
+    primary_1d.Sub: _flag_free_1d(int.__sub__, _sign_extended, False),
+    primary_1d.And: _flag_free_1d(int.__and__, _constant, False),
+    primary_1d.Or: _flag_free_1d(int.__or__, _constant, False),
+    primary_1d.AddM: _flag_free_1d(int.__add__, _memory, True),
+    primary_1d.SubM: _flag_free_1d(int.__sub__, _memory, True),
+    secondary_1d.Add: _flag_free_1d(int.__add__, _register, False),
+    secondary_1d.Sub: _flag_free_1d(int.__sub__, _register, False),
+    secondary_1d.And: _flag_free_1d(int.__and__, _register, False),
+    secondary_1d.Or: _flag_free_1d(int.__or__, _register, False),
+    secondary_1d.Xor: _flag_free_1d(int.__xor__, _register, False),
+    secondary_1d.Rol: _flag_free_1d(lambda a, _: (a << 1) | (a >> 15), _unused, False),
+    secondary_1d.Ror: _flag_free_1d(lambda a, _: (a >> 1) | ((a & 1) << 15), _unused, False),
+    secondary_1d.Asl: _flag_free_1d(lambda a, _: (a << 1) & 0xFFFE, _unused, False),
+}
+
+
+def _eliminate_dead_flags(members: list[_Member], kinds: list[type[object]], raising: list[bool]) -> None:
+    # Flags are live at the end of a superinstruction - the CPU can be inspected between any two dispatches -
+    # so only a flag write overwritten by a later instruction of the same superinstruction, with no jump
+    # reading it in between, is dead. The CPU can also be inspected after an instruction raises, so every flag
+    # is live in front of one that might.
+    live = analysis.Flag.ALL
+    for i in range(len(members) - 1, -1, -1):
+        reads, writes = analysis.flag_effects(kinds[i])
+        if writes and not (writes & live) and (flag_free := _FLAG_FREE.get(kinds[i])) is not None:
+            members[i] = members[i]._replace(execute=flag_free)
+        live = analysis.Flag.ALL if raising[i] else (live & ~writes) | reads
+
+
+def _fusable(kinds: t.Sequence[type[object]]) -> bool:
+    # every instruction but the last must fall through to the next one and must not write memory - which a
+    # user-defined instruction may do
+    return all(
+        kind not in analysis.JUMP_CONDITIONS
+        and kind not in _MEMORY_WRITERS
+        and not issubclass(kind, xops.ExtendedInstruction)
+        for kind in kinds[:-1]
+    )
+
+
+def learn_fusions(
+    cpu: simulators.CPU[t.Any], trace: t.Iterable[int], *, top: int = 16, min_count: int = 2
+) -> FusionTable:
+    """
+    Build a fusion table from an execution trace - the addresses of executed instructions, in order (for example
+    the PCs of ``cpu.history.entries()``). The ``top`` most frequently executed fusable sequences of two or
+    three instructions are selected, ignoring any seen fewer than ``min_count`` times.
+    """
+    counts: collections.Counter[tuple[type[object], ...]] = collections.Counter()
+    window: collections.deque[tuple[int, type[object]]] = collections.deque(maxlen=_MAX_FUSION_LENGTH)
+    for address in trace:
+        try:
+            instruction, _ = cpu.decode_word(cpu.memory.get(address).unsigned_value)
+        except NotImplementedError:
+            window.clear()
+            continue
+
+        # only straight-line runs through consecutive addresses can be fused
+        if window and window[-1][0] + 1 != address:
+            window.clear()
+        kind: type[object] = type(instruction)
+        window.append((address, kind))
+
+        kinds = [kind for _, kind in window]
+        for length in range(2, len(kinds) + 1):
+            if _fusable(kinds[-length:]):
+                counts[tuple(kinds[-length:])] += 1
+
+    return frozenset(kinds for kinds, count in counts.most_common(top) if count >= min_count)
+
+
+class DecodedProgram:
+    """
+    A cache of decoded instructions, so that running from it skips the fetch and decode of every instruction.
+
+    Each address holds the decoded instruction there, plus - if the instructions starting there match a sequence
+    in the fusion table - a superinstruction covering the whole sequence, which is dispatched in one go. The
+    instructions inside a superinstruction still run one at a time through their usual ``execute``, so flags,
+    memory and mem-mapped devices see exactly the same effects in the same order, and every instruction is
+    recorded in the history. Only the per-instruction dispatch is saved.
+
+    Entries are built on first use and dropped when the memory they were decoded from is written. Mem-mapped
+    addresses are never cached, as a fetch from them has to go through the device.
+    """
+
+    __slots__ = ("_cpu", "_entries", "_owners", "_writes", "dispatches", "fusions", "instructions")
+
+    def __init__(self, cpu: simulators.CPU[t.Any], fusions: FusionTable = DEFAULT_FUSIONS) -> None:
+        self._cpu = cpu
+        self.fusions = fusions
+        self._writes = cpu.memory.track_writes()
+        # address -> (superinstruction starting there, single instruction there) - either may be None if the
+        # address starts no fused sequence, or cannot be cached at all
+        self._entries: dict[int, tuple[_Group | None, _Group | None]] = {}
+        # address -> addresses whose entries were decoded from it
+        self._owners: dict[int, list[int]] = {}
+
+        # totals for everything dispatched through this cache
+        self.dispatches = 0
+        self.instructions = 0
+
+    def close(self) -> None:
+        self._cpu.memory.untrack_writes(self._writes)
+
+    def _invalidate(self) -> None:
+        for address in self._writes:
+            for owner in self._owners.pop(address, ()):
+                self._entries.pop(owner, None)
+        self._writes.clear()
+
+    def _decode(self, address: int) -> tuple[_Member, type[object], bool] | None:
+        # the member for the instruction at address, its type and whether it might raise
+        memory = self._cpu.memory
+        if address >= memory.size or memory.is_mapped(address):
+            return None
+
+        word = memory.get(address).unsigned_value
+        try:
+            instruction, args = self._cpu.decode_word(word)
+        except NotImplementedError:
+            return None
+
+        kind: type[object] = type(instruction)
+        execute = _EXECUTORS.get(kind) or instruction.execute
+        member = _Member(address, word, execute, args, instruction.incr_pc, kind in analysis.JUMP_CONDITIONS)
+        # instructions without a compiled executor trap or run a user-defined handler, and a device can raise
+        # when a mem-mapped address is accessed - which a register indirect access could reach
+        mode = instruction.addressing_mode
+        raising = (
+            kind not in _EXECUTORS
+            or mode is base.AddressingMode.REGISTER_INDIRECT
+            or (mode is base.AddressingMode.ABSOLUTE and memory.is_mapped(args[0]))
+        )
+        return member, kind, raising
+
+    def _build(self, address: int) -> tuple[_Group | None, _Group | None]:
+        members: list[_Member] = []
+        kinds: list[type[object]] = []
+        raising: list[bool] = []
+        fused: _Group | None = None
+        for offset in range(_MAX_FUSION_LENGTH):
+            if (decoded := self._decode(address + offset)) is None:
+                break
+            members.append(decoded[0])
+            kinds.append(decoded[1])
+            raising.append(decoded[2])
+
+            if not _fusable(kinds):
+                break
+            if len(members) > 1 and tuple(kinds) in self.fusions:
+                fused_members = list(members)
+                _eliminate_dead_flags(fused_members, kinds, raising)
+                fused = tuple(fused_members)
+
+        entry = (fused, (members[0],) if members else None)
+        self._entries[address] = entry
+        for owned in range(address, address + (len(members) or 1)):
+            self._owners.setdefault(owned, []).append(address)
+        return entry
+
+    def dispatch(self, budget: int, detect_halt_loop: bool) -> tuple[int, bool]:
+        # Execute the instruction (or superinstruction) at the PC, running no more than budget instructions.
+        # Returns the number run and whether the CPU halted, with the same accounting as CPU.step - or nothing
+        # run if the instruction at the PC cannot be cached.
+        if self._writes:
+            self._invalidate()
+
+        cpu = self._cpu
+        program_counter = cpu.pc
+        pc = program_counter.value
+
+        fused, members = self._entries.get(pc) or self._build(pc)
+        if fused is not None and len(fused) <= budget:
+            members = fused
+        elif members is None:
+            # not cacheable - the caller has to fall back to a normal step
+            return 0, False
+
+        self.dispatches += 1
+        history, memory, ir = cpu.history, cpu.memory, cpu.ir
+        mmio_accesses = memory.mmio_accesses
+        executed = 0
+        try:
+            for address, word, execute, args, incr_pc, jump in members:
+                # everything CPU.step would have done by now, including when a member raises
+                executed += 1
+                history.record(address, word)
+                ir.set(word)
+                if jump and detect_halt_loop:
+                    table = cpu.halt_table
+                    if table.masks[address] and table.halts(address, *cpu.jump_flags):
+                        return executed, True
+
+                execute(args, cpu)
+                if incr_pc:
+                    program_counter.incr()
+                if memory.mmio_accesses != mmio_accesses and executed < len(members):
+                    # a device may have scheduled an event during the rest of the group - leave it to the caller
+                    return executed, False
+        finally:
+            self.instructions += executed
+
+        return executed, False
+
+    @property
+    def dispatch_reduction(self) -> float:
+        # fraction of dispatches saved by fusion, compared with one dispatch per instruction
+        return 1 - (self.dispatches / self.instructions) if self.instructions else 0.0
@@ -0,0 +1,161 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+import typing as t
+
+if t.TYPE_CHECKING:
+    from cpusim.backend import simulators
+
+__all__ = ["RepetitionDetector"]
+
+_MASK64 = (1 << 64) - 1
+
+
+def _zobrist_key(address: int, value: int) -> int:
+    # splitmix64 of the (address, value) pair - a stand-in for a table of 2**28 random keys that would be far
+    # too large to precompute, with the same independence properties
+    x = (((address << 16) | value) + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+class RepetitionDetector:
+    """
+    Proves that a run will never terminate by spotting an exact repeat of the full machine state.
+
+    Memory is hashed with Zobrist keys - the hash is the XOR of one key per (address, value) pair, so a write
+    updates it in O(1) by XOR-ing out the old pair and XOR-ing in the new one. Writes are picked up lazily from
+    a memory write tracker whenever the state is checked. The rest of the state (PC, registers, flags and GPIO
+    device state) is small enough to hash directly.
+
+    The state is checked every ``interval`` instructions against a bounded set of recently seen hashes. On a
+    hit the full state is snapshotted, and only if the same full state is seen again is the loop reported,
+    so a hash collision can never end a run. Checks are skipped while events are scheduled or while any
+    mem-mapped input could return a different value, as the machine is not a closed system then.
+    """
+
+    __slots__ = (
+        "_cpu",
+        "_memory_hash",
+        "_pinned",
+        "_seen",
+        "_shadow",
+        "_writes",
+        "capacity",
+        "interval",
+        "next_check",
+        "period",
+    )
+
+    def __init__(self, cpu: simulators.CPU[t.Any], interval: int = 1000, capacity: int = 1 << 16) -> None:
+        if interval <= 0:
+            raise ValueError("Check interval must be positive")
+
+        self._cpu = cpu
+        self.interval = interval
+        self.capacity = capacity
+        self.next_check = cpu.scheduler.cycle + interval
+        # once proven, the number of instructions after which the machine state repeats
+        self.period: int | None = None
+
+        memory = cpu.memory
+        self._writes = memory.track_writes()
+        # value of each address as currently folded into the hash (mem-mapped addresses are excluded)
+        self._shadow = [0 if memory.is_mapped(a) else memory.get(a).unsigned_value for a in range(memory.size)]
+        self._memory_hash = 0
+        for address, value in enumerate(self._shadow):
+            if not memory.is_mapped(address):
+                self._memory_hash ^= _zobrist_key(address, value)
+
+        # hash -> cycle it was last seen at, oldest first
+        self._seen: dict[int, int] = {}
+        # hash -> (cycle, full state) for hashes which have been seen more than once
+        self._pinned: dict[int, tuple[int, tuple[t.Any, ...]]] = {}
+
+    def close(self) -> None:
+        self._cpu.memory.untrack_writes(self._writes)
+
+    def cycles_until_check(self) -> int:
+        return max(1, self.next_check - self._cpu.scheduler.cycle)
+
+    def _fold_writes(self) -> None:
+        memory, shadow = self._cpu.memory, self._shadow
+        for address in self._writes:
+            value = memory.get(address).unsigned_value
+            if value != shadow[address]:
+                self._memory_hash ^= _zobrist_key(address, shadow[address]) ^ _zobrist_key(address, value)
+                shadow[address] = value
+        self._writes.clear()
+
+    def _is_closed_system(self) -> bool:
+        cpu = self._cpu
+        if len(cpu.scheduler):
+            return False
+
+        for region in cpu.memory.regions:
+            if region.is_pure_read is None:
+                return False
+            if not all(region.is_pure_read(address) for address in range(region.start, region.end)):
+                return False
+        return True
+
+    def _small_state(self) -> tuple[t.Any, ...]:
+        cpu = self._cpu
+        return cpu.architectural_state(), cpu.gpio.snapshot() if cpu.gpio is not None else ()
+
+    def _full_state(self) -> tuple[t.Any, ...]:
+        # the shadow copy is exactly the current memory contents once writes have been folded in
+        return self._small_state(), tuple(self._shadow)
+
+    def check(self) -> bool:
+        """
+        Check the current state against previously seen ones. Returns whether the run is proven to loop
+        forever, in which case :attr:`period` is set.
+        """
+        cycle = self._cpu.scheduler.cycle
+        self.next_check = cycle + self.interval
+
+        self._fold_writes()
+        if not self._is_closed_system():
+            # history from before the system was closed says nothing about the future
+            self._seen.clear()
+            self._pinned.clear()
+            return False
+
+        state_hash = self._memory_hash ^ hash(self._small_state())
+        if (pinned := self._pinned.get(state_hash)) is not None:
+            full_state = self._full_state()
+            if full_state == pinned[1]:
+                self.period = cycle - pinned[0]
+                return True
+            # collision - remember the newer state instead
+            self._pinned[state_hash] = (cycle, full_state)
+        elif state_hash in self._seen:
+            self._pinned[state_hash] = (cycle, self._full_state())
+
+        self._seen.pop(state_hash, None)
+        self._seen[state_hash] = cycle
+        if len(self._seen) > self.capacity:
+            oldest = next(iter(self._seen))
+            del self._seen[oldest]
+            self._pinned.pop(oldest, None)
+        return False
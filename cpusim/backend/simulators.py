@@ -23,52 +23,269 @@ import abc
 import typing as t
 
 from cpusim.backend import components
+from cpusim.backend import halting
 from cpusim.backend import instruction_sets
+from cpusim.backend import jit
+from cpusim.backend import loops
+from cpusim.backend import pipeline
+from cpusim.backend import predecode
+from cpusim.backend import repetition
+from cpusim.backend import timing
 from cpusim.common.instructions import base
-from cpusim.common.instructions.v1a import primary as primary_1a
-from cpusim.common.instructions.v1d import primary as primary_1d
+from cpusim.common.instructions import isa
+from cpusim.common.instructions import xops
+from cpusim.common.types import Int16
 
 if t.TYPE_CHECKING:
+    from cpusim.backend import accesses
+    from cpusim.backend import aot
+    from cpusim.backend import branches
+    from cpusim.backend import cache
     from cpusim.backend.peripherals import gpio
 
 InstructionT = t.TypeVar("InstructionT", base.Instruction1a, base.Instruction1d)
 
+# longest loop body (in instructions) that idle-loop detection will consider
+_MAX_IDLE_LOOP_LENGTH = 64
+# upper bound on how many backward branches to a loop head are ignored after it fails an idle check
+_MAX_IDLE_BACKOFF = 1024
+
+# decoders generated from the instruction set specs
+_DECODE_1A = isa.build_decoder(instruction_sets.INSTRUCTION_SET_1A, isa.FIELDS_1A)
+_DECODE_1D = isa.build_decoder(instruction_sets.INSTRUCTION_SET_1D, isa.FIELDS_1D)
+
 
 class CPU(abc.ABC, t.Generic[InstructionT]):
-    __slots__ = ("gpio", "ir", "memory", "pc")
+    __slots__ = (
+        "_access_profiler",
+        "_cache",
+        "_compiled_program",
+        "_cycle_costs",
+        "_decoded_program",
+        "_halt_table",
+        "_idle_backoff",
+        "_loop_accelerator",
+        "_repetition",
+        "_timing",
+        "_trace_jit",
+        "accelerate_loops",
+        "branches",
+        "breakpoints",
+        "cycles",
+        "fast_forward_idle",
+        "gpio",
+        "history",
+        "idle_instructions_skipped",
+        "ir",
+        "jit",
+        "loop_instructions_skipped",
+        "memory",
+        "pc",
+        "pipeline",
+        "predecode",
+        "scheduler",
+    )
 
     def __init__(self, mem: list[int] | None = None, max_mem: int = 4096) -> None:
         self.pc = components.IntRegister()
         self.ir = components.IntRegister()
         self.memory = components.Memory(mem or [], max_mem)
+        self.history = components.InstructionHistory()
+        self.scheduler = components.EventScheduler(self.history)
 
         self.gpio: gpio.GPIO | None = None
+        # opt-in exact state-repetition detection, checked between chunks of run()
+        self._repetition: repetition.RepetitionDetector | None = None
+        # built on first use, so that memory can still be filled in after construction without a rebuild
+        self._halt_table: halting.HaltLoopTable | None = None
+
+        # skip over loops which only poll inputs until the next scheduled event - see _fast_forward_idle_loop
+        self.fast_forward_idle = False
+        self.idle_instructions_skipped = 0
+        # loop head -> (backward branches still to ignore, current back-off window)
+        self._idle_backoff: dict[int, tuple[int, int]] = {}
+
+        # run counted loops of register arithmetic without the interpreter - see loops.LoopAccelerator
+        self.accelerate_loops = False
+        self.loop_instructions_skipped = 0
+        self._loop_accelerator: loops.LoopAccelerator | None = None
+
+        # dispatch from a cache of decoded (and fused) instructions instead of fetching and decoding every step
+        self.predecode = False
+        self._decoded_program: predecode.DecodedProgram | None = None
+        # run from an ahead-of-time compiled module of the program instead - see aot.CompiledProgram
+        self._compiled_program: aot.CompiledProgram | None = None
+
+        # compile the paths taken around hot loops into Python functions - see jit.TraceJIT
+        self.jit = False
+        self._trace_jit: jit.TraceJIT | None = None
+
+        # addresses that run() stops in front of (other than at the instruction it starts on), returning early
+        # without halting
+        self.breakpoints: set[int] = set()
+
+        # clock cycles run so far, counted while a timing model is set - see the timing property
+        self.cycles = 0
+        self._timing: timing.CycleCosts | None = None
+        # instruction word -> cycles it takes, excluding mem-mapped accesses
+        self._cycle_costs: dict[int, int] = {}
+        # opt-in model of the stalls the program would incur on a pipelined implementation. Like the timing model,
+        # every instruction is interpreted one at a time while it is set
+        self.pipeline: pipeline.PipelineModel | None = None
+        self._cache: cache.CacheSimulator | None = None
+        # opt-in taken/not-taken counts and predictor accuracy for each conditional jump - see branches.BranchProfiler
+        self.branches: branches.BranchProfiler | None = None
+        self._access_profiler: accesses.AccessProfiler | None = None
 
     @property
     @abc.abstractmethod
-    def _unconditional_jump_instruction(self) -> type[InstructionT]: ...
+    def jump_flags(self) -> tuple[bool, bool]:
+        """The (zero, carry) flags - the only flags that jump instructions can test."""
+
+    @property
+    def halt_table(self) -> halting.HaltLoopTable:
+        if self._halt_table is None:
+            self._halt_table = halting.HaltLoopTable(self)
+        return self._halt_table
+
+    @property
+    def loop_accelerator(self) -> loops.LoopAccelerator:
+        if self._loop_accelerator is None:
+            self._loop_accelerator = loops.LoopAccelerator(self)
+        return self._loop_accelerator
+
+    @property
+    def trace_jit(self) -> jit.TraceJIT:
+        if self._trace_jit is None:
+            self._trace_jit = jit.TraceJIT(self)
+        return self._trace_jit
+
+    @property
+    def timing(self) -> timing.CycleCosts | None:
+        """
+        The cost of each instruction in clock cycles, counted into ``cycles`` as they run. Every instruction is
+        interpreted one at a time while this is set, as none of the faster ways of running a program keep track
+        of which instructions they ran.
+        """
+        return self._timing
+
+    @timing.setter
+    def timing(self, costs: timing.CycleCosts | None) -> None:
+        self._timing = costs
+        self._cycle_costs.clear()
+
+    @property
+    def cache(self) -> cache.CacheSimulator | None:
+        """
+        The caches simulated in front of memory, which observe every fetch and data access the program makes.
+        Like the timing model, every instruction is interpreted one at a time while this is set.
+        """
+        return self._cache
+
+    @cache.setter
+    def cache(self, simulator: cache.CacheSimulator | None) -> None:
+        if self._cache is not None:
+            self._cache.detach()
+        self._cache = simulator
+        if simulator is not None:
+            simulator.attach()
+
+    @property
+    def access_profiler(self) -> accesses.AccessProfiler | None:
+        """
+        The counts of the reads and writes each instruction makes to data memory. Like the timing model, every
+        instruction is interpreted one at a time while this is set.
+        """
+        return self._access_profiler
+
+    @access_profiler.setter
+    def access_profiler(self, profiler: accesses.AccessProfiler | None) -> None:
+        if self._access_profiler is not None:
+            self._access_profiler.detach()
+        self._access_profiler = profiler
+        if profiler is not None:
+            profiler.attach()
+
+    @property
+    def decoded_program(self) -> predecode.DecodedProgram:
+        if self._decoded_program is None:
+            self._decoded_program = predecode.DecodedProgram(self)
+        return self._decoded_program
+
+    @decoded_program.setter
+    def decoded_program(self, program: predecode.DecodedProgram) -> None:
+        if self._decoded_program is not None:
+            self._decoded_program.close()
+        self._decoded_program = program
+
+    @property
+    def compiled_program(self) -> aot.CompiledProgram | None:
+        return self._compiled_program
+
+    @compiled_program.setter
+    def compiled_program(self, program: aot.CompiledProgram | None) -> None:
+        if self._compiled_program is not None:
+            self._compiled_program.close()
+        self._compiled_program = program
+
+    @property
+    def repetition(self) -> repetition.RepetitionDetector | None:
+        return self._repetition
+
+    @repetition.setter
+    def repetition(self, detector: repetition.RepetitionDetector | None) -> None:
+        if self._repetition is not None:
+            self._repetition.close()
+        self._repetition = detector
 
     def fetch(self) -> None:
         current_instruction = self.memory.get(self.pc.value)
+        if self._cache is not None:
+            self._cache.fetch(self.pc.value)
         self.ir.set(current_instruction.unsigned_value)
 
     @abc.abstractmethod
-    def decode(self) -> tuple[InstructionT, tuple[int, ...]]: ...
+    def architectural_state(self) -> tuple[int | bool, ...]:
+        """
+        Snapshot of the programmer-visible state held outside of memory (PC, registers and flags). Two equal
+        snapshots taken at the same point in a program mean the CPU will behave identically from there.
+        """
+
+    @abc.abstractmethod
+    def restore_architectural_state(self, state: tuple[int | bool, ...]) -> None:
+        """Set the PC, registers and flags from a snapshot in the form returned by architectural_state."""
+
+    @abc.abstractmethod
+    def decode_word(self, raw_instruction: int) -> tuple[InstructionT, tuple[int, ...]]: ...
+
+    def decode(self) -> tuple[InstructionT, tuple[int, ...]]:
+        return self.decode_word(self.ir.value)
+
+    def disassemble(self, raw_instruction: int) -> str:
+        try:
+            instruction, args = self.decode_word(raw_instruction)
+        except NotImplementedError:
+            return "????"
+
+        if (spec := isa.spec_for(type(instruction))) is not None:
+            return isa.disassemble(spec, args)
+        return instruction.repr(args)
 
     def execute(self, instruction: InstructionT, args: tuple[int, ...]) -> None:
         instruction.execute(args, self)  # type: ignore[reportArgumentType]
 
-    def step(self, *, detect_halt_loop: bool = True) -> bool:
+    def _step(self, detect_halt_loop: bool) -> bool:
+        # fetch-decode-execute a single instruction without advancing the simulated clock
         self.fetch()
-        instruction, args = self.decode()
+        pc = self.pc.value
+        self.history.record(pc, self.ir.value)
 
-        if (
-            detect_halt_loop
-            and isinstance(instruction, self._unconditional_jump_instruction)  # type: ignore[reportUnnecessaryIsInstance]
-            and args[0] == self.pc.value
-        ):
-            return True
+        if detect_halt_loop:
+            table = self._halt_table or self.halt_table
+            if table.masks[pc] and table.halts(pc, *self.jump_flags):
+                return True
 
+        instruction, args = self.decode()
         self.execute(instruction, args)
 
         if instruction.incr_pc:
@@ -76,6 +293,218 @@ class CPU(abc.ABC, t.Generic[InstructionT]):
 
         return False
 
+    def _observed_step(self, detect_halt_loop: bool) -> bool:
+        # as _step, counting the cycles the instruction took and passing it on to the pipeline, cache, branch and
+        # memory access models
+        memory, model, profiler = self.memory, self.pipeline, self._access_profiler
+        mmio_accesses = memory.mmio_accesses
+        pc = self.pc.value
+        zero, carry = self.jump_flags
+        if profiler is not None:
+            profiler.begin(pc)
+        halted = self._step(detect_halt_loop)
+        if profiler is not None:
+            profiler.end()
+
+        word = self.ir.value
+        if self._timing is not None:
+            if (cycles := self._cycle_costs.get(word)) is None:
+                cycles = self._cycle_costs[word] = self._timing.cycles(self.decode_word(word)[0])
+            if memory.mmio_accesses != mmio_accesses:
+                cycles += self._timing.mmio * (memory.mmio_accesses - mmio_accesses)
+            self.cycles += cycles
+        if model is not None:
+            model.issue(pc, word, zero, carry)
+        if self.branches is not None:
+            self.branches.record(pc, word, zero, carry)
+        if self._cache is not None:
+            self._cache.retire()
+        return halted
+
+    @property
+    def _observed(self) -> bool:
+        # whether every instruction has to be stepped through _observed_step
+        return (
+            self._timing is not None
+            or self.pipeline is not None
+            or self._cache is not None
+            or self.branches is not None
+            or self._access_profiler is not None
+        )
+
+    def step(self, *, detect_halt_loop: bool = True) -> bool:
+        halted = self._observed_step(detect_halt_loop) if self._observed else self._step(detect_halt_loop)
+        self.scheduler.advance(1)
+        return halted
+
+    def run(self, max_steps: int, *, detect_halt_loop: bool = True) -> tuple[int, bool]:
+        # returns the number of instructions run (including the halt-loop instruction) and whether the CPU halted -
+        # fewer than max_steps are only run without halting if a breakpoint was reached
+        if detect_halt_loop:
+            # pick up any halt loops created by self-modifying code since the last run
+            self.halt_table.refresh()
+
+        if self.breakpoints or (
+            not self._observed
+            and (
+                self.fast_forward_idle
+                or self.accelerate_loops
+                or self.predecode
+                or self.compiled_program is not None
+                or self.jit
+            )
+        ):
+            return self._run_dispatched(max_steps, detect_halt_loop)
+
+        scheduler, detector = self.scheduler, self.repetition
+        step = self._observed_step if self._observed else self._step
+        executed = 0
+        while executed < max_steps:
+            # run straight through to the next scheduled event (or the step limit), then let the scheduler
+            # catch the clock up and fire whatever became due. If a device schedules an earlier event while the
+            # chunk runs, the chunk ends there so that the next one stops in time for it
+            chunk = min(max_steps - executed, scheduler.cycles_until_next)
+            if detector is not None:
+                chunk = min(chunk, detector.cycles_until_check())
+            due = scheduler.next_due
+            for i in range(1, chunk + 1):
+                if step(detect_halt_loop):
+                    scheduler.advance(i)
+                    return executed + i, True
+                if scheduler.next_due < due:
+                    chunk = i
+                    break
+
+            executed += chunk
+            scheduler.advance(chunk)
+            if detector is not None and scheduler.cycle >= detector.next_check and detector.check():
+                return executed, True
+
+        return executed, False
+
+    def _run_dispatched(self, max_steps: int, detect_halt_loop: bool) -> tuple[int, bool]:
+        # as run, but instructions may be dispatched from the compiled program or the decoded program cache,
+        # every backward branch is a candidate for counted-loop acceleration, tracing and idle-loop
+        # fast-forwarding, and breakpoints are honoured - acceleration, fast-forwarding and fusion are all
+        # skipped while any breakpoint is set, as they could run straight over one. With a timing, pipeline, cache,
+        # branch or access model set only the breakpoints are - every instruction is stepped so that the models see it
+        scheduler, pc, detector = self.scheduler, self.pc, self.repetition
+        breakpoints = self.breakpoints
+        accelerator: loops.LoopAccelerator | None = None
+        tracer: jit.TraceJIT | None = None
+        program: aot.CompiledProgram | predecode.DecodedProgram | None = None
+        fast_forward_idle = False
+        if self._observed:
+            step = self._observed_step
+        else:
+            step = self._step
+            accelerator = self.loop_accelerator if self.accelerate_loops and not breakpoints else None
+            fast_forward_idle = self.fast_forward_idle and not breakpoints
+            tracer = self.trace_jit if self.jit else None
+            program = self.compiled_program
+            if program is None and self.predecode:
+                program = self.decoded_program
+        executed = 0
+        while executed < max_steps:
+            chunk = min(max_steps - executed, scheduler.cycles_until_next)
+            if detector is not None:
+                chunk = min(chunk, detector.cycles_until_check())
+            due = scheduler.next_due
+            i = 0
+            while i < chunk:
+                if scheduler.next_due < due:
+                    # scheduled by a device during the chunk - see run
+                    chunk = i
+                    break
+
+                before = pc.value
+                if breakpoints and (executed or i) and before in breakpoints:
+                    scheduler.advance(i)
+                    return executed + i, False
+
+                budget = 1 if breakpoints else chunk - i
+                n, halted = program.dispatch(budget, detect_halt_loop) if program is not None else (0, False)
+                if not n:
+                    n, halted = 1, step(detect_halt_loop)
+                i += n
+                if halted:
+                    scheduler.advance(i)
+                    return executed + i, True
+
+                if pc.value > before:
+                    continue
+
+                if accelerator is not None and (loop := accelerator.find(pc.value)) is not None:
+                    n = accelerator.run(loop, chunk - i)
+                    self.loop_instructions_skipped += n
+                    i += n
+                elif tracer is not None and (n := tracer.enter(pc.value, chunk - i, detect_halt_loop)):
+                    i += n
+                elif fast_forward_idle and self._should_check_idle(pc.value):
+                    n, halted = self._fast_forward_idle_loop(chunk - i, detect_halt_loop)
+                    i += n
+                    if halted:
+                        scheduler.advance(i)
+                        return executed + i, True
+
+            executed += chunk
+            scheduler.advance(chunk)
+            if detector is not None and scheduler.cycle >= detector.next_check and detector.check():
+                return executed, True
+
+        return executed, False
+
+    def _should_check_idle(self, head: int) -> bool:
+        if (entry := self._idle_backoff.get(head)) is None:
+            return True
+
+        remaining, window = entry
+        if remaining:
+            self._idle_backoff[head] = (remaining - 1, window)
+            return False
+        return True
+
+    def _fast_forward_idle_loop(self, budget: int, detect_halt_loop: bool) -> tuple[int, bool]:
+        # Run one iteration of the loop starting at the current PC for real while watching memory. If it ends
+        # back at the head with the same architectural state, wrote nothing and only read RAM or mapped inputs
+        # that cannot change before the next scheduled event, then every further iteration up to that event is
+        # identical - so skip as many whole iterations as fit in the budget. Returns the number of instructions
+        # accounted for and whether the CPU halted.
+        if budget <= 0:
+            return 0, False
+
+        head = self.pc.value
+        start_state = self.architectural_state()
+        limit = min(budget, _MAX_IDLE_LOOP_LENGTH, self.history.size)
+
+        scheduler = self.scheduler
+        due = scheduler.next_due
+        length = 0
+        probe = self.memory.begin_probe()
+        try:
+            while length < limit:
+                length += 1
+                if self._step(detect_halt_loop):
+                    return length, True
+                # stop early for anything a device scheduled, leaving the run loop to end its chunk there
+                if self.pc.value == head or scheduler.next_due < due:
+                    break
+        finally:
+            self.memory.end_probe()
+
+        if self.pc.value != head or not probe.clean or self.architectural_state() != start_state:
+            _, window = self._idle_backoff.get(head, (0, 0))
+            window = min(max(window * 2, 1), _MAX_IDLE_BACKOFF)
+            self._idle_backoff[head] = (window, window)
+            return length, False
+
+        self._idle_backoff.pop(head, None)
+        iterations = (budget - length) // length
+        if iterations:
+            self.history.repeat(length, iterations)
+            self.idle_instructions_skipped += iterations * length
+        return length + (iterations * length), False
+
 
 class CPU1a(CPU[base.Instruction1a]):
     __slots__ = ("acc", "alu")
@@ -89,28 +518,24 @@ class CPU1a(CPU[base.Instruction1a]):
         self.alu = components.Int8ALU()
 
     @property
-    def _unconditional_jump_instruction(self) -> type[base.Instruction1a]:
-        return primary_1a.JumpU
+    def jump_flags(self) -> tuple[bool, bool]:
+        return self.alu.zero, self.alu.carry
 
-    def decode(self) -> tuple[base.Instruction1a, tuple[int, ...]]:
-        raw_instruction = self.ir.value
+    def architectural_state(self) -> tuple[int | bool, ...]:
+        return self.pc.value, self.acc.value, *self.alu.flags
 
-        opcode = (raw_instruction >> 12) & 0xF
+    def restore_architectural_state(self, state: tuple[int | bool, ...]) -> None:
+        pc, acc, *flags = state
+        self.pc.set(int(pc))
+        self.acc.set(int(acc))
+        self.alu.negative, self.alu.positive, self.alu.overflow, self.alu.carry, self.alu.zero = map(bool, flags)
 
-        instruction = self.INSTRUCTION_SET.get(opcode)
-        if instruction is None:
-            raise NotImplementedError(f"Unknown opcode {opcode}")
-
-        arg = raw_instruction & 0xFF
-        # immediate addressing mode args require the leading 0 for compatibility with v1d - v1a instructions
-        # will ignore this value
-        args = (0, arg) if instruction.addressing_mode is base.AddressingMode.IMMEDIATE else (arg,)
-
-        return instruction, args
+    def decode_word(self, raw_instruction: int) -> tuple[base.Instruction1a, tuple[int, ...]]:
+        return _DECODE_1A(raw_instruction)
 
 
 class CPU1d(CPU[base.Instruction1d]):
-    __slots__ = ("alu", "registers")
+    __slots__ = ("_decode", "alu", "registers", "xops")
 
     INSTRUCTION_SET = instruction_sets.INSTRUCTION_SET_1D
 
@@ -120,34 +545,40 @@ class CPU1d(CPU[base.Instruction1d]):
         self.registers = components.Registers(8)
         self.alu = components.Int16ALU()
 
+        # XOP slot -> the user-defined instruction bound to it - see register_xop
+        self.xops: dict[int, xops.XopDefinition] = {}
+        self._decode = _DECODE_1D
+
+    def register_xop(self, slot: int, definition: xops.XopDefinition) -> None:
+        """Bind XOP slot ``slot`` (1 to 5) to a user-defined instruction, replacing anything already bound to it."""
+        if slot not in xops.SLOTS:
+            raise ValueError(f"there is no XOP{slot} - slots are numbered 1 to 5")
+
+        self.xops[slot] = definition
+        self._decode = isa.build_decoder(xops.instruction_table(self.INSTRUCTION_SET, self.xops), isa.FIELDS_1D)
+        # anything decoded so far may hold the unimplemented XOP
+        for engine in (self._decoded_program, self._loop_accelerator, self._trace_jit):
+            if engine is not None:
+                engine.close()
+        self._decoded_program = None
+        self._loop_accelerator = None
+        self._trace_jit = None
+        self._cycle_costs.clear()
+        if self.pipeline is not None:
+            self.pipeline.forget_decoded()
+
     @property
-    def _unconditional_jump_instruction(self) -> type[base.Instruction1d]:
-        return primary_1d.JumpU
-
-    def decode(self) -> tuple[base.Instruction1d, tuple[int, ...]]:
-        raw_instruction = self.ir.value
-
-        # decode the instruction into its opcode(s)
-        primary_opcode, secondary_opcode = (raw_instruction >> 12) & 0xF, raw_instruction & 0xF
-        if primary_opcode < 0b1111:
-            # secondary opcode is not used for the primary instruction set
-            secondary_opcode = -1
-
-        instruction = self.INSTRUCTION_SET.get((primary_opcode, secondary_opcode))
-        if instruction is None:
-            raise NotImplementedError(f"Unknown opcode {primary_opcode} {secondary_opcode}")
-
-        # parse the instruction data into the instruction 'arguments'
-        args: tuple[int, ...]
-
-        match instruction.addressing_mode:
-            case base.AddressingMode.REGISTER | base.AddressingMode.REGISTER_INDIRECT:
-                args = ((raw_instruction & 0x0C00) >> 10, (raw_instruction & 0x0300) >> 8)  # R_sd, R_s
-            case base.AddressingMode.IMMEDIATE:
-                args = ((raw_instruction & 0x0C00) >> 10, raw_instruction & 0x00FF)  # R_sd, KK
-            case base.AddressingMode.ABSOLUTE | base.AddressingMode.DIRECT:
-                args = (raw_instruction & 0x0FFF,)  # AA
-            case _:
-                raise NotImplementedError("Unknown addressing mode")
-
-        return instruction, args
+    def jump_flags(self) -> tuple[bool, bool]:
+        return self.alu.zero, self.alu.carry
+
+    def architectural_state(self) -> tuple[int | bool, ...]:
+        return self.pc.value, *self.registers.values(), *self.alu.flags
+
+    def restore_architectural_state(self, state: tuple[int | bool, ...]) -> None:
+        self.pc.set(int(state[0]))
+        for idx, value in enumerate(state[1:-5]):
+            self.registers.set(idx, Int16(int(value)))
+        self.alu.negative, self.alu.positive, self.alu.overflow, self.alu.carry, self.alu.zero = map(bool, state[-5:])
+
+    def decode_word(self, raw_instruction: int) -> tuple[base.Instruction1d, tuple[int, ...]]:
+        return self._decode(raw_instruction)
@@ -0,0 +1,257 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Clock cycle timing model.
+
+The simulated clock that devices are scheduled against ticks once per instruction. A :class:`CycleCosts` gives
+each instruction a cost in clock cycles instead - set as ``cpu.timing``, the CPU counts the cycles it has run in
+``cpu.cycles`` - and :func:`loop_timings` uses the same costs to find how long each loop of a program takes.
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    "ADDRESSING_MODES",
+    "INSTRUCTION_CLASSES",
+    "CycleCosts",
+    "LoopTiming",
+    "TimingError",
+    "instruction_class",
+    "loop_timings",
+]
+
+import json
+import typing as t
+
+from cpusim import analysis
+from cpusim.common.instructions import base
+from cpusim.common.instructions import isa
+from cpusim.common.instructions import xops
+
+if t.TYPE_CHECKING:
+    from cpusim.backend import simulators
+
+InstructionClass = t.Literal["move", "alu", "load", "store", "jump"]
+INSTRUCTION_CLASSES: tuple[InstructionClass, ...] = ("move", "alu", "load", "store", "jump")
+"""The classes of instruction that are given a cost - see :func:`instruction_class`."""
+_CLASS_NAMES: dict[str, InstructionClass] = {name: name for name in INSTRUCTION_CLASSES}
+
+ADDRESSING_MODES: dict[str, base.AddressingMode] = {
+    "register": base.AddressingMode.REGISTER,
+    "register_indirect": base.AddressingMode.REGISTER_INDIRECT,
+    "immediate": base.AddressingMode.IMMEDIATE,
+    "absolute": base.AddressingMode.ABSOLUTE,
+    "direct": base.AddressingMode.DIRECT,
+}
+"""Names that cost files use to refer to each addressing mode."""
+
+_MEMORY_OPERANDS = ("m", "mi")
+
+
+class TimingError(Exception):
+    """Raised when a cycle cost file is malformed."""
+
+
+def instruction_class(spec: isa.InstructionSpec) -> InstructionClass:
+    """
+    The class of an instruction - ``jump``, ``alu`` for anything done by the ALU, ``load`` and ``store`` for a
+    move from or to memory, and ``move`` for any other move.
+    """
+    names = {op.name for op in spec.semantics}
+    if "jump" in names:
+        return "jump"
+    if names != {"move"}:
+        return "alu"
+    if any(op.a in _MEMORY_OPERANDS for op in spec.semantics):
+        return "load"
+    if any(op.dst in _MEMORY_OPERANDS for op in spec.semantics):
+        return "store"
+    return "move"
+
+
+def _memory_accesses(spec: isa.InstructionSpec) -> int:
+    return sum(operand in _MEMORY_OPERANDS for op in spec.semantics for operand in (op.dst, op.a, op.b))
+
+
+class CycleCosts:
+    """
+    How many clock cycles each instruction takes - the cost of its class, plus the cost of its addressing mode,
+    plus ``memory`` for each access it makes to data memory. Accesses to a mem-mapped device cost a further
+    ``mmio``. A user-defined XOP takes the cycles its definition gives, plus ``mmio`` for each device access.
+
+    The defaults are three cycles (fetch, decode and execute) for every instruction, one more for each data
+    memory access and another two for each device access.
+    """
+
+    __slots__ = ("classes", "memory", "mmio", "modes")
+
+    def __init__(
+        self,
+        classes: t.Mapping[InstructionClass, int] | None = None,
+        modes: t.Mapping[base.AddressingMode, int] | None = None,
+        memory: int = 1,
+        mmio: int = 2,
+    ) -> None:
+        self.classes: dict[InstructionClass, int] = {name: 3 for name in INSTRUCTION_CLASSES}
+        self.classes.update(classes or {})
+        self.modes: dict[base.AddressingMode, int] = {mode: 0 for mode in ADDRESSING_MODES.values()}
+        self.modes.update(modes or {})
+        self.memory = memory
+        self.mmio = mmio
+
+    def __repr__(self) -> str:
+        return f"CycleCosts(classes={self.classes}, modes={self.modes}, memory={self.memory}, mmio={self.mmio})"
+
+    @classmethod
+    def parse(cls, contents: str) -> CycleCosts:
+        """
+        Parse a cost file - a JSON object with any of ``classes`` (instruction class name -> cycles), ``modes``
+        (addressing mode name -> extra cycles), ``memory`` and ``mmio``. Anything left out keeps its default.
+        For example ``{"classes": {"jump": 4}, "modes": {"register_indirect": 1}, "mmio": 10}``.
+        """
+        try:
+            data = json.loads(contents)
+        except json.JSONDecodeError as e:
+            raise TimingError(f"invalid JSON: {e}") from e
+        if not isinstance(data, dict):
+            raise TimingError("expected a JSON object")
+
+        data = t.cast("dict[str, t.Any]", data)
+        if unknown := sorted(set(data) - {"classes", "modes", "memory", "mmio"}):
+            raise TimingError(f"unknown key {unknown[0]!r}")
+
+        classes = _parse_table(data.get("classes", {}), "classes", _CLASS_NAMES)
+        modes = _parse_table(data.get("modes", {}), "modes", ADDRESSING_MODES)
+        return cls(
+            classes, modes, _parse_cycles(data.get("memory", 1), "memory"), _parse_cycles(data.get("mmio", 2), "mmio")
+        )
+
+    @classmethod
+    def load(cls, path: str | None) -> CycleCosts:
+        """Parse the cost file at ``path``, or return the defaults if there is none."""
+        if not path:
+            return cls()
+        with open(path) as f:
+            return cls.parse(f.read())
+
+    def cycles(self, instruction: base.Instruction[t.Any]) -> int:
+        """The cycles an instruction takes, not counting any mem-mapped accesses."""
+        if isinstance(instruction, xops.ExtendedInstruction):
+            return instruction.definition.cycles
+
+        spec = isa.spec_for(type(instruction))
+        if spec is None or not spec.implemented:
+            # never completes
+            return 0
+        return self.classes[instruction_class(spec)] + self.modes[spec.mode] + self.memory * _memory_accesses(spec)
+
+
+_K = t.TypeVar("_K")
+
+
+def _parse_cycles(value: t.Any, name: str) -> int:
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        raise TimingError(f"{name}: expected a non-negative whole number of cycles, got {value!r}")
+    return value
+
+
+def _parse_table(value: t.Any, name: str, keys: dict[str, _K]) -> dict[_K, int]:
+    if not isinstance(value, dict):
+        raise TimingError(f"{name}: expected a JSON object")
+
+    table: dict[_K, int] = {}
+    for key, cycles in t.cast("dict[str, t.Any]", value).items():
+        if key not in keys:
+            raise TimingError(f"{name}: unknown name {key!r} - expected one of {', '.join(keys)}")
+        table[keys[key]] = _parse_cycles(cycles, f"{name}.{key}")
+    return table
+
+
+class LoopTiming(t.NamedTuple):
+    head: int
+    # the fewest and most cycles one iteration can take, over every path from the head back round to it
+    min_cycles: int
+    max_cycles: int
+    # whether the loop contains inner loops - their repeated iterations are not counted, only a single pass
+    nested: bool
+
+
+def _static_cycles(cpu: simulators.CPU[t.Any], costs: CycleCosts, address: int) -> int:
+    # the cost of the instruction at address, with the device penalty for any mem-mapped direct operand
+    memory = cpu.memory
+    instruction, args = cpu.decode_word(memory.get(address).unsigned_value)
+    cycles = costs.cycles(instruction)
+    kind: type[object] = type(instruction)
+    spec = isa.spec_for(kind)
+    if spec is not None and instruction.addressing_mode is base.AddressingMode.ABSOLUTE and memory.is_mapped(args[0]):
+        cycles += costs.mmio * _memory_accesses(spec)
+    return cycles
+
+
+def loop_timings(
+    cpu: simulators.CPU[t.Any], costs: CycleCosts, cfg: analysis.ControlFlowGraph | None = None
+) -> list[LoopTiming]:
+    """
+    The cycles per iteration of every loop in the control-flow graph of the loaded program, in the order of
+    ``cfg.loops``. Register-indirect accesses are assumed not to reach a mem-mapped device.
+    """
+    cfg = cfg or analysis.build_cfg(cpu)
+    block_cycles = {
+        start: sum(_static_cycles(cpu, costs, address) for address in range(block.start, block.end))
+        for start, block in cfg.blocks.items()
+    }
+
+    timings: list[LoopTiming] = []
+    for loop in cfg.loops:
+        # longest and shortest paths from the head through the body to each block, leaving out back edges -
+        # which makes the body acyclic - so each block is finished once all of its in-loop predecessors are
+        paths: dict[int, tuple[int, int]] = {}
+        pending = {
+            start: sum(1 for p in cfg.blocks[start].predecessors if p in loop.body and not cfg.dominates(start, p))
+            for start in loop.body
+        }
+        ready = [loop.head]
+        paths[loop.head] = (block_cycles[loop.head], block_cycles[loop.head])
+        while ready:
+            start = ready.pop()
+            shortest, longest = paths[start]
+            for successor in cfg.blocks[start].successors:
+                if successor not in loop.body or cfg.dominates(successor, start):
+                    continue
+                cycles = block_cycles[successor]
+                if (known := paths.get(successor)) is not None:
+                    paths[successor] = (min(known[0], shortest + cycles), max(known[1], longest + cycles))
+                else:
+                    paths[successor] = (shortest + cycles, longest + cycles)
+                pending[successor] -= 1
+                if not pending[successor]:
+                    ready.append(successor)
+
+        iterations = [paths[latch] for latch in loop.latches if latch in paths]
+        nested = any(other.head != loop.head and other.head in loop.body for other in cfg.loops)
+        timings.append(
+            LoopTiming(
+                loop.head,
+                min((shortest for shortest, _ in iterations), default=0),
+                max((longest for _, longest in iterations), default=0),
+                nested,
+            )
+        )
+    return timings
@@ -0,0 +1,356 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Declarative description of the v1a and v1d instruction sets.
+
+Each instruction is an :class:`InstructionSpec` giving its opcode fields, addressing mode, semantics as a short
+sequence of :class:`Op` steps and a disassembly template. The decode tables, decoders, executors and disassembly
+are all generated from these specs, so a new instruction or variant only needs a spec. The instruction classes
+in ``v1a`` and ``v1d`` remain the types every engine identifies instructions by.
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    "FIELDS_1A",
+    "FIELDS_1D",
+    "ISA_1A",
+    "ISA_1D",
+    "Field",
+    "InstructionSpec",
+    "Op",
+    "build_decoder",
+    "build_executor",
+    "decode_table",
+    "disassemble",
+    "spec_for",
+    "statements",
+]
+
+import typing as t
+
+from cpusim.common.instructions import base
+from cpusim.common.instructions import utils
+from cpusim.common.instructions.v1a import primary as primary_1a
+from cpusim.common.instructions.v1d import primary as primary_1d
+from cpusim.common.instructions.v1d import secondary as secondary_1d
+from cpusim.common.types import Int8
+from cpusim.common.types import Int16
+
+if t.TYPE_CHECKING:
+    from cpusim.common.types import FixedWidthInt
+
+_Mode = base.AddressingMode
+
+
+class Field(t.NamedTuple):
+    """A bit field of an instruction word - ``(word >> shift) & mask``. A zero mask is a constant 0."""
+
+    shift: int
+    mask: int
+
+
+# the argument fields of each addressing mode. v1a immediates have a leading 0 in place of the register field, for
+# compatibility with v1d
+FIELDS_1A: dict[base.AddressingMode, tuple[Field, ...]] = {
+    _Mode.IMMEDIATE: (Field(0, 0), Field(0, 0xFF)),
+    _Mode.ABSOLUTE: (Field(0, 0xFF),),
+    _Mode.DIRECT: (Field(0, 0xFF),),
+}
+FIELDS_1D: dict[base.AddressingMode, tuple[Field, ...]] = {
+    _Mode.REGISTER: (Field(10, 0x3), Field(8, 0x3)),  # R_sd, R_s
+    _Mode.REGISTER_INDIRECT: (Field(10, 0x3), Field(8, 0x3)),
+    _Mode.IMMEDIATE: (Field(10, 0x3), Field(0, 0xFF)),  # R_sd, KK
+    _Mode.ABSOLUTE: (Field(0, 0xFFF),),  # AA
+    _Mode.DIRECT: (Field(0, 0xFFF),),
+}
+
+
+class Op(t.NamedTuple):
+    """
+    One step of an instruction's semantics.
+
+    ``name`` is ``move`` (``dst = a``), an ALU method (``dst = alu.name(a, b)`` - ``b`` is left out for the shifts
+    and rotates), ``jump`` (to the address field, if the ALU flag named by ``a`` is set - or not set, for a name
+    starting with ``!`` - or always if ``a`` is empty) or ``trap`` (raise NotImplementedError with message ``a``).
+
+    Operands are ``acc`` (the v1a accumulator), ``r1``/``r2`` (the register fields), ``ra`` (register A), ``k``
+    (the immediate constant), ``sk`` (the immediate constant, sign extended), ``m`` (memory at the address field)
+    and ``mi`` (memory at the address held in ``r2``).
+    """
+
+    name: str
+    dst: str = ""
+    a: str = ""
+    b: str = ""
+
+
+class InstructionSpec(t.NamedTuple):
+    kind: type[base.Instruction[t.Any]]
+    opcode: int
+    # the secondary opcode (the low nibble) of v1d instructions with a primary opcode of 0b1111, otherwise -1
+    secondary: int
+    mode: base.AddressingMode
+    semantics: tuple[Op, ...]
+    # disassembly, with {r1}/{r2} replaced by the register fields, {k} by the constant and {a} by the address
+    template: str
+
+    @property
+    def incr_pc(self) -> bool:
+        # jumps set the PC themselves, everything else falls through
+        return not any(op.name == "jump" for op in self.semantics)
+
+    @property
+    def implemented(self) -> bool:
+        return not any(op.name == "trap" for op in self.semantics)
+
+
+def _trap(message: str) -> tuple[Op, ...]:
+    return (Op("trap", a=message),)
+
+
+ISA_1A: tuple[InstructionSpec, ...] = (
+    InstructionSpec(primary_1a.Move, 0b0000, -1, _Mode.IMMEDIATE, (Op("move", "acc", "k"),), "move {k}"),
+    InstructionSpec(primary_1a.Add, 0b0001, -1, _Mode.IMMEDIATE, (Op("add", "acc", "acc", "k"),), "add {k}"),
+    InstructionSpec(primary_1a.Sub, 0b0010, -1, _Mode.IMMEDIATE, (Op("sub", "acc", "acc", "k"),), "sub {k}"),
+    InstructionSpec(primary_1a.And, 0b0011, -1, _Mode.IMMEDIATE, (Op("and_", "acc", "acc", "k"),), "and {k}"),
+    InstructionSpec(primary_1a.Load, 0b0100, -1, _Mode.ABSOLUTE, (Op("move", "acc", "m"),), "load {a}"),
+    InstructionSpec(primary_1a.Store, 0b0101, -1, _Mode.ABSOLUTE, (Op("move", "m", "acc"),), "store {a}"),
+    InstructionSpec(primary_1a.AddM, 0b0110, -1, _Mode.ABSOLUTE, (Op("add", "acc", "acc", "m"),), "addm {a}"),
+    InstructionSpec(primary_1a.SubM, 0b0111, -1, _Mode.ABSOLUTE, (Op("sub", "acc", "acc", "m"),), "subm {a}"),
+    InstructionSpec(primary_1a.JumpU, 0b1000, -1, _Mode.DIRECT, (Op("jump"),), "jumpu {a}"),
+    InstructionSpec(primary_1a.JumpZ, 0b1001, -1, _Mode.DIRECT, (Op("jump", a="zero"),), "jumpz {a}"),
+    InstructionSpec(primary_1a.JumpNZ, 0b1010, -1, _Mode.DIRECT, (Op("jump", a="!zero"),), "jumpnz {a}"),
+)
+
+ISA_1D: tuple[InstructionSpec, ...] = (
+    InstructionSpec(primary_1d.Move, 0b0000, -1, _Mode.IMMEDIATE, (Op("move", "r1", "sk"),), "move {r1} {k}"),
+    InstructionSpec(primary_1d.Add, 0b0001, -1, _Mode.IMMEDIATE, (Op("add", "r1", "r1", "sk"),), "add {r1} {k}"),
+    InstructionSpec(primary_1d.Sub, 0b0010, -1, _Mode.IMMEDIATE, (Op("sub", "r1", "r1", "sk"),), "sub {r1} {k}"),
+    # the AND and OR constants are not sign extended
+    InstructionSpec(primary_1d.And, 0b0011, -1, _Mode.IMMEDIATE, (Op("and_", "r1", "r1", "k"),), "and {r1} {k}"),
+    InstructionSpec(primary_1d.Load, 0b0100, -1, _Mode.ABSOLUTE, (Op("move", "ra", "m"),), "load RA {a}"),
+    InstructionSpec(primary_1d.Store, 0b0101, -1, _Mode.ABSOLUTE, (Op("move", "m", "ra"),), "store RA {a}"),
+    InstructionSpec(primary_1d.AddM, 0b0110, -1, _Mode.ABSOLUTE, (Op("add", "ra", "ra", "m"),), "addm RA {a}"),
+    InstructionSpec(primary_1d.SubM, 0b0111, -1, _Mode.ABSOLUTE, (Op("sub", "ra", "ra", "m"),), "subm RA {a}"),
+    InstructionSpec(primary_1d.JumpU, 0b1000, -1, _Mode.DIRECT, (Op("jump"),), "jumpu {a}"),
+    InstructionSpec(primary_1d.JumpZ, 0b1001, -1, _Mode.DIRECT, (Op("jump", a="zero"),), "jumpz {a}"),
+    InstructionSpec(primary_1d.JumpNZ, 0b1010, -1, _Mode.DIRECT, (Op("jump", a="!zero"),), "jumpnz {a}"),
+    InstructionSpec(primary_1d.JumpC, 0b1011, -1, _Mode.DIRECT, (Op("jump", a="carry"),), "jumpc {a}"),
+    InstructionSpec(primary_1d.Call, 0b1100, -1, _Mode.DIRECT, _trap("CALL is unimplemented"), "call {a}"),
+    InstructionSpec(primary_1d.Or, 0b1101, -1, _Mode.IMMEDIATE, (Op("or_", "r1", "r1", "k"),), "or {r1} {k}"),
+    InstructionSpec(primary_1d.Xop1, 0b1110, -1, _Mode.IMMEDIATE, _trap("XOP1 is unimplemented"), "xop1 {r1} {k}"),
+    InstructionSpec(secondary_1d.Ret, 0b1111, 0b0000, _Mode.DIRECT, _trap("RET is not implemented"), "ret"),
+    InstructionSpec(secondary_1d.Move, 0b1111, 0b0001, _Mode.REGISTER, (Op("move", "r1", "r2"),), "move {r1} {r2}"),
+    InstructionSpec(
+        secondary_1d.Load, 0b1111, 0b0010, _Mode.REGISTER_INDIRECT, (Op("move", "r1", "mi"),), "load {r1} ({r2})"
+    ),
+    InstructionSpec(
+        secondary_1d.Store, 0b1111, 0b0011, _Mode.REGISTER_INDIRECT, (Op("move", "mi", "r1"),), "store {r1} ({r2})"
+    ),
+    InstructionSpec(secondary_1d.Rol, 0b1111, 0b0100, _Mode.REGISTER, (Op("rol", "r1", "r1"),), "rol {r1}"),
+    InstructionSpec(secondary_1d.Ror, 0b1111, 0b0101, _Mode.REGISTER, (Op("ror", "r1", "r1"),), "ror {r1}"),
+    InstructionSpec(secondary_1d.Add, 0b1111, 0b0110, _Mode.REGISTER, (Op("add", "r1", "r1", "r2"),), "add {r1} {r2}"),
+    InstructionSpec(secondary_1d.Sub, 0b1111, 0b0111, _Mode.REGISTER, (Op("sub", "r1", "r1", "r2"),), "sub {r1} {r2}"),
+    InstructionSpec(secondary_1d.And, 0b1111, 0b1000, _Mode.REGISTER, (Op("and_", "r1", "r1", "r2"),), "and {r1} {r2}"),
+    InstructionSpec(secondary_1d.Or, 0b1111, 0b1001, _Mode.REGISTER, (Op("or_", "r1", "r1", "r2"),), "or {r1} {r2}"),
+    InstructionSpec(secondary_1d.Xor, 0b1111, 0b1010, _Mode.REGISTER, (Op("xor", "r1", "r1", "r2"),), "xor {r1} {r2}"),
+    InstructionSpec(secondary_1d.Asl, 0b1111, 0b1011, _Mode.REGISTER, (Op("asl", "r1", "r1"),), "asl {r1}"),
+    InstructionSpec(
+        secondary_1d.Xop2, 0b1111, 0b1100, _Mode.REGISTER_INDIRECT, _trap("XOP2 is not implemented"), "xop2 {r1} ({r2})"
+    ),
+    InstructionSpec(
+        secondary_1d.Xop3, 0b1111, 0b1101, _Mode.REGISTER, _trap("XOP3 is not implemented"), "xop3 {r1} {r2}"
+    ),
+    InstructionSpec(
+        secondary_1d.Xop4, 0b1111, 0b1110, _Mode.REGISTER_INDIRECT, _trap("XOP4 is not implemented"), "xop4 {r1} ({r2})"
+    ),
+    InstructionSpec(
+        secondary_1d.Xop5, 0b1111, 0b1111, _Mode.REGISTER, _trap("XOP5 is not implemented"), "xop5 {r1} {r2}"
+    ),
+)
+
+_SPECS: dict[type[object], InstructionSpec] = {spec.kind: spec for spec in (*ISA_1A, *ISA_1D)}
+
+
+def spec_for(kind: type[object]) -> InstructionSpec | None:
+    return _SPECS.get(kind)
+
+
+def decode_table(isa: t.Sequence[InstructionSpec]) -> dict[t.Any, t.Any]:
+    """
+    Build the table the CPUs decode through, of one instance of each instruction - keyed by the opcode for a
+    v1a instruction set, and by the (primary, secondary) opcode pair for a v1d one.
+    """
+    wide = any(spec.secondary >= 0 for spec in isa)
+    return {((spec.opcode, spec.secondary) if wide else spec.opcode): spec.kind() for spec in isa}
+
+
+def _extractor(fields: tuple[Field, ...]) -> t.Callable[[int], tuple[int, ...]]:
+    parts = [("0" if not field.mask else f"(word >> {field.shift}) & {field.mask:#x}") for field in fields]
+    return eval(f"lambda word: ({', '.join(parts)},)")
+
+
+def build_decoder(
+    table: dict[t.Any, t.Any], fields: dict[base.AddressingMode, tuple[Field, ...]]
+) -> t.Callable[[int], tuple[t.Any, tuple[int, ...]]]:
+    """
+    Build the decoder for a table from :func:`decode_table`, taking an instruction word to the instruction and
+    its arguments. The table is looked up on every call, so instructions added to it later are decoded too.
+    """
+    extract = {mode: _extractor(mode_fields) for mode, mode_fields in fields.items()}
+    wide = any(isinstance(key, tuple) for key in table)
+
+    def decode_1a(word: int) -> tuple[t.Any, tuple[int, ...]]:
+        opcode = (word >> 12) & 0xF
+        instruction = table.get(opcode)
+        if instruction is None:
+            raise NotImplementedError(f"Unknown opcode {opcode}")
+        return instruction, extract[instruction.addressing_mode](word)
+
+    def decode_1d(word: int) -> tuple[t.Any, tuple[int, ...]]:
+        # the secondary opcode is only used by instructions with a primary opcode of 0b1111
+        primary_opcode = (word >> 12) & 0xF
+        secondary_opcode = word & 0xF if primary_opcode == 0b1111 else -1
+        instruction = table.get((primary_opcode, secondary_opcode))
+        if instruction is None:
+            raise NotImplementedError(f"Unknown opcode {primary_opcode} {secondary_opcode}")
+        if (extractor := extract.get(instruction.addressing_mode)) is None:
+            raise NotImplementedError("Unknown addressing mode")
+        return instruction, extractor(word)
+
+    return decode_1d if wide else decode_1a
+
+
+class _Renderer:
+    """Renders the semantics of a spec as Python statements, with either symbolic or known arguments."""
+
+    __slots__ = ("_args", "_constant", "_wide")
+
+    def __init__(
+        self, wide: bool, args: tuple[int, ...] | None, constant: t.Callable[[FixedWidthInt], str] | None
+    ) -> None:
+        self._wide = wide
+        self._args = args
+        self._constant = constant
+
+    def _arg(self, index: int) -> str:
+        return f"args[{index}]" if self._args is None else str(self._args[index])
+
+    def _immediate(self, sign_extend: bool) -> str:
+        if self._args is not None and self._constant is not None:
+            value: FixedWidthInt = (
+                utils.sign_extend_8_to_16_bits(self._args[1])
+                if sign_extend
+                else (Int16(self._args[1]) if self._wide else Int8(self._args[1]))
+            )
+            return self._constant(value)
+        if sign_extend:
+            return f"sign_extend_8_to_16_bits({self._arg(1)})"
+        return f"{'Int16' if self._wide else 'Int8'}({self._arg(1)})"
+
+    def _address(self, operand: str) -> str:
+        return self._arg(0) if operand == "m" else f"cpu.registers.get({self._arg(1)}).unsigned_value"
+
+    def read(self, operand: str) -> str:
+        match operand:
+            case "acc":
+                return "Int8(cpu.acc.value)"
+            case "r1" | "r2":
+                return f"cpu.registers.get({self._arg(0 if operand == 'r1' else 1)})"
+            case "ra":
+                return "cpu.registers.get(0)"
+            case "k" | "sk":
+                return self._immediate(operand == "sk")
+            case "m" | "mi":
+                value = f"cpu.memory.get({self._address(operand)})"
+                return value if self._wide else f"Int8({value}.unsigned_value)"
+            case _:
+                raise ValueError(f"Unknown operand {operand!r}")
+
+    def write(self, operand: str, value: str) -> str:
+        match operand:
+            case "acc":
+                return f"cpu.acc.set({value}.unsigned_value)"
+            case "r1":
+                return f"cpu.registers.set({self._arg(0)}, {value})"
+            case "ra":
+                return f"cpu.registers.set(0, {value})"
+            case "m" | "mi":
+                stored = value if self._wide else f"Int16({value}.unsigned_value)"
+                return f"cpu.memory.set({self._address(operand)}, {stored})"
+            case _:
+                raise ValueError(f"Cannot write operand {operand!r}")
+
+    def op(self, op: Op) -> str:
+        match op.name:
+            case "move":
+                return self.write(op.dst, self.read(op.a))
+            case "jump":
+                target = f"cpu.pc.set({self._arg(0)})"
+                if not op.a:
+                    return target
+                if op.a.startswith("!"):
+                    return f"cpu.pc.incr() if cpu.alu.{op.a[1:]} else {target}"
+                return f"{target} if cpu.alu.{op.a} else cpu.pc.incr()"
+            case "trap":
+                return f"raise NotImplementedError({op.a!r})"
+            case "rol" | "ror" | "asl":
+                return self.write(op.dst, f"cpu.alu.{op.name}({self.read(op.a)})")
+            case _:
+                return self.write(op.dst, f"cpu.alu.{op.name}({self.read(op.a)}, {self.read(op.b)})")
+
+
+def statements(
+    spec: InstructionSpec,
+    wide: bool,
+    args: tuple[int, ...] | None = None,
+    constant: t.Callable[[FixedWidthInt], str] | None = None,
+) -> list[str]:
+    """
+    Python statements executing an instruction against ``cpu`` - not including the PC increment of non-jumps.
+
+    With ``args`` left as None the statements read the arguments from ``args``, otherwise they are substituted
+    in, and ``constant`` (if given) is called with each immediate value to get the name it is folded into.
+    """
+    renderer = _Renderer(wide, args, constant)
+    return [renderer.op(op) for op in spec.semantics]
+
+
+_NAMESPACE: dict[str, t.Any] = {
+    "Int8": Int8,
+    "Int16": Int16,
+    "sign_extend_8_to_16_bits": utils.sign_extend_8_to_16_bits,
+}
+
+
+def build_executor(spec: InstructionSpec, wide: bool) -> t.Callable[[tuple[int, ...], t.Any], None]:
+    """Build a function equivalent to the instruction's ``execute``, compiled from its semantics."""
+    source = "\n".join(["def execute(args, cpu):", *(f"    {line}" for line in statements(spec, wide))])
+    namespace = dict(_NAMESPACE)
+    exec(source, namespace)
+    return namespace["execute"]
+
+
+def disassemble(spec: InstructionSpec, args: tuple[int, ...]) -> str:
+    fields = {"a": hex(args[0]), "r1": utils.register_repr(args[0])}
+    if len(args) > 1:
+        fields.update(r2=utils.register_repr(args[1]), k=hex(args[1]))
+    return spec.template.format(**fields)
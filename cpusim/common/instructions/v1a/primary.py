@@ -184,6 +184,8 @@ class JumpZ(base.Instruction1a):
         args_ = base.DirectModeArgs(*args)
 
         if not cpu.alu.zero:
+            # not taken - fall through to the next instruction
+            cpu.pc.incr()
             return
 
         cpu.pc.set(args_.constant)
@@ -203,6 +205,8 @@ class JumpNZ(base.Instruction1a):
         args_ = base.DirectModeArgs(*args)
 
         if cpu.alu.zero:
+            # not taken - fall through to the next instruction
+            cpu.pc.incr()
             return
 
         cpu.pc.set(args_.constant)
@@ -184,6 +184,8 @@ class JumpZ(base.Instruction1d):
         args_ = base.DirectModeArgs(*args)
 
         if not cpu.alu.zero:
+            # not taken - fall through to the next instruction
+            cpu.pc.incr()
             return
 
         cpu.pc.set(args_.constant)
@@ -203,6 +205,8 @@ class JumpNZ(base.Instruction1d):
         args_ = base.DirectModeArgs(*args)
 
         if cpu.alu.zero:
+            # not taken - fall through to the next instruction
+            cpu.pc.incr()
             return
 
         cpu.pc.set(args_.constant)
@@ -222,6 +226,8 @@ class JumpC(base.Instruction1d):
         args_ = base.DirectModeArgs(*args)
 
         if not cpu.alu.carry:
+            # not taken - fall through to the next instruction
+            cpu.pc.incr()
             return
 
         cpu.pc.set(args_.constant)
@@ -263,7 +269,7 @@ class Xop1(base.Instruction1d):
 
     def repr(self, args: tuple[int, ...]) -> str:
         args_ = base.ImmediateModeArgs(*args)
-        return f"or {utils.register_repr(args_.register)} {hex(args_.constant)}"
+        return f"xop1 {utils.register_repr(args_.register)} {hex(args_.constant)}"
 
     def execute(self, args: tuple[int, ...], cpu: simulators.CPU1d) -> None:
         raise NotImplementedError("XOP1 is unimplemented")
@@ -204,7 +204,7 @@ class Asl(base.Instruction1d):
 
     def repr(self, args: tuple[int, ...]) -> str:
         args_ = base.RegisterModeArgs(*args)
-        return f"sub {utils.register_repr(args_.register_1)}"
+        return f"asl {utils.register_repr(args_.register_1)}"
 
     def execute(self, args: tuple[int, ...], cpu: simulators.CPU1d) -> None:
         args_ = base.RegisterModeArgs(*args)
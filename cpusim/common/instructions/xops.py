@@ -0,0 +1,176 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+User-defined extended instructions, bound to the XOP slots of the v1d instruction set.
+
+An :class:`XopDefinition` gives a Python handler for an XOP along with everything it may touch, which is what lets
+the faster engines run it without handing control back to the interpreter. Definitions are bound to a slot with
+``CPU1d.register_xop``.
+"""
+
+from __future__ import annotations
+
+__all__ = ["SLOTS", "ExtendedInstruction", "XopDefinition", "instruction_table"]
+
+import typing as t
+
+from cpusim.common.instructions import base
+from cpusim.common.instructions import isa
+from cpusim.common.instructions import utils
+from cpusim.common.instructions.v1d import primary as primary_1d
+from cpusim.common.instructions.v1d import secondary as secondary_1d
+
+if t.TYPE_CHECKING:
+    from cpusim.backend import simulators
+
+# handler(args, cpu) - the same signature as Instruction.execute
+XopHandler = t.Callable[[tuple[int, ...], "simulators.CPU1d"], None]
+
+# register names a definition can declare, and the index of the argument (or the fixed register) each refers to
+_OPERAND_REGISTERS = {"r1": 0, "r2": 1}
+_FIXED_REGISTERS = {"ra": 0, "rb": 1, "rc": 2, "rd": 3}
+
+
+class XopDefinition:
+    """
+    A user-defined instruction, run by ``handler(args, cpu)`` with the decoded arguments of the XOP.
+
+    ``reads`` and ``writes`` name the registers the handler may read and write - ``r1`` and ``r2`` for the register
+    fields of the instruction, or ``ra`` to ``rd`` for a fixed register. ``reads_memory`` and ``writes_memory`` are
+    whether it may access memory, and ``flags`` whether it reads or sets the ALU flags. Engines that keep state
+    outside of the CPU only synchronise what is declared, so a handler must not touch anything else - the PC
+    included, which always moves on to the next instruction. ``cycles`` is how many clock cycles it takes.
+    """
+
+    __slots__ = ("cycles", "flags", "handler", "name", "reads", "reads_memory", "writes", "writes_memory")
+
+    def __init__(
+        self,
+        name: str,
+        handler: XopHandler,
+        *,
+        reads: t.Iterable[str] = (),
+        writes: t.Iterable[str] = (),
+        reads_memory: bool = False,
+        writes_memory: bool = False,
+        flags: bool = False,
+        cycles: int = 1,
+    ) -> None:
+        if not name or not name.isidentifier():
+            raise ValueError(f"invalid XOP name {name!r}")
+        if cycles < 1:
+            raise ValueError("an XOP takes at least one cycle")
+
+        self.name = name
+        self.handler = handler
+        self.reads = frozenset(reads)
+        self.writes = frozenset(writes)
+        for register in self.reads | self.writes:
+            if register not in _OPERAND_REGISTERS and register not in _FIXED_REGISTERS:
+                raise ValueError(f"unknown register {register!r} - expected r1, r2 or ra to rd")
+        self.reads_memory = reads_memory
+        self.writes_memory = writes_memory
+        self.flags = flags
+        self.cycles = cycles
+
+    def __repr__(self) -> str:
+        return f"XopDefinition({self.name!r})"
+
+
+class ExtendedInstruction(base.Instruction1d):
+    """An XOP bound to a :class:`XopDefinition`. Subclassed for each slot, to take on its addressing mode."""
+
+    __slots__ = ("definition",)
+
+    def __init__(self, definition: XopDefinition) -> None:
+        if self.addressing_mode is base.AddressingMode.IMMEDIATE and "r2" in definition.reads | definition.writes:
+            raise ValueError(f"{definition.name} is bound to an immediate mode XOP, which has no second register")
+        self.definition = definition
+
+    @staticmethod
+    def _registers(names: frozenset[str], args: tuple[int, ...]) -> tuple[int, ...]:
+        resolved = {
+            args[_OPERAND_REGISTERS[name]] if name in _OPERAND_REGISTERS else _FIXED_REGISTERS[name] for name in names
+        }
+        return tuple(sorted(resolved))
+
+    def reads(self, args: tuple[int, ...]) -> tuple[int, ...]:
+        """The registers the handler may read when run with these arguments."""
+        return self._registers(self.definition.reads, args)
+
+    def writes(self, args: tuple[int, ...]) -> tuple[int, ...]:
+        """The registers the handler may write when run with these arguments."""
+        return self._registers(self.definition.writes, args)
+
+    def repr(self, args: tuple[int, ...]) -> str:
+        name = self.definition.name
+        if self.addressing_mode is base.AddressingMode.IMMEDIATE:
+            args_ = base.ImmediateModeArgs(*args)
+            return f"{name} {utils.register_repr(args_.register)} {hex(args_.constant)}"
+
+        args_ = base.RegisterModeArgs(*args)
+        if self.addressing_mode is base.AddressingMode.REGISTER_INDIRECT:
+            return f"{name} {utils.register_repr(args_.register_1)} ({utils.register_repr(args_.register_2)})"
+        return f"{name} {utils.register_repr(args_.register_1)} {utils.register_repr(args_.register_2)}"
+
+    def execute(self, args: tuple[int, ...], cpu: simulators.CPU1d) -> None:
+        self.definition.handler(args, cpu)
+
+
+class Xop1(ExtendedInstruction, primary_1d.Xop1):
+    __slots__ = ()
+
+
+class Xop2(ExtendedInstruction, secondary_1d.Xop2):
+    __slots__ = ()
+
+
+class Xop3(ExtendedInstruction, secondary_1d.Xop3):
+    __slots__ = ()
+
+
+class Xop4(ExtendedInstruction, secondary_1d.Xop4):
+    __slots__ = ()
+
+
+class Xop5(ExtendedInstruction, secondary_1d.Xop5):
+    __slots__ = ()
+
+
+# XOP slot number -> the unimplemented instruction it stands for, and the class bound to it in its place
+_SLOTS: dict[int, tuple[type[base.Instruction1d], type[ExtendedInstruction]]] = {
+    1: (primary_1d.Xop1, Xop1),
+    2: (secondary_1d.Xop2, Xop2),
+    3: (secondary_1d.Xop3, Xop3),
+    4: (secondary_1d.Xop4, Xop4),
+    5: (secondary_1d.Xop5, Xop5),
+}
+SLOTS = frozenset(_SLOTS)
+
+
+def instruction_table(table: dict[t.Any, t.Any], definitions: dict[int, XopDefinition]) -> dict[t.Any, t.Any]:
+    """A copy of a v1d decode table, with the XOP in each slot of ``definitions`` bound to its definition."""
+    table = dict(table)
+    for slot, definition in definitions.items():
+        unimplemented, kind = _SLOTS[slot]
+        spec = isa.spec_for(unimplemented)
+        assert spec is not None
+        table[spec.opcode, spec.secondary] = kind(definition)
+    return table
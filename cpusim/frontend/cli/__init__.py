@@ -21,61 +21,270 @@ from __future__ import annotations
 
 __all__ = ["run_cli"]
 
+import contextlib
+import runpy
+import signal
+import sys
 import typing as t
 
+from cpusim.backend import accesses
+from cpusim.backend import aot
+from cpusim.backend import branches
+from cpusim.backend import cache
+from cpusim.backend import pipeline
+from cpusim.backend import repetition
 from cpusim.backend import simulators
+from cpusim.backend import timing
 from cpusim.backend.peripherals import gpio
+from cpusim.backend.peripherals import replay
+from cpusim.backend.peripherals import stimulus
+from cpusim.backend.peripherals import timer
+from cpusim.frontend.cli import dump
 from cpusim.frontend.cli.interactive import runner
+from cpusim.frontend.cli.interactive import script
 
 if t.TYPE_CHECKING:
+    import types
+
     from cpusim.__main__ import CliArguments
 
 
-def run_cli(args: CliArguments, mem: list[int]) -> None:
+def run_cli(args: CliArguments, mem: list[int]) -> int:
     cpu = simulators.CPU1a(mem) if args.arch == "1a" else simulators.CPU1d(mem)
+    cpu.fast_forward_idle = args.fast_forward_idle
+    cpu.accelerate_loops = args.accelerate_loops
+    cpu.predecode = args.predecode
+    cpu.jit = args.jit
+
+    if args.timing or args.cycle_costs is not None:
+        try:
+            cpu.timing = timing.CycleCosts.load(args.cycle_costs)
+        except timing.TimingError as e:
+            print(f"Error in cycle cost file {args.cycle_costs}: {e}", file=sys.stderr)
+            return 2
+    if args.pipeline or args.forwarding:
+        cpu.pipeline = pipeline.PipelineModel(cpu, forwarding=args.forwarding)
+    if args.icache is not None or args.dcache is not None:
+        try:
+            icache = cache.CacheConfig.parse(args.icache) if args.icache is not None else None
+            dcache = cache.CacheConfig.parse(args.dcache) if args.dcache is not None else None
+        except ValueError as e:
+            print(f"Invalid cache: {e}", file=sys.stderr)
+            return 2
+        cpu.cache = cache.CacheSimulator(cpu, instruction=icache, data=dcache)
+    if args.branch_stats or args.branch_history is not None:
+        try:
+            cpu.branches = branches.BranchProfiler(cpu, history_length=args.branch_history or 8)
+        except ValueError as e:
+            print(f"Invalid branch history: {e}", file=sys.stderr)
+            return 2
+    if args.profile_accesses:
+        cpu.access_profiler = accesses.AccessProfiler(cpu)
+
+    if args.xops is not None:
+        if not isinstance(cpu, simulators.CPU1d):
+            print("--xops requires --arch 1d", file=sys.stderr)
+            return 2
+        register_xops = runpy.run_path(args.xops).get("register_xops")
+        if not callable(register_xops):
+            print(f"{args.xops} does not define register_xops(cpu)", file=sys.stderr)
+            return 2
+        register_xops(cpu)
 
-    if args.enable_bug_trap:
+    if args.enable_bug_trap or args.enable_timer:
         cpu.gpio = gpio.GPIO(cpu, gpio.GPIOConfig(2, args.bug_trap_address))
-        cpu.gpio.set_device(0, gpio.BugTrap())
+        if args.enable_bug_trap:
+            cpu.gpio.set_device(0, gpio.BugTrap())
+        if args.enable_timer:
+            cpu.gpio.set_device(1, timer.Timer(cpu.scheduler))
+
+    input_recorder: replay.InputRecorder | None = None
+    if args.record_inputs is not None:
+        if cpu.gpio is None:
+            print("--record-inputs requires a GPIO device to be enabled", file=sys.stderr)
+            return 2
+        input_recorder = replay.InputRecorder(cpu, cpu.gpio)
+
+    if args.replay_inputs is not None:
+        if cpu.gpio is not None:
+            print("--replay-inputs replaces the GPIO devices and cannot be combined with them", file=sys.stderr)
+            return 2
+        try:
+            with open(args.replay_inputs, "rb") as f:
+                replay.InputReplayer(cpu, f.read())
+        except replay.ReplayError as e:
+            print(f"Error in replay log {args.replay_inputs}: {e}", file=sys.stderr)
+            return 2
+
+    if args.aot:
+        # after the devices are attached, so that their mem-mapped addresses are left to the interpreter
+        cpu.compiled_program = aot.CompiledProgram(cpu, aot.load(mem, args.arch or "1a", args.cache_dir))
+
+    if args.detect_repetition is not None:
+        # created after the devices so that their mem-mapped addresses are left out of the memory hash
+        cpu.repetition = repetition.RepetitionDetector(cpu, args.detect_repetition)
 
     debugger = runner.CPU1aInteractiveDebugger(cpu) if args.arch == "1a" else runner.CPU1dInteractiveDebugger(cpu)  # type: ignore[reportArgumentType]
+    debugger.interrupt_check_interval = args.check_interval
+    if args.progress is not None:
+        debugger.progress_fn = _print_progress
+        debugger.progress_interval = args.progress
+    # keep stdout clean for machine-readable dumps written to it
+    log = sys.stderr if args.dump_format != "text" and args.dump_file is None else sys.stdout
+
+    commands: list[script.ScriptCommand] = []
+    if args.script is not None:
+        # parse the whole script before running anything so that mistakes are reported straight away
+        try:
+            commands = script.parse_script(_read_script(args.script), debugger)
+        except script.ScriptError as e:
+            print(f"Error in script {args.script}: {e}", file=sys.stderr)
+            return 2
+
+    recorder: stimulus.OutputRecorder | None = None
+    if args.stimulus is not None:
+        try:
+            with open(args.stimulus) as f:
+                stimulus.schedule_stimulus(cpu, stimulus.parse_stimulus(f.read()))
+        except stimulus.StimulusError as e:
+            print(f"Error in stimulus file {args.stimulus}: {e}", file=sys.stderr)
+            return 2
+        recorder = stimulus.OutputRecorder(cpu)
+
+    try:
+        exit_code = _run(args, cpu, debugger, commands, log)
+    except replay.ReplayError as e:
+        print(f"Error replaying {args.replay_inputs}: {e}", file=sys.stderr)
+        print("\n== Recent instructions (oldest first) ==", file=log)
+        print(debugger.info_history(), file=log)
+        return 1
+    except Exception:
+        # show how the program got here before the traceback is printed
+        print("\n== Recent instructions (oldest first) ==", file=log)
+        print(debugger.info_history(), file=log)
+        raise
+    finally:
+        if input_recorder is not None and args.record_inputs is not None:
+            input_recorder.save(args.record_inputs)
+
+    if recorder is not None:
+        if args.output_trace is not None:
+            with open(args.output_trace, "w") as f:
+                f.write(recorder.format() + "\n")
+        else:
+            print("\n== Device outputs (cycle device.field value) ==", file=log)
+            print(recorder.format(), file=log)
+
+    dump.dump_state(cpu, debugger, args.dump_format, args.dump_file)
+    return exit_code
+
+
+def _read_script(path: str) -> str:
+    if path == "-":
+        return sys.stdin.read()
+
+    with open(path) as f:
+        return f.read()
+
+
+def _run(
+    args: CliArguments,
+    cpu: simulators.CPU[t.Any],
+    debugger: runner.InteractiveDebugger[t.Any],
+    commands: list[script.ScriptCommand],
+    log: t.TextIO,
+) -> int:
+    if args.script is not None:
+        passed, out = script.run_script(debugger, commands)
+        print(out, file=log)
+        if not passed:
+            print(f"{debugger.failed_assertions} assertion(s) failed", file=log)
+        return 0 if passed else 1
+
     if not args.interactive:
         # run requested number of steps
-        instructions_run, halted = 0, False
         assert args.steps is not None
-        for _ in range(args.steps):
-            instructions_run += 1
-            halted = cpu.step()
-
-            if halted:
-                break
-
-        if halted:
+        with _interrupt_on_sigint(debugger):
+            result = debugger.run(args.steps)
+        print(debugger.describe_run(result), file=log)
+        if cpu.timing is not None:
+            cpi = cpu.cycles / cpu.history.total if cpu.history.total else 0
+            print(f"{cpu.cycles} clock cycles were run ({cpi:.2f} per instruction)", file=log)
+        if (model := cpu.pipeline) is not None:
             print(
-                f"Executed {instructions_run} instructions\n"
-                f"Halt-loop reached at address {hex(cpu.pc.value)}. Exiting..."
+                f"{model.cycles} pipelined cycles were run, of which {model.stall_cycles} were stalls and "
+                f"{model.flush_cycles} were flushes after taken jumps",
+                file=log,
+            )
+        if (simulator := cpu.cache) is not None:
+            for name, simulated in (("instruction", simulator.instruction), ("data", simulator.data)):
+                if simulated is not None:
+                    print(
+                        f"{simulated.hits} {name} cache hits and {simulated.misses} misses "
+                        f"({simulated.hit_rate:.1%} hit rate)",
+                        file=log,
+                    )
+        if (profiler := cpu.branches) is not None:
+            accuracies = ", ".join(f"{name} {profiler.accuracy(p):.1%}" for p, name in runner.PREDICTOR_NAMES.items())
+            print(f"{profiler.branches} conditional branches were run - predictor accuracy: {accuracies}", file=log)
+        if (access_profiler := cpu.access_profiler) is not None:
+            hottest = access_profiler.hottest(1)
+            print(
+                f"{sum(access_profiler.reads)} data reads and {sum(access_profiler.writes)} writes were made"
+                + (f", most often to {hex(hottest[0][0])}" if hottest else ""),
+                file=log,
+            )
+        if cpu.idle_instructions_skipped:
+            print(f"{cpu.idle_instructions_skipped} idle polling instructions were fast-forwarded", file=log)
+        if cpu.loop_instructions_skipped:
+            print(f"{cpu.loop_instructions_skipped} counted loop instructions were accelerated", file=log)
+        if args.predecode:
+            program = cpu.decoded_program
+            print(
+                f"{program.instructions} predecoded instructions were run in {program.dispatches} dispatches "
+                f"({program.dispatch_reduction:.1%} fewer)",
+                file=log,
+            )
+        if cpu.compiled_program is not None:
+            print(f"{cpu.compiled_program.instructions} instructions were run from compiled code", file=log)
+        if args.jit:
+            tracer = cpu.trace_jit
+            print(
+                f"{tracer.instructions_traced} instructions were run by {len(tracer.traces)} compiled trace(s)",
+                file=log,
             )
-        else:
-            print(f"Executed {instructions_run} instructions")
     else:
         # do interactive mode i/o
-        print("Welcome to the interactive debugger!\n    '-h' or '--help' to show commands\n    'quit' to quit")
+        print(
+            "Welcome to the interactive debugger!\n    '-h' or '--help' to show commands\n    'quit' to quit\n"
+            "    Ctrl-C to pause a running simulation",
+            file=log,
+        )
         while not debugger.halted:
-            command = input("(idb) ")
+            log.write("(idb) ")
+            log.flush()
+            command = input()
 
-            out = debugger.execute_command(command)
+            with _interrupt_on_sigint(debugger):
+                out = debugger.execute_command(command)
             if out is not None:
-                print(out)
-
-    # dump processor state
-    print("\n== Final processor state ==")
-    print("\nMemory:")
-    print(debugger.info_memory())
-    print("\nRegisters:")
-    print(debugger.info_registers())
-    print("\nFlags:")
-    print(debugger.info_flags())
-
-    if cpu.gpio is not None:
-        print("\nBugTrap:")
-        print(debugger.info_bugtrap())
+                print(out, file=log)
+
+    return 0
+
+
+@contextlib.contextmanager
+def _interrupt_on_sigint(debugger: runner.InteractiveDebugger[t.Any]) -> t.Iterator[None]:
+    # Ctrl-C pauses the simulation at the next check instead of killing the process and losing its state
+    def handler(_: int, __: types.FrameType | None) -> None:
+        debugger.interrupt()
+
+    previous = signal.signal(signal.SIGINT, handler)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+
+def _print_progress(executed: int, rate: float, pc: int) -> None:
+    print(f"[progress] {executed} instructions, {rate:,.0f} instructions/s, pc={hex(pc)}", file=sys.stderr)
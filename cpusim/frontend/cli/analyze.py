@@ -0,0 +1,105 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+__all__ = ["ANALYSIS_FORMATS", "run_analyze"]
+
+import json
+import sys
+import typing as t
+
+from cpusim import analysis
+from cpusim.backend import simulators
+from cpusim.backend import timing
+from cpusim.backend.peripherals import gpio
+
+if t.TYPE_CHECKING:
+    from cpusim.__main__ import CliArguments
+
+AnalysisFormat = t.Literal["text", "dot", "json"]
+ANALYSIS_FORMATS: tuple[AnalysisFormat, ...] = ("text", "dot", "json")
+
+
+def _format_cycles(loop_timing: timing.LoopTiming) -> str:
+    if loop_timing.min_cycles == loop_timing.max_cycles:
+        cycles = str(loop_timing.min_cycles)
+    else:
+        cycles = f"{loop_timing.min_cycles}-{loop_timing.max_cycles}"
+    return f"{cycles} cycles per iteration" + (" (plus inner loop iterations)" if loop_timing.nested else "")
+
+
+def _format_text(cfg: analysis.ControlFlowGraph, dead_flags: list[int], loop_timings: list[timing.LoopTiming]) -> str:
+    lines = [f"Image {cfg.image_hash}: {len(cfg.blocks)} basic blocks, {len(cfg.loops)} loops", ""]
+    for start, block in sorted(cfg.blocks.items()):
+        succs = ", ".join(hex(s) for s in block.successors) or "-"
+        lines.append(f"block {hex(start)}-{hex(block.last)} -> {succs}")
+        lines.extend(f"    {hex(a)}: {cfg.disassembly[a]}" for a in range(block.start, block.end))
+
+    if cfg.loops:
+        lines.append("")
+    for loop, loop_timing in zip(cfg.loops, loop_timings):
+        body = ", ".join(hex(b) for b in sorted(loop.body))
+        lines.append(f"loop at {hex(loop.head)}: blocks {body}, {_format_cycles(loop_timing)}")
+
+    lines.append("")
+    if ranges := cfg.unreachable_ranges():
+        lines.append("unreachable code: " + ", ".join(f"{hex(a)}-{hex(b - 1)}" for a, b in ranges))
+    if data := [a for a, kind in enumerate(cfg.word_kinds) if kind is analysis.WordKind.DATA]:
+        lines.append("data words: " + ", ".join(hex(a) for a in data))
+    if dead_flags:
+        lines.append("dead flag writes: " + ", ".join(hex(a) for a in dead_flags))
+    return "\n".join(lines)
+
+
+def run_analyze(args: CliArguments, mem: list[int]) -> int:
+    cpu = simulators.CPU1a(mem) if args.arch == "1a" else simulators.CPU1d(mem)
+    if args.enable_bug_trap or args.enable_timer:
+        # only the mapping matters - mapped addresses are never treated as code or data
+        cpu.gpio = gpio.GPIO(cpu, gpio.GPIOConfig(2, args.bug_trap_address))
+
+    try:
+        costs = timing.CycleCosts.load(args.cycle_costs)
+    except timing.TimingError as e:
+        print(f"Error in cycle cost file {args.cycle_costs}: {e}", file=sys.stderr)
+        return 2
+
+    cfg = analysis.build_cfg(cpu)
+    match args.analysis_format:
+        case "dot":
+            out = cfg.to_dot()
+        case "json":
+            data = cfg.to_dict()
+            for loop, loop_timing in zip(data["loops"], timing.loop_timings(cpu, costs, cfg)):
+                loop["cycles"] = {
+                    "min": loop_timing.min_cycles,
+                    "max": loop_timing.max_cycles,
+                    "nested": loop_timing.nested,
+                }
+            out = json.dumps(data, indent=2)
+        case _:
+            dead_flags = analysis.dead_flag_writes(cpu, analysis.flag_liveness(cpu, cfg))
+            out = _format_text(cfg, dead_flags, timing.loop_timings(cpu, costs, cfg))
+
+    if args.analysis_output is None:
+        sys.stdout.write(out + "\n")
+    else:
+        with open(args.analysis_output, "w") as f:
+            f.write(out + "\n")
+    return 0
@@ -0,0 +1,171 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+__all__ = ["DUMP_FORMATS", "dump_state"]
+
+import contextlib
+import csv
+import json
+import sys
+import typing as t
+
+from cpusim.backend.peripherals import gpio
+
+if t.TYPE_CHECKING:
+    from cpusim.backend import simulators
+    from cpusim.frontend.cli.interactive import runner
+
+DumpFormat = t.Literal["text", "json", "csv", "bin"]
+DUMP_FORMATS: tuple[DumpFormat, ...] = ("text", "json", "csv", "bin")
+
+
+def _memory_values(cpu: simulators.CPU[t.Any]) -> t.Iterator[int | None]:
+    # mem-mapped addresses are not read, reading them could have side effects on the mapped device
+    memory = cpu.memory
+    for addr in range(memory.size):
+        yield None if memory.is_mapped(addr) else memory.get(addr).unsigned_value
+
+
+def _bugtrap_values(cpu: simulators.CPU[t.Any]) -> dict[str, bool] | None:
+    if cpu.gpio is None:
+        return None
+
+    bugtrap = next((d for d in cpu.gpio._devices if isinstance(d, gpio.BugTrap)), None)
+    if bugtrap is None:
+        return None
+
+    return {attr: getattr(bugtrap, attr) for attr in gpio.BugTrap.__slots__}
+
+
+def _write_text(cpu: simulators.CPU[t.Any], debugger: runner.InteractiveDebugger[t.Any], fp: t.TextIO) -> None:
+    fp.write("\n== Final processor state ==\n")
+    fp.write("\nMemory:\n")
+    for line in debugger.iter_memory():
+        fp.write(line + "\n")
+    fp.write("\nRegisters:\n" + debugger.info_registers() + "\n")
+    fp.write("\nFlags:\n" + debugger.info_flags() + "\n")
+    fp.write("\nRecent instructions (oldest first):\n" + debugger.info_history() + "\n")
+    if cpu.timing is not None:
+        fp.write("\nCycles:\n" + debugger.info_cycles() + "\n")
+    if cpu.pipeline is not None:
+        fp.write("\nPipeline:\n" + debugger.info_pipeline() + "\n")
+    if cpu.cache is not None:
+        fp.write("\nCache:\n" + debugger.info_cache() + "\n")
+    if cpu.branches is not None:
+        fp.write("\nBranches:\n" + debugger.info_branches() + "\n")
+    if cpu.access_profiler is not None:
+        fp.write("\nMemory accesses:\n" + debugger.info_accesses() + "\n")
+
+    if cpu.gpio is not None:
+        fp.write("\nBugTrap:\n" + debugger.info_bugtrap() + "\n")
+
+
+def _write_json(cpu: simulators.CPU[t.Any], debugger: runner.InteractiveDebugger[t.Any], fp: t.TextIO) -> None:
+    state: dict[str, t.Any] = {
+        "registers": debugger.register_values(),
+        "flags": debugger.flag_values(),
+        "memory": list(_memory_values(cpu)),
+    }
+    if cpu.timing is not None:
+        state["cycles"] = cpu.cycles
+    if (model := cpu.pipeline) is not None:
+        state["pipeline"] = {
+            "instructions": model.instructions,
+            "cycles": model.cycles,
+            "stall_cycles": model.stall_cycles,
+            "flush_cycles": model.flush_cycles,
+            "stalls": {str(addr): n for addr, n in sorted(model.stalls.items())},
+            "flushes": {str(addr): n for addr, n in sorted(model.flushes.items())},
+        }
+    if cpu.cache is not None:
+        state["cache"] = cpu.cache.to_dict()
+    if cpu.branches is not None:
+        state["branches"] = cpu.branches.to_dict()
+    if cpu.access_profiler is not None:
+        state["accesses"] = cpu.access_profiler.to_dict()
+    if (bugtrap := _bugtrap_values(cpu)) is not None:
+        state["bugtrap"] = bugtrap
+
+    json.dump(state, fp)
+    fp.write("\n")
+
+
+def _write_csv(cpu: simulators.CPU[t.Any], debugger: runner.InteractiveDebugger[t.Any], fp: t.TextIO) -> None:
+    # one value per row so that every part of the state can be loaded from the same table
+    writer = csv.writer(fp, lineterminator="\n")
+    writer.writerow(("kind", "name", "value"))
+    writer.writerows(("register", name, value) for name, value in debugger.register_values().items())
+    writer.writerows(("flag", name, int(value)) for name, value in debugger.flag_values().items())
+    writer.writerows(("memory", addr, "" if value is None else value) for addr, value in enumerate(_memory_values(cpu)))
+    if cpu.timing is not None:
+        writer.writerow(("counter", "cycles", cpu.cycles))
+    if (model := cpu.pipeline) is not None:
+        writer.writerow(("counter", "pipeline_cycles", model.cycles))
+        writer.writerows(("stall", addr, n) for addr, n in sorted(model.stalls.items()))
+        writer.writerows(("flush", addr, n) for addr, n in sorted(model.flushes.items()))
+    if (simulator := cpu.cache) is not None:
+        for name, simulated in (("icache", simulator.instruction), ("dcache", simulator.data)):
+            if simulated is not None:
+                writer.writerow(("counter", f"{name}_hits", simulated.hits))
+                writer.writerow(("counter", f"{name}_misses", simulated.misses))
+    if (profiler := cpu.branches) is not None:
+        for address in profiler.addresses():
+            writer.writerow(("branch_taken", address, profiler.taken[address]))
+            writer.writerow(("branch_not_taken", address, profiler.not_taken[address]))
+    if (access_profiler := cpu.access_profiler) is not None:
+        writer.writerows(("reads", addr, n) for addr, n in enumerate(access_profiler.reads) if n)
+        writer.writerows(("writes", addr, n) for addr, n in enumerate(access_profiler.writes) if n)
+    if (bugtrap := _bugtrap_values(cpu)) is not None:
+        writer.writerows(("bugtrap", name, int(value)) for name, value in bugtrap.items())
+
+
+def _write_bin(cpu: simulators.CPU[t.Any], fp: t.BinaryIO) -> None:
+    # raw memory image, one big-endian 16 bit word per address - mem-mapped addresses are written as zero
+    fp.write(b"".join((value or 0).to_bytes(2, "big") for value in _memory_values(cpu)))
+
+
+def dump_state(
+    cpu: simulators.CPU[t.Any], debugger: runner.InteractiveDebugger[t.Any], fmt: DumpFormat, path: str | None
+) -> None:
+    """
+    Write the final processor state in the given format.
+
+    Args:
+        cpu: The CPU to dump the state of.
+        debugger: The debugger attached to the CPU, used to render the human-readable tables.
+        fmt: The format to write the state in.
+        path: The file to write the state to, or :obj:`None` to write to stdout.
+    """
+    with contextlib.ExitStack() as stack:
+        if fmt == "bin":
+            bfp = sys.stdout.buffer if path is None else stack.enter_context(open(path, "wb"))
+            _write_bin(cpu, bfp)
+            bfp.flush()
+            return
+
+        fp = sys.stdout if path is None else stack.enter_context(open(path, "w", newline=""))
+        if fmt == "json":
+            _write_json(cpu, debugger, fp)
+        elif fmt == "csv":
+            _write_csv(cpu, debugger, fp)
+        else:
+            _write_text(cpu, debugger, fp)
+        fp.flush()
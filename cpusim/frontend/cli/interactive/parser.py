@@ -71,9 +71,37 @@ info_parser.add_argument(
     "item",
     metavar="ITEM",
     type=str,
-    choices=["registers", "breakpoints", "memory", "flags", "bugtrap"],
+    choices=[
+        "registers",
+        "breakpoints",
+        "memory",
+        "flags",
+        "bugtrap",
+        "history",
+        "cycles",
+        "pipeline",
+        "cache",
+        "branches",
+        "accesses",
+    ],
     help="The item to show state for",
 )
+info_parser.add_argument(
+    "start",
+    metavar="START",
+    type=converters.number_string_to_int,
+    nargs="?",
+    default=None,
+    help="'info memory' only - the first address to show. Shows a single page if END is not given",
+)
+info_parser.add_argument(
+    "end",
+    metavar="END",
+    type=converters.number_string_to_int,
+    nargs="?",
+    default=None,
+    help="'info memory' only - the last address to show (inclusive)",
+)
 
 # step command
 step_parser = subparsers.add_parser("step", **_default_parser_args("Step the simulation by one or more instructions"))
@@ -161,10 +189,36 @@ set_parser.add_argument(
 )
 
 
+# assert command
+assert_parser = subparsers.add_parser(
+    "assert", **_default_parser_args("Check that an expression holds, using the conditional breakpoint context")
+)
+_CustomHelpAction.add_to(assert_parser)
+
+assert_parser.add_argument("assert_expr", metavar="EXPR", nargs=argparse.REMAINDER, help="The expression to check")
+
+
 class Arguments(argparse.Namespace):
     help: bool | None
-    command: t.Literal["quit", "info", "step", "continue", "breakpoint", "disassemble", "print", "set"] | None
-    item: t.Literal["registers", "breakpoints", "memory", "flags", "bugtrap"] | None
+    command: t.Literal["quit", "info", "step", "continue", "breakpoint", "disassemble", "print", "set", "assert"] | None
+    item: (
+        t.Literal[
+            "registers",
+            "breakpoints",
+            "memory",
+            "flags",
+            "bugtrap",
+            "history",
+            "cycles",
+            "pipeline",
+            "cache",
+            "branches",
+            "accesses",
+        ]
+        | None
+    )
+    start: int | None
+    end: int | None
     number: int | None
     breakpoint_subcommand: t.Literal["create", "delete", "enable", "disable"] | None
     breakpoint_create_expr: list[str] | None
@@ -172,6 +226,7 @@ class Arguments(argparse.Namespace):
     id: int | None
     target: converters.Address | converters.Register | None
     value: int | None
+    assert_expr: list[str] | None
 
 
 def parse_args(args: list[str]) -> Arguments:
@@ -19,12 +19,17 @@
 # SOFTWARE.
 import abc
 import dataclasses
+import enum
+import itertools
 import shlex
+import time
 import traceback
 import typing as t
 from argparse import ArgumentError
 
+from cpusim.backend import branches
 from cpusim.backend import components
+from cpusim.backend import disassembly
 from cpusim.backend import simulators
 from cpusim.backend.peripherals import gpio
 from cpusim.common.types import Int8
@@ -33,6 +38,46 @@ from cpusim.frontend.cli.interactive import converters
 from cpusim.frontend.cli.interactive import parser
 
 CpuT = t.TypeVar("CpuT", simulators.CPU1a, simulators.CPU1d)
+# addr, 8-bit dec, 16-bit dec, hex, decoded, is_zero
+MemoryRow = tuple[str, str, str, str, str, bool]
+
+FLAG_NAMES = ("negative", "positive", "overflow", "carry", "zero")
+# number of words shown by 'info memory START' when no end address is given
+MEMORY_PAGE_SIZE = 256
+# arguments that the rest of a command is a Python expression after
+_EXPRESSION_PREFIXES = ("assert", "--expr")
+# addresses shown in the heat table of 'info accesses', the words in each bar of its histogram and the widest bar
+HOTTEST_ADDRESSES = 16
+HISTOGRAM_BUCKET_SIZE = 16
+HISTOGRAM_WIDTH = 40
+# column headings of the branch predictors in 'info branches'
+PREDICTOR_NAMES: dict[branches.Predictor, str] = {
+    "static": "Static",
+    "one_bit": "1-bit",
+    "two_bit": "2-bit",
+    "gshare": "gshare",
+}
+
+
+class StopReason(enum.Enum):
+    HALTED = enum.auto()
+    INFINITE_LOOP = enum.auto()
+    BREAKPOINT = enum.auto()
+    INTERRUPTED = enum.auto()
+    STEP_LIMIT = enum.auto()
+
+
+class RunResult(t.NamedTuple):
+    reason: StopReason
+    executed: int
+    breakpoint_id: int = -1
+
+
+ProgressFn = t.Callable[[int, float, int], None]
+"""
+A function called periodically during long runs. Takes three parameters, the number of instructions executed
+so far, the current execution rate in instructions per second, and the current value of the program counter.
+"""
 
 
 @dataclasses.dataclass(slots=True)
@@ -48,16 +93,38 @@ class ConditionalBreakpoint:
 
 
 class InteractiveDebugger(abc.ABC, t.Generic[CpuT]):
-    __slots__ = ("_conditional_breakpoints", "_cpu", "_lineno_breakpoints", "_next_breakpoint_id", "halted")
+    __slots__ = (
+        "_conditional_breakpoints",
+        "_cpu",
+        "_disassembly",
+        "_interrupted",
+        "_lineno_breakpoints",
+        "_memory_rows",
+        "_next_breakpoint_id",
+        "failed_assertions",
+        "halted",
+        "interrupt_check_interval",
+        "progress_fn",
+        "progress_interval",
+    )
 
     def __init__(self, cpu: CpuT) -> None:
         self._cpu = cpu
+        self._disassembly = disassembly.DisassemblyCache(cpu)
+        self._memory_rows: list[MemoryRow] = []
 
         self._next_breakpoint_id = 0
         self._lineno_breakpoints: dict[int, LineBreakpoint] = {}
         self._conditional_breakpoints: dict[int, ConditionalBreakpoint] = {}
 
         self.halted = False
+        self.failed_assertions = 0
+
+        # long runs only look at the interrupt flag (and the clock, for progress reports) this often
+        self.interrupt_check_interval = 1000
+        self._interrupted = False
+        self.progress_fn: ProgressFn | None = None
+        self.progress_interval = 1.0
 
     def _check_breakpoints(self) -> tuple[bool, int]:
         for id, bp in self._lineno_breakpoints.items():
@@ -102,66 +169,95 @@ class InteractiveDebugger(abc.ABC, t.Generic[CpuT]):
 
         return self._justify_rows(rows)
 
+    @staticmethod
+    def _with_upper_case_names(context: dict[str, t.Any]) -> dict[str, t.Any]:
+        # expressions keep their case, but registers are shown upper-case by the disassembler so 'RA' and 'ra'
+        # both have to name the register
+        return context | {name.upper(): value for name, value in context.items()}
+
     @abc.abstractmethod
     def _conditional_breakpoint_context(self) -> dict[str, t.Any]: ...
 
     @abc.abstractmethod
-    def info_registers(self) -> str: ...
+    def register_values(self) -> dict[str, int]: ...
 
-    def info_memory(self) -> str:
-        # addr, 8-bit dec, 16-bit dec, hex, decoded, is_zero
-        old_val = self._cpu.ir.value
+    def flag_values(self) -> dict[str, bool]:
+        return {attr: getattr(self._cpu.alu, attr) for attr in FLAG_NAMES}
 
-        rows: list[tuple[str, str, str, str, str, bool]] = [("Addr", "8-bit", "16-bit", "Hex", "Disassembled", False)]
-        for addr in range(self._cpu.memory.size):
-            if addr in self._cpu.memory._memmap_addr:
-                rows.append((hex(addr), "?", "?", "?", f"mem-mapped ({self._cpu.memory._memmap_addr[addr]})", False))
-                continue
+    def info_registers(self) -> str:
+        return self._info_registers(self.register_values())
+
+    def _memory_row(self, addr: int) -> MemoryRow:
+        if (entry := self._disassembly.get(addr)) is None:
+            region = self._cpu.memory.region_at(addr)
+            return hex(addr), "?", "?", "?", f"mem-mapped ({region.id if region else '?'})", False
+
+        word, instruction_repr = entry
+        return (
+            hex(addr),
+            str(Int8(word).signed_value),
+            str(Int16(word).signed_value),
+            hex(word),
+            instruction_repr,
+            word == 0,
+        )
 
-            value = self._cpu.memory.get(addr)
+    def _refresh_memory_rows(self) -> list[MemoryRow]:
+        written = self._disassembly.refresh()
+        if len(self._memory_rows) != self._cpu.memory.size:
+            self._memory_rows = [self._memory_row(addr) for addr in range(self._cpu.memory.size)]
+        else:
+            for addr in written:
+                self._memory_rows[addr] = self._memory_row(addr)
 
-            self._cpu.ir.set(value.unsigned_value)
-            try:
-                instruction, args = self._cpu.decode()
-                instruction_repr = instruction.repr(args)
-            except NotImplementedError:
-                instruction_repr = "????"
+        return self._memory_rows
 
-            rows.append(
-                (
-                    hex(addr),
-                    str(Int8(value.unsigned_value).signed_value),
-                    str(value.signed_value),
-                    hex(value.unsigned_value),
-                    instruction_repr,
-                    value.unsigned_value == 0,
-                )
-            )
+    def iter_memory(self, start: int = 0, end: int | None = None) -> t.Iterator[str]:
+        # yields the memory table one line at a time - columns have a fixed width so that rows can be
+        # written out as they are produced instead of being collected first. 'end' is inclusive.
+        rows = self._refresh_memory_rows()
+        stop = len(rows) if end is None else min(end + 1, len(rows))
 
-        col_widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0][:-1]))]  # type: ignore[reportArgumentType]
-        justified_rows: list[str] = []
+        col_widths = (max(len("Addr"), len(hex(len(rows) - 1))), len("8-bit"), len("-32768"), len("0xffff"), 0)
+        yield self._justify_row(("Addr", "8-bit", "16-bit", "Hex", "Disassembled"), col_widths)
 
-        zero_addrs: list[str] = []
-        known_zero_row = next(filter(lambda row: row[-1], rows))
-        for row in rows:
+        zero_rows: list[MemoryRow] = []
+        for row in itertools.islice(rows, start, stop):
             if row[-1]:
-                zero_addrs.append(row[0])
+                zero_rows.append(row)
                 continue
 
-            if len(zero_addrs) > 3:
-                justified_rows.append(f"<-- ... {len(zero_addrs)} zeros -->")
-                zero_addrs = []
+            if len(zero_rows) > 3:
+                yield f"<-- ... {len(zero_rows)} zeros -->"
             else:
-                for addr in zero_addrs:
-                    justified_rows.append(self._justify_row([addr, *known_zero_row[1:-1]], col_widths))
+                for zero_row in zero_rows:
+                    yield self._justify_row(zero_row[:-1], col_widths)
+            zero_rows = []
 
-            justified_rows.append(self._justify_row(row[:-1], col_widths))
+            yield self._justify_row(row[:-1], col_widths)
 
-        if zero_addrs:
-            justified_rows.append(f"<-- ... {len(zero_addrs)} zeros -->")
+        if len(zero_rows) > 3:
+            yield f"<-- ... {len(zero_rows)} zeros -->"
+        else:
+            for zero_row in zero_rows:
+                yield self._justify_row(zero_row[:-1], col_widths)
 
-        self._cpu.ir.set(old_val)
-        return "\n".join(justified_rows)
+    def info_memory(self, start: int | None = None, end: int | None = None) -> str:
+        if start is None:
+            return "\n".join(self.iter_memory())
+
+        if start >= self._cpu.memory.size:
+            return f"Address {hex(start)} is out of bounds."
+
+        if end is not None:
+            return "\n".join(self.iter_memory(start, end))
+
+        # no end address given, show a single page
+        end = start + MEMORY_PAGE_SIZE - 1
+        out = "\n".join(self.iter_memory(start, end))
+        if end + 1 < self._cpu.memory.size:
+            out += f"\n<-- 'info memory {hex(end + 1)}' for the next page -->"
+        return out
 
     def info_breakpoints(self) -> str:
         rows: list[tuple[str, str, str, str]] = [("ID", "Type", "Enabled", "Value")]
@@ -172,10 +268,8 @@ class InteractiveDebugger(abc.ABC, t.Generic[CpuT]):
 
     def info_flags(self) -> str:
         rows: list[tuple[str, str]] = [("Name", "Value")]
-
-        flag_attrs = ["negative", "positive", "overflow", "carry", "zero"]
-        for attr in flag_attrs:
-            rows.append((attr, str(getattr(self._cpu.alu, attr))))
+        for attr, value in self.flag_values().items():
+            rows.append((attr, str(value)))
 
         return self._justify_rows(rows)
 
@@ -198,9 +292,254 @@ class InteractiveDebugger(abc.ABC, t.Generic[CpuT]):
         ]
         return self._justify_rows(rows)
 
+    def info_cycles(self) -> str:
+        if self._cpu.timing is None:
+            return "Timing model not enabled - run with --timing to count clock cycles."
+
+        instructions, cycles = self._cpu.history.total, self._cpu.cycles
+        rows: list[tuple[str, str]] = [
+            ("Name", "Value"),
+            ("Instructions", str(instructions)),
+            ("Cycles", str(cycles)),
+            ("Cycles per instruction", f"{cycles / instructions:.2f}" if instructions else "-"),
+        ]
+        return self._justify_rows(rows)
+
+    def info_pipeline(self) -> str:
+        model = self._cpu.pipeline
+        if model is None:
+            return "Pipeline model not enabled - run with --pipeline to estimate pipeline stalls."
+
+        instructions = model.instructions
+        rows: list[tuple[str, ...]] = [
+            ("Name", "Value"),
+            ("Instructions", str(instructions)),
+            ("Cycles", str(model.cycles)),
+            ("Cycles per instruction", f"{model.cycles / instructions:.2f}" if instructions else "-"),
+            ("Stall cycles", str(model.stall_cycles)),
+            ("Flush cycles", str(model.flush_cycles)),
+        ]
+        out = self._justify_rows(rows)
+
+        addresses = sorted(model.stalls.keys() | model.flushes.keys())
+        if not addresses:
+            return out
+
+        memory_rows = self._refresh_memory_rows()
+        rows = [("Addr", "Stalls", "Flushes", "Disassembled")]
+        for addr in addresses:
+            stalls, flushes = model.stalls.get(addr, 0), model.flushes.get(addr, 0)
+            rows.append((hex(addr), str(stalls), str(flushes), memory_rows[addr][4]))
+        return out + "\n\n" + self._justify_rows(rows)
+
+    def info_cache(self) -> str:
+        simulator = self._cpu.cache
+        if simulator is None:
+            return "Cache simulation not enabled - run with --icache or --dcache to simulate caches."
+
+        caches = [
+            (name, simulated)
+            for name, simulated in (("instruction", simulator.instruction), ("data", simulator.data))
+            if simulated is not None
+        ]
+        rows: list[tuple[str, ...]] = [("Cache", "Size", "Line", "Ways", "Policy", "Hits", "Misses", "Hit rate")]
+        for name, simulated in caches:
+            config = simulated.config
+            rows.append(
+                (
+                    name,
+                    str(config.size),
+                    str(config.line_size),
+                    str(config.associativity),
+                    config.policy,
+                    str(simulated.hits),
+                    str(simulated.misses),
+                    f"{simulated.hit_rate:.1%}",
+                )
+            )
+        sections = [self._justify_rows(rows)]
+
+        rows = [("Cache", "Region", "Hits", "Misses", "Hit rate")]
+        for name, simulated in caches:
+            for start, hits, misses in simulated.regions():
+                end = min(start + simulated.region_size, self._cpu.memory.size) - 1
+                rows.append((name, f"{hex(start)}-{hex(end)}", str(hits), str(misses), f"{hits / (hits + misses):.1%}"))
+        if len(rows) > 1:
+            sections.append(self._justify_rows(rows))
+
+        if simulator.uncached:
+            rows = [("Uncached region", "Accesses")]
+            rows.extend((region, str(n)) for region, n in sorted(simulator.uncached.items()))
+            sections.append(self._justify_rows(rows))
+
+        memory_rows = self._refresh_memory_rows()
+        rows = [("Addr", "Fetch misses", "Data hits", "Data misses", "Disassembled")]
+        for address, fetch_misses, hits, misses in simulator.instructions():
+            rows.append((hex(address), str(fetch_misses), str(hits), str(misses), memory_rows[address][4]))
+        if len(rows) > 1:
+            sections.append(self._justify_rows(rows))
+
+        return "\n\n".join(sections)
+
+    def info_branches(self) -> str:
+        profiler = self._cpu.branches
+        if profiler is None:
+            return "Branch statistics not enabled - run with --branch-stats to profile conditional jumps."
+
+        memory_rows = self._refresh_memory_rows()
+        rows: list[tuple[str, ...]] = [("Addr", "Taken", "Not taken", *PREDICTOR_NAMES.values(), "Disassembled")]
+        for address in profiler.addresses():
+            rows.append(
+                (
+                    hex(address),
+                    str(profiler.taken[address]),
+                    str(profiler.not_taken[address]),
+                    *(f"{profiler.accuracy(p, address):.1%}" for p in PREDICTOR_NAMES),
+                    memory_rows[address][4],
+                )
+            )
+        rows.append(
+            (
+                "Total",
+                str(sum(profiler.taken)),
+                str(sum(profiler.not_taken)),
+                *(f"{profiler.accuracy(p):.1%}" for p in PREDICTOR_NAMES),
+                "",
+            )
+        )
+        return self._justify_rows(rows)
+
+    def info_accesses(self) -> str:
+        profiler = self._cpu.access_profiler
+        if profiler is None:
+            return "Memory access profiling not enabled - run with --profile-accesses to count data accesses."
+
+        hottest = profiler.hottest(HOTTEST_ADDRESSES)
+        if not hottest:
+            return "No data memory accesses have been made."
+
+        memory_rows = self._refresh_memory_rows()
+        rows: list[tuple[str, ...]] = [("Addr", "Reads", "Writes", "Hex")]
+        rows.extend((hex(addr), str(reads), str(writes), memory_rows[addr][3]) for addr, reads, writes in hottest)
+        sections = [self._justify_rows(rows)]
+
+        buckets = profiler.histogram(HISTOGRAM_BUCKET_SIZE)
+        widest = max(reads + writes for _, reads, writes in buckets)
+        rows = [("Region", "Reads", "Writes", "")]
+        for start, reads, writes in buckets:
+            end = min(start + HISTOGRAM_BUCKET_SIZE, self._cpu.memory.size) - 1
+            bar = "#" * max(1, round(HISTOGRAM_WIDTH * (reads + writes) / widest))
+            rows.append((f"{hex(start)}-{hex(end)}", str(reads), str(writes), bar))
+        sections.append(self._justify_rows(rows))
+
+        if streams := profiler.streams():
+            rows = [("Addr", "Accesses", "Pattern", "Stride", "Coverage", "Disassembled")]
+            for stream in streams:
+                rows.append(
+                    (
+                        hex(stream.pc),
+                        str(stream.accesses),
+                        stream.kind,
+                        str(stream.stride),
+                        f"{stream.coverage:.1%}",
+                        memory_rows[stream.pc][4],
+                    )
+                )
+            sections.append(self._justify_rows(rows))
+
+        return "\n\n".join(sections)
+
+    def info_history(self) -> str:
+        entries = self._cpu.history.entries()
+        if not entries:
+            return "No instructions executed."
+
+        rows: list[tuple[str, str, str, str]] = [("#", "Addr", "Hex", "Disassembled")]
+        for i, (pc, ir) in enumerate(entries):
+            rows.append((str(i - len(entries)), hex(pc), hex(ir), self._cpu.disassemble(ir)))
+
+        return self._justify_rows(rows)
+
+    def interrupt(self) -> None:
+        # only sets a flag - safe to call from a signal handler or a UI callback while a run is in progress.
+        # the run stops between two instructions, so the CPU is left in a consistent state and can be resumed
+        self._interrupted = True
+
+    def run(self, max_steps: int | None = None) -> RunResult:
+        # line breakpoints are handed to the CPU, which stops in front of them itself - only conditional
+        # breakpoints need the CPU to be stepped one instruction at a time
+        self._cpu.breakpoints = {bp.value for bp in self._lineno_breakpoints.values() if bp.enabled}
+        try:
+            return self._run(max_steps)
+        finally:
+            self._cpu.breakpoints = set()
+
+    def _run(self, max_steps: int | None) -> RunResult:
+        executed = 0
+        check_breakpoints = any(bp.enabled for bp in self._conditional_breakpoints.values())
+        started = last_report = time.perf_counter()
+
+        while max_steps is None or executed < max_steps:
+            if self._interrupted:
+                self._interrupted = False
+                return RunResult(StopReason.INTERRUPTED, executed)
+
+            chunk = self.interrupt_check_interval
+            if max_steps is not None:
+                chunk = min(chunk, max_steps - executed)
+
+            if not check_breakpoints:
+                n, self.halted = self._cpu.run(chunk)
+                executed += n
+                if self.halted:
+                    detector = self._cpu.repetition
+                    proven = detector is not None and detector.period is not None
+                    return RunResult(StopReason.INFINITE_LOOP if proven else StopReason.HALTED, executed)
+
+                if n < chunk or self._cpu.pc.value in self._cpu.breakpoints:
+                    _, bp_id = self._check_breakpoints()
+                    return RunResult(StopReason.BREAKPOINT, executed, bp_id)
+            else:
+                for _ in range(chunk):
+                    self.halted = self._cpu.step()
+                    executed += 1
+                    if self.halted:
+                        return RunResult(StopReason.HALTED, executed)
+
+                    should_break, bp_id = self._check_breakpoints()
+                    if should_break:
+                        return RunResult(StopReason.BREAKPOINT, executed, bp_id)
+
+            if self.progress_fn is not None and (now := time.perf_counter()) - last_report >= self.progress_interval:
+                self.progress_fn(executed, executed / (now - started), self._cpu.pc.value)
+                last_report = now
+
+        return RunResult(StopReason.STEP_LIMIT, executed)
+
+    def describe_run(self, result: RunResult) -> str:
+        out = f"Executed {result.executed} instructions"
+        if result.reason is StopReason.HALTED:
+            out += f"\nHalt-loop reached at address {hex(self._cpu.pc.value)}. Exiting..."
+        elif result.reason is StopReason.INFINITE_LOOP:
+            assert self._cpu.repetition is not None
+            out += (
+                f"\nInfinite loop at address {hex(self._cpu.pc.value)} - the machine state repeats every "
+                f"{self._cpu.repetition.period} instructions. Exiting..."
+            )
+        elif result.reason is StopReason.BREAKPOINT:
+            out += f"\nTriggered breakpoint ID {result.breakpoint_id}. Pausing..."
+        elif result.reason is StopReason.INTERRUPTED:
+            out += f"\nInterrupted at address {hex(self._cpu.pc.value)}. Pausing..."
+        return out
+
     def step(self, n: int) -> str:
         out: list[str] = []
         for _ in range(n):
+            if self._interrupted:
+                self._interrupted = False
+                out.append(f"Interrupted at address {hex(self._cpu.pc.value)}. Pausing...")
+                break
+
             self.halted = self._cpu.step()
             if self.halted:
                 out.append(f"Halt-loop reached at address {hex(self._cpu.pc.value)}. Exiting...")
@@ -217,25 +556,7 @@ class InteractiveDebugger(abc.ABC, t.Generic[CpuT]):
         return "\n".join(out)
 
     def continue_(self) -> str:
-        out: list[str] = []
-
-        step_count = 0
-        while True:
-            self.halted = self._cpu.step()
-            step_count += 1
-            if self.halted:
-                out.append(
-                    f"Executed {step_count} instructions\nHalt-loop reached "
-                    f"at address {hex(self._cpu.pc.value)}. Exiting..."
-                )
-                break
-
-            should_break, bp_id = self._check_breakpoints()
-            if should_break:
-                out.append(f"Executed {step_count} instructions\nTriggered breakpoint ID {bp_id}. Pausing...")
-                break
-
-        return "\n".join(out)
+        return self.describe_run(self.run())
 
     def _value_for_target(self, target: converters.Address | converters.Register) -> Int16:
         if isinstance(target, converters.Address):
@@ -260,7 +581,7 @@ class InteractiveDebugger(abc.ABC, t.Generic[CpuT]):
 
         if subcommand == "create":
             if expr is not None:
-                bp_expr = "".join(expr)
+                bp_expr = " ".join(expr)
 
                 try:
                     eval(bp_expr, self._conditional_breakpoint_context())
@@ -281,16 +602,16 @@ class InteractiveDebugger(abc.ABC, t.Generic[CpuT]):
 
         assert bp_id is not None
         if subcommand == "delete":
-            self._lineno_breakpoints.pop(bp_id)
-            self._conditional_breakpoints.pop(bp_id)
+            self._lineno_breakpoints.pop(bp_id, None)
+            self._conditional_breakpoints.pop(bp_id, None)
             return f"Deleted breakpoint with ID {bp_id}"
 
         # otherwise subcommand must be "enable" or "disable"
         new_val = subcommand == "enable"
         if bp_id in self._lineno_breakpoints:
-            self._lineno_breakpoints[bp_id].enabled = True
+            self._lineno_breakpoints[bp_id].enabled = new_val
         elif bp_id in self._conditional_breakpoints:
-            self._conditional_breakpoints[bp_id].enabled = True
+            self._conditional_breakpoints[bp_id].enabled = new_val
         return f"{'Enabled' if new_val else 'Disabled'} breakpoint with ID {bp_id}"
 
     def disassemble(self, target: converters.Address | converters.Register) -> str:
@@ -302,11 +623,7 @@ class InteractiveDebugger(abc.ABC, t.Generic[CpuT]):
         else:
             out.append(f"Instruction in register {target.register_name}:")
 
-        old_ir_value = self._cpu.ir.value
-        self._cpu.ir.set(to_disassemble)
-
-        instruction, args = self._cpu.decode()
-        self._cpu.ir.set(old_ir_value)
+        instruction, args = self._cpu.decode_word(to_disassemble)
         out.append("    " + instruction.repr(args))
 
         return "\n".join(out)
@@ -342,12 +659,40 @@ class InteractiveDebugger(abc.ABC, t.Generic[CpuT]):
 
         return f"Set register {target.register_name} to {hex(value)}"
 
+    def assert_(self, expr: list[str]) -> str:
+        assert_expr = " ".join(expr)
+
+        try:
+            passed = bool(eval(assert_expr, self._conditional_breakpoint_context()))
+        except Exception as e:
+            self.failed_assertions += 1
+            return f"Assertion errored: {assert_expr}\n{''.join(traceback.format_exception(e, limit=0))}"
+
+        if not passed:
+            self.failed_assertions += 1
+            return f"Assertion failed: {assert_expr}"
+        return f"Assertion passed: {assert_expr}"
+
+    @staticmethod
+    def parse_command(raw_command: str) -> parser.Arguments:
+        # commands and their options are case-insensitive, but the Python expression that follows 'assert' or
+        # 'breakpoint create --expr' is kept as written so that names like True keep their meaning
+        tokens = shlex.split(raw_command)
+        for idx, token in enumerate(tokens):
+            tokens[idx] = token.lower()
+            if tokens[idx] in _EXPRESSION_PREFIXES:
+                break
+        return parser.parse_args(tokens)
+
     def execute_command(self, raw_command: str) -> str | None:
         try:
-            arguments = parser.parse_args(shlex.split(raw_command.lower()))
+            arguments = self.parse_command(raw_command)
         except ArgumentError as e:
             return f"Error: {e.message}\nRun '<command> -h' for usage details"
 
+        return self.run_command(arguments)
+
+    def run_command(self, arguments: parser.Arguments) -> str | None:
         if arguments.help:
             return None
 
@@ -364,9 +709,21 @@ class InteractiveDebugger(abc.ABC, t.Generic[CpuT]):
                 elif arguments.item == "breakpoints":
                     return self.info_breakpoints()
                 elif arguments.item == "memory":
-                    return self.info_memory()
+                    return self.info_memory(arguments.start, arguments.end)
                 elif arguments.item == "bugtrap":
                     return self.info_bugtrap()
+                elif arguments.item == "history":
+                    return self.info_history()
+                elif arguments.item == "cycles":
+                    return self.info_cycles()
+                elif arguments.item == "pipeline":
+                    return self.info_pipeline()
+                elif arguments.item == "cache":
+                    return self.info_cache()
+                elif arguments.item == "branches":
+                    return self.info_branches()
+                elif arguments.item == "accesses":
+                    return self.info_accesses()
                 return self.info_flags()
             case "step":
                 assert arguments.number is not None
@@ -391,6 +748,9 @@ class InteractiveDebugger(abc.ABC, t.Generic[CpuT]):
                 assert arguments.target is not None
                 assert arguments.value is not None
                 return self.set(arguments.target, arguments.value)
+            case "assert":
+                assert arguments.assert_expr is not None
+                return self.assert_(arguments.assert_expr)
 
         return None
 
@@ -398,32 +758,40 @@ class InteractiveDebugger(abc.ABC, t.Generic[CpuT]):
 class CPU1aInteractiveDebugger(InteractiveDebugger[simulators.CPU1a]):
     __slots__ = ()
 
-    def info_registers(self) -> str:
-        return super()._info_registers({"pc": self._cpu.pc.value, "ir": self._cpu.ir.value, "acc": self._cpu.acc.value})
+    def register_values(self) -> dict[str, int]:
+        return {"pc": self._cpu.pc.value, "ir": self._cpu.ir.value, "acc": self._cpu.acc.value}
 
     def _conditional_breakpoint_context(self) -> dict[str, t.Any]:
-        return {
-            "pc": self._cpu.pc.value,
-            "ir": self._cpu.ir.value,
-            "acc": Int8(self._cpu.acc.value),
-            "mem": self._cpu.memory,
-            "alu": self._cpu.alu,
-        }
+        return self._with_upper_case_names(
+            {
+                "pc": self._cpu.pc.value,
+                "ir": self._cpu.ir.value,
+                "acc": Int8(self._cpu.acc.value),
+                "mem": self._cpu.memory,
+                "alu": self._cpu.alu,
+                "cycles": self._cpu.cycles,
+            }
+        )
 
 
 class CPU1dInteractiveDebugger(InteractiveDebugger[simulators.CPU1d]):
     __slots__ = ()
 
-    def info_registers(self) -> str:
-        registers: dict[str, t.Any] = {"pc": self._cpu.pc.value, "ir": self._cpu.ir.value}
+    def register_values(self) -> dict[str, int]:
+        registers: dict[str, int] = {"pc": self._cpu.pc.value, "ir": self._cpu.ir.value}
         for i in range(self._cpu.registers._register_limit):
             registers[f"r{chr(ord('a') + i)}"] = self._cpu.registers.get(i).unsigned_value
 
-        return self._info_registers(registers)
+        return registers
 
     def _conditional_breakpoint_context(self) -> dict[str, t.Any]:
-        out: dict[str, t.Any] = {"pc": self._cpu.pc.value, "ir": self._cpu.ir.value, "mem": self._cpu.memory}
+        out: dict[str, t.Any] = {
+            "pc": self._cpu.pc.value,
+            "ir": self._cpu.ir.value,
+            "mem": self._cpu.memory,
+            "cycles": self._cpu.cycles,
+        }
         for i in range(self._cpu.registers._register_limit):
             out[f"r{chr(ord('a') + i)}"] = self._cpu.registers.get(i)
 
-        return out
+        return self._with_upper_case_names(out)
@@ -0,0 +1,98 @@
+# Copyright (c) 2024-present tandemdude
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from __future__ import annotations
+
+__all__ = ["ScriptCommand", "ScriptError", "parse_script", "run_script"]
+
+import typing as t
+from argparse import ArgumentError
+
+if t.TYPE_CHECKING:
+    from cpusim.frontend.cli.interactive import parser
+    from cpusim.frontend.cli.interactive import runner
+
+
+class ScriptError(Exception):
+    """Raised when a debugger script contains a command that cannot be parsed."""
+
+
+class ScriptCommand(t.NamedTuple):
+    lineno: int
+    source: str
+    arguments: parser.Arguments
+
+
+def parse_script(contents: str, debugger: runner.InteractiveDebugger[t.Any]) -> list[ScriptCommand]:
+    """
+    Parse every command in a debugger script up front, so that a typo is reported before anything is run.
+    Blank lines and lines starting with '#' are ignored.
+
+    Args:
+        contents: The script source, one debugger command per line.
+        debugger: The debugger that the commands will be run by.
+
+    Returns:
+        The parsed commands, in the order they appear in the script.
+
+    Raises:
+        :obj:`ScriptError`: If any line of the script could not be parsed.
+    """
+    commands: list[ScriptCommand] = []
+    for lineno, line in enumerate(contents.splitlines(), start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+
+        try:
+            arguments = debugger.parse_command(line)
+        except (ArgumentError, ValueError) as e:
+            message = e.message if isinstance(e, ArgumentError) else str(e)
+            raise ScriptError(f"line {lineno}: {line!r}: {message}") from e
+
+        if arguments.help or arguments.command is None:
+            raise ScriptError(f"line {lineno}: {line!r}: not a runnable command")
+
+        commands.append(ScriptCommand(lineno, line, arguments))
+
+    return commands
+
+
+def run_script(debugger: runner.InteractiveDebugger[t.Any], commands: t.Sequence[ScriptCommand]) -> tuple[bool, str]:
+    """
+    Run previously parsed debugger commands, stopping early if the simulation is quit.
+
+    Args:
+        debugger: The debugger to run the commands with.
+        commands: The commands to run, from :obj:`parse_script`.
+
+    Returns:
+        Whether every assertion in the script passed, and the buffered output of the commands.
+    """
+    out: list[str] = []
+    failures_before = debugger.failed_assertions
+    for command in commands:
+        out.append(f"(idb) {command.source}")
+        if (result := debugger.run_command(command.arguments)) is not None:
+            out.append(result)
+
+        if debugger.halted and command.arguments.command == "quit":
+            break
+
+    return debugger.failed_assertions == failures_before, "\n".join(out)
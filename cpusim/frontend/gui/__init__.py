@@ -22,10 +22,14 @@ from __future__ import annotations
 __all__ = ["run_gui"]
 
 import functools
+import sys
 import typing as t
 
 from cpusim.backend import simulators
+from cpusim.backend import timing
 from cpusim.backend.peripherals import gpio
+from cpusim.backend.peripherals import replay
+from cpusim.backend.peripherals import timer
 from cpusim.frontend.cli.interactive import runner
 from cpusim.frontend.gui import app
 from cpusim.frontend.gui import base
@@ -38,19 +42,51 @@ def _noop(cpu: base.CpuT) -> base.CpuT:
     return cpu
 
 
-def _enable_bug_trap(cpu: base.CpuT, addr: int) -> base.CpuT:
+def _enable_gpio(
+    cpu: base.CpuT, addr: int, bug_trap: bool, timer_: bool, recorders: list[replay.InputRecorder] | None
+) -> base.CpuT:
     cpu.gpio = gpio.GPIO(cpu, gpio.GPIOConfig(2, addr))
-    cpu.gpio.set_device(0, gpio.BugTrap())
+    if bug_trap:
+        cpu.gpio.set_device(0, gpio.BugTrap())
+    if timer_:
+        cpu.gpio.set_device(1, timer.Timer(cpu.scheduler))
+    if recorders is not None:
+        # resetting the app creates a new CPU - only the most recent run is worth keeping
+        recorders[:] = [replay.InputRecorder(cpu, cpu.gpio)]
+    return cpu
+
+
+def _enable_timing(
+    cpu: base.CpuT, costs: timing.CycleCosts, configure: t.Callable[[base.CpuT], base.CpuT]
+) -> base.CpuT:
+    cpu = configure(cpu)
+    cpu.timing = costs
     return cpu
 
 
 def run_gui(args: CliArguments, mem: list[int]) -> None:
     cpu_configurer = _noop
-    if args.enable_bug_trap:
-        cpu_configurer = functools.partial(_enable_bug_trap, addr=args.bug_trap_address)
+    recorders: list[replay.InputRecorder] | None = [] if args.record_inputs is not None else None
+    if args.enable_bug_trap or args.enable_timer:
+        cpu_configurer = functools.partial(
+            _enable_gpio,
+            addr=args.bug_trap_address,
+            bug_trap=args.enable_bug_trap,
+            timer_=args.enable_timer,
+            recorders=recorders,
+        )
+    if args.timing or args.cycle_costs is not None:
+        try:
+            costs = timing.CycleCosts.load(args.cycle_costs)
+        except timing.TimingError as e:
+            print(f"Error in cycle cost file {args.cycle_costs}: {e}", file=sys.stderr)
+            return
+        cpu_configurer = functools.partial(_enable_timing, costs=costs, configure=cpu_configurer)
 
     if args.arch == "1a":
         app.GuiApp(mem, simulators.CPU1a, cpu_configurer, runner.CPU1aInteractiveDebugger).run()
-        return
+    else:
+        app.GuiApp(mem, simulators.CPU1d, cpu_configurer, runner.CPU1dInteractiveDebugger).run()
 
-    app.GuiApp(mem, simulators.CPU1d, cpu_configurer, runner.CPU1dInteractiveDebugger).run()
+    if recorders and args.record_inputs is not None:
+        recorders[-1].save(args.record_inputs)
@@ -20,6 +20,7 @@
 import tkinter as tk
 import typing as t
 
+from cpusim.backend.peripherals import gpio
 from cpusim.frontend.cli.interactive import runner
 from cpusim.frontend.gui import base
 from cpusim.frontend.gui.frames import breakpoints
@@ -90,7 +91,9 @@ class GuiApp(tk.Tk, t.Generic[base.CpuT]):
         self._flags_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
 
         self._bug_trap_window = (
-            bug_trap.BugTrapSimulatorWindow(self, self.state) if self.state.cpu.gpio is not None else None
+            bug_trap.BugTrapSimulatorWindow(self, self.state)
+            if self.state.cpu.gpio is not None and self.state.cpu.gpio.find_device(gpio.BugTrap) is not None
+            else None
         )
 
     def reset(self) -> None:
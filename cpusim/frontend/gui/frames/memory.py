@@ -23,6 +23,7 @@ import tkinter as tk
 from tkinter import messagebox
 from tkinter import ttk
 
+from cpusim.backend import disassembly
 from cpusim.common.types import Int8
 from cpusim.common.types import Int16
 from cpusim.frontend.gui import base
@@ -33,7 +34,10 @@ class MemoryFrame(base.AppFrame[base.CpuT]):
     def __init__(self, master: tk.Frame | tk.Tk, state: base.AppState[base.CpuT]) -> None:
         super().__init__(master, state, text="Memory")
 
-        self._util_cpu: base.CpuT = state.cpu.__class__()
+        self._disassembly = disassembly.DisassemblyCache(state.cpu)
+        # rows currently carrying a highlight tag, so they can be cleared on the next refresh
+        self._tagged_iids: list[str] = []
+        self._populated = False
 
         cols = ("Addr", "8-bit", "16-bit", "Hex", "Instr")
         self._tree = treeview.EditableTreeView("Hex", 3, self.on_cell_edit, self, columns=cols, show="headings")
@@ -49,17 +53,19 @@ class MemoryFrame(base.AppFrame[base.CpuT]):
         self._scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self._tree.pack(fill=tk.BOTH, expand=True)
 
-        # monkeypatch out the write method so we can highlight rows that have been written to
-        self._old_memory_set = self.state.cpu.memory.set
-        self.state.cpu.memory.set = self._monkeypatched_memory_set
+        self.refresh()
 
-        self._written_rows: list[int] = []
+    def destroy(self) -> None:
+        self._disassembly.close()
+        super().destroy()
 
-        self.refresh()
+    def _row_values(self, addr: int) -> tuple[str, str, str, str, str]:
+        if (entry := self._disassembly.get(addr)) is None:
+            region = self.state.cpu.memory.region_at(addr)
+            return hex(addr), "?", "?", "?", f"mem-mapped ({region.id if region else '?'})"
 
-    def _monkeypatched_memory_set(self, address: int, value: Int16) -> None:
-        self._written_rows.append(address)
-        self._old_memory_set(address, value)
+        word, instruction_repr = entry
+        return hex(addr), str(Int8(word).signed_value), str(Int16(word).signed_value), f"0x{word:04x}", instruction_repr
 
     def on_cell_edit(self, iid: str, new_val: str) -> None:
         # check if valid hex
@@ -74,35 +80,23 @@ class MemoryFrame(base.AppFrame[base.CpuT]):
         self.refresh()
 
     def refresh(self) -> None:
-        for iid in self._tree.get_children():
-            self._tree.delete(iid)
-
-        for i in range(self.state.cpu.memory.size):
-            value = self.state.cpu.memory.get(i)
-
-            self._util_cpu.ir.set(value.unsigned_value)
-
-            try:
-                instr, args = self._util_cpu.decode()
-                instruction_repr = instr.repr(args)
-            except NotImplementedError:
-                instruction_repr = "????"
-
-            self._tree.insert(
-                "",
-                "end",
-                iid="mem_" + hex(i),
-                values=(
-                    hex(i),
-                    str(Int8(value.unsigned_value).signed_value),
-                    str(value.signed_value),
-                    f"0x{value.unsigned_value:04x}",
-                    instruction_repr,
-                ),
-            )
-
-        self._tree.item("mem_" + hex(self.state.cpu.pc.value), tags="pc")
-
-        for addr in self._written_rows:
-            self._tree.item("mem_" + hex(addr), tags="write")
-        self._written_rows = []
+        # only rows written since the last refresh need to be redrawn - the rest of the table is left untouched
+        written = self._disassembly.refresh()
+
+        if not self._populated:
+            for i in range(self.state.cpu.memory.size):
+                self._tree.insert("", "end", iid="mem_" + hex(i), values=self._row_values(i))
+            self._populated = True
+            written = set[int]()
+
+        for iid in self._tagged_iids:
+            self._tree.item(iid, tags=())
+        self._tagged_iids = []
+
+        self._tagged_iids.append(pc_iid := "mem_" + hex(self.state.cpu.pc.value))
+        self._tree.item(pc_iid, tags="pc")
+
+        for addr in written:
+            iid = "mem_" + hex(addr)
+            self._tree.item(iid, values=self._row_values(addr), tags="write")
+            self._tagged_iids.append(iid)
@@ -37,7 +37,13 @@ class RegistersFrame(base.AppFrame[base.CpuT]):
 
         cols = ("Name", "8-bit", "16-bit", "Hex")
         self._tree = treeview.EditableTreeView(
-            "Hex", 3, self.on_cell_edit, self, exclude_iids=("divider",), columns=cols, show="headings"
+            "Hex",
+            3,
+            self.on_cell_edit,
+            self,
+            exclude_iids=("divider", "cycles_divider", "cycles"),
+            columns=cols,
+            show="headings",
         )
 
         for col in cols:
@@ -112,6 +118,11 @@ class RegistersFrame(base.AppFrame[base.CpuT]):
             for i in range(self.state.cpu.registers._register_limit):
                 _insert(f"r{chr(ord('a') + i)}", self.state.cpu.registers.get(i).unsigned_value)
 
+        if self.state.cpu.timing is not None:
+            # clock cycles counted by the timing model - read only
+            self._tree.insert("", "end", iid="cycles_divider", values=("--", "--", "--", "--"))
+            self._tree.insert("", "end", iid="cycles", values=("cycles", "", str(self.state.cpu.cycles), ""))
+
         for reg in self._modified_registers:
             self._tree.item(reg, tags="write")
         self._modified_registers = []
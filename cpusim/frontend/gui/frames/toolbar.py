@@ -22,6 +22,7 @@ from __future__ import annotations
 import tkinter as tk
 import typing as t
 
+from cpusim.frontend.cli.interactive import runner
 from cpusim.frontend.gui import base
 
 
@@ -50,19 +51,22 @@ class ToolbarFrame(base.AppFrame[base.CpuT]):
         self._continue_btn = tk.Button(self, text="Continue", command=self._on_continue)
         self._continue_btn.grid(row=0, column=2, padx=5, pady=5)
 
+        self._stop_btn = tk.Button(self, text="Stop", command=self._on_stop, state=tk.DISABLED)
+        self._stop_btn.grid(row=0, column=3, padx=5, pady=5)
+
         self._state_frame = tk.LabelFrame(self, text="State")
-        self._state_frame.grid(row=0, column=3, padx=10, pady=5, sticky="e")
+        self._state_frame.grid(row=0, column=4, padx=10, pady=5, sticky="e")
         self._state_label = tk.Label(self._state_frame, textvariable=self.state.state_var, background="lawn green")
         self._state_label.pack(padx=5, pady=5)
 
         self._triggered_breakpoint_frame = tk.LabelFrame(self, text="Breakpoint Hit")
-        self._triggered_breakpoint_frame.grid(row=0, column=4, padx=10, pady=5, sticky="e")
+        self._triggered_breakpoint_frame.grid(row=0, column=5, padx=10, pady=5, sticky="e")
         self._triggered_breakpoint_label = tk.Label(
             self._triggered_breakpoint_frame, textvariable=self.state.breakpoint_var
         )
         self._triggered_breakpoint_label.pack(padx=5, pady=5)
 
-        self.columnconfigure(3, weight=1)
+        self.columnconfigure(4, weight=1)
 
     def _halt(self) -> None:
         self.state.state_var.set("HLT")
@@ -83,21 +87,41 @@ class ToolbarFrame(base.AppFrame[base.CpuT]):
 
         self.refresh_parent_fn()
 
+    def _set_running(self, running: bool) -> None:
+        self._reset_btn.config(state=tk.DISABLED if running else tk.NORMAL)
+        self._step_btn.config(state=tk.DISABLED if running else tk.NORMAL)
+        self._continue_btn.config(state=tk.DISABLED if running else tk.NORMAL)
+        self._stop_btn.config(state=tk.NORMAL if running else tk.DISABLED)
+
     def _on_continue(self) -> None:
         self.state.breakpoint_var.set("---")
+        self.state.state_var.set("RUN")
+        self._state_label.configure(background="lawn green")
 
-        while True:
-            halted = self.state.cpu.step()
+        self._set_running(True)
+        self._continue_chunk()
 
-            if halted:
-                self._halt()
-                break
+    def _continue_chunk(self) -> None:
+        # run a bounded number of instructions at a time, handing control back to the tk event loop in between
+        # so that the window stays responsive and the stop button can be pressed
+        result = self.state.debugger.run(self.state.debugger.interrupt_check_interval)
 
-            broken, bp_id = self.state.debugger._check_breakpoints()
-            if broken:
-                self.state.state_var.set("BRK")
-                self.state.breakpoint_var.set(str(bp_id))
-                self._state_label.configure(background="yellow")
-                break
+        if result.reason is runner.StopReason.STEP_LIMIT:
+            self.after(1, self._continue_chunk)
+            return
+
+        self._set_running(False)
+        if result.reason is runner.StopReason.HALTED:
+            self._halt()
+        elif result.reason is runner.StopReason.BREAKPOINT:
+            self.state.state_var.set("BRK")
+            self.state.breakpoint_var.set(str(result.breakpoint_id))
+            self._state_label.configure(background="yellow")
+        else:
+            self.state.state_var.set("INT")
+            self._state_label.configure(background="yellow")
 
         self.refresh_parent_fn()
+
+    def _on_stop(self) -> None:
+        self.state.debugger.interrupt()
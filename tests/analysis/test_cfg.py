@@ -0,0 +1,86 @@
+import json
+
+from cpusim import analysis
+from cpusim.backend import simulators
+from cpusim.backend.peripherals import gpio
+
+# 0: MOVE 0
+# 1: ADD 1        <- loop head
+# 2: JUMPNZ 1
+# 3: LOAD 0x10
+# 4: JUMPZ 6
+# 5: STORE 0x11
+# 6: JUMPU 6
+# 7: ADD 2        (unreachable)
+PROGRAM = [0x0000, 0x1001, 0xA001, 0x4010, 0x9006, 0x5011, 0x8006, 0x1002]
+
+
+def test_basic_blocks() -> None:
+    cfg = analysis.build_cfg(simulators.CPU1a(PROGRAM))
+
+    assert {start: (b.end, b.successors) for start, b in cfg.blocks.items()} == {
+        0: (1, [1]),
+        1: (3, [1, 3]),
+        3: (5, [6, 5]),
+        5: (6, [6]),
+        6: (7, [6]),
+    }
+    assert sorted(cfg.blocks[6].predecessors) == [3, 5, 6]
+    block = cfg.block_at(4)
+    assert block is not None and block.start == 3
+    assert cfg.block_at(7) is None
+
+
+def test_dominators_and_loops() -> None:
+    cfg = analysis.build_cfg(simulators.CPU1a(PROGRAM))
+
+    assert cfg.idom == {0: 0, 1: 0, 3: 1, 5: 3, 6: 3}
+    assert cfg.dominates(1, 5)
+    assert not cfg.dominates(5, 6)
+    assert [(loop.head, loop.latches, sorted(loop.body)) for loop in cfg.loops] == [(1, [1], [1]), (6, [6], [6])]
+
+
+def test_nested_loop_body() -> None:
+    # 0: MOVE 0, 1: ADD 1, 2: JUMPNZ 1, 3: SUB 1, 4: JUMPNZ 1, 5: JUMPU 5
+    cfg = analysis.build_cfg(simulators.CPU1a([0x0000, 0x1001, 0xA001, 0x2001, 0xA001, 0x8005]))
+
+    loops = {loop.head: (sorted(loop.latches), sorted(loop.body)) for loop in cfg.loops}
+    assert loops[1] == ([1, 3], [1, 3])
+
+
+def test_word_kinds() -> None:
+    cpu = simulators.CPU1a([*PROGRAM, 0, 0, 0, 0, 0, 0, 0, 0, 0x1234])
+    cpu.gpio = gpio.GPIO(cpu, gpio.GPIOConfig(1, 0xFC))
+    cfg = analysis.build_cfg(cpu)
+
+    kinds = cfg.word_kinds
+    assert kinds[0] is analysis.WordKind.CODE
+    assert kinds[7] is analysis.WordKind.UNREACHABLE
+    assert kinds[8] is analysis.WordKind.EMPTY
+    assert kinds[0x10] is analysis.WordKind.DATA
+    assert kinds[0x11] is analysis.WordKind.DATA
+    assert kinds[0xFC] is analysis.WordKind.MAPPED
+    assert cfg.unreachable_ranges() == [(7, 8)]
+
+
+def test_cache_is_keyed_by_image() -> None:
+    analysis.clear_cache()
+    cpu = simulators.CPU1a(PROGRAM)
+    first = analysis.build_cfg(cpu)
+
+    assert analysis.build_cfg(simulators.CPU1a(PROGRAM)) is first
+    assert analysis.build_cfg(simulators.CPU1a([0x8000])) is not first
+
+
+def test_exports() -> None:
+    cfg = analysis.build_cfg(simulators.CPU1a(PROGRAM))
+
+    data = json.loads(cfg.to_json())
+    assert [b["start"] for b in data["blocks"]] == [0, 1, 3, 5, 6]
+    assert data["blocks"][1]["instructions"] == ["add 0x1", "jumpnz 0x1"]
+    assert data["unreachable"] == [[7, 8]]
+
+    dot = cfg.to_dot()
+    assert dot.startswith("digraph cfg {")
+    assert "b1 -> b1 [style=dashed];" in dot
+    assert "b3 -> b5;" in dot
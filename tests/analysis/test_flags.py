@@ -0,0 +1,45 @@
+from cpusim import analysis
+from cpusim.backend import simulators
+
+# 0: ADD 1
+# 1: JUMPU 3
+# 2: JUMPU 2      (unreachable)
+# 3: SUB 1
+# 4: JUMPNZ 0
+# 5: AND 1
+# 6: JUMPU 6
+PROGRAM = [0x1001, 0x8003, 0x8002, 0x2001, 0xA000, 0x3001, 0x8006]
+
+
+def test_flag_effects() -> None:
+    cpu = simulators.CPU1d([])
+    add, _ = cpu.decode_word(0x1001)
+    jumpc, _ = cpu.decode_word(0xB000)
+    load, _ = cpu.decode_word(0x4000)
+
+    assert analysis.flag_effects(type(add)) == (analysis.Flag(0), analysis.Flag.ALL)
+    assert analysis.flag_effects(type(jumpc)) == (analysis.Flag.CARRY, analysis.Flag(0))
+    assert analysis.flag_effects(type(load)) == (analysis.Flag(0), analysis.Flag(0))
+
+
+def test_liveness_across_blocks() -> None:
+    cpu = simulators.CPU1a(PROGRAM)
+    cfg = analysis.build_cfg(cpu)
+
+    liveness = analysis.flag_liveness(cpu, cfg)
+
+    # the add is overwritten by the sub in the next block before the jumpnz reads anything
+    assert liveness[0] == analysis.Flag(0)
+    # only the zero flag of the sub is read - by the jumpnz - as the and overwrites the rest on the way out
+    assert liveness[3] == analysis.Flag.ZERO
+    # everything is visible once the program halts
+    assert liveness[5] == analysis.Flag.ALL
+    assert analysis.dead_flag_writes(cpu, liveness) == [0]
+
+
+def test_observed_addresses_keep_flags_live() -> None:
+    cpu = simulators.CPU1a(PROGRAM)
+    liveness = analysis.flag_liveness(cpu, analysis.build_cfg(cpu), observed=[0])
+
+    assert liveness[0] == analysis.Flag.ALL
+    assert analysis.dead_flag_writes(cpu, liveness) == []
@@ -0,0 +1,128 @@
+import pytest
+
+from cpusim.backend import accesses
+from cpusim.backend import halting
+from cpusim.backend import simulators
+
+# 0: MOVE RB 0x40
+# 1: MOVE RC 0x60
+# 2: MOVE RD 8
+# 3: LOAD RA 0x30       <- the same address every iteration
+# 4: LOAD RA (RB)       <- every other address from 0x40
+# 5: STORE RA (RC)      <- every address from 0x60
+# 6: ADD RB 2
+# 7: ADD RC 1
+# 8: SUB RD 1
+# 9: JUMPNZ 3
+# 10: JUMPU 10
+PROGRAM = [0x0440, 0x0860, 0x0C08, 0x4030, 0xF102, 0xF203, 0x1402, 0x1801, 0x2C01, 0xA003, 0x800A]
+
+
+def _profiled_cpu(program: list[int] = PROGRAM) -> simulators.CPU1d:
+    cpu = simulators.CPU1d(program)
+    cpu.access_profiler = accesses.AccessProfiler(cpu)
+    return cpu
+
+
+def test_reads_and_writes_are_counted_per_address() -> None:
+    cpu = _profiled_cpu()
+    cpu.run(1000)
+    profiler = cpu.access_profiler
+    assert profiler is not None
+
+    assert profiler.reads[0x30] == 8
+    assert [profiler.reads[addr] for addr in range(0x40, 0x50)] == [1, 0] * 8
+    assert [profiler.writes[addr] for addr in range(0x60, 0x68)] == [1] * 8
+    assert (sum(profiler.reads), sum(profiler.writes)) == (16, 8)
+    # instruction fetches are not data accesses
+    assert not any(profiler.reads[addr] for addr in range(len(PROGRAM)))
+
+
+def test_hottest_addresses_and_histogram() -> None:
+    cpu = _profiled_cpu()
+    cpu.run(1000)
+    profiler = cpu.access_profiler
+    assert profiler is not None
+
+    assert profiler.hottest(2) == [(0x30, 8, 0), (0x40, 1, 0)]
+    assert profiler.histogram(16) == [(0x30, 8, 0), (0x40, 8, 0), (0x60, 0, 8)]
+
+
+def test_streams_are_classified_by_stride() -> None:
+    cpu = _profiled_cpu()
+    cpu.run(1000)
+    profiler = cpu.access_profiler
+    assert profiler is not None
+
+    streams = profiler.streams()
+    assert streams == [
+        accesses.AccessStream(3, 8, 0, 1.0),
+        accesses.AccessStream(4, 8, 2, 1.0),
+        accesses.AccessStream(5, 8, 1, 1.0),
+    ]
+    assert [stream.kind for stream in streams] == ["fixed", "strided", "sequential"]
+
+
+def test_irregular_accesses() -> None:
+    # MOVE RB 0x40, MOVE RC 0x50, LOAD RA (RB), MOVE RD RB, MOVE RB RC, MOVE RC RD, ADD RB 3, JUMPU 2
+    # alternates between two walks through memory, so no one stride covers most of its accesses
+    cpu = _profiled_cpu([0x0440, 0x0850, 0xF102, 0xFD01, 0xF601, 0xFB01, 0x1403, 0x8002])
+    cpu.run(7 * 40)
+    profiler = cpu.access_profiler
+    assert profiler is not None
+
+    (stream,) = profiler.streams()
+    assert stream.pc == 2
+    assert stream.kind == "irregular"
+
+
+def test_accesses_outside_instructions_are_not_counted() -> None:
+    cpu = _profiled_cpu()
+    cpu.memory.get(0x30)
+    cpu.memory.set(0x31, 5)
+    profiler = cpu.access_profiler
+    assert profiler is not None
+
+    assert not any(profiler.reads) and not any(profiler.writes)
+
+
+def test_detaching_stops_counting() -> None:
+    cpu = _profiled_cpu()
+    profiler = cpu.access_profiler
+    cpu.run(5)
+    cpu.access_profiler = None
+    cpu.run(1000)
+    assert profiler is not None
+
+    assert (sum(profiler.reads), sum(profiler.writes)) == (2, 0)
+
+
+def test_storing_jumps_does_not_rebuild_the_halt_table_every_step(monkeypatch: pytest.MonkeyPatch) -> None:
+    # LOAD RA 0x40, ADD RA 1, STORE RA 0x40, ... with 0x40 holding values which decode as jumps
+    cpu = _profiled_cpu([0x0500, 0x4040, 0x1001, 0x5040, 0x2501, 0xA001, 0x8000])
+    cpu.memory[0x40] = 0x8000
+    profiler = cpu.access_profiler
+    assert profiler is not None
+    rebuilds: list[None] = []
+    rebuild = halting.HaltLoopTable.rebuild
+    monkeypatch.setattr(halting.HaltLoopTable, "rebuild", lambda table: rebuilds.append(rebuild(table)))
+
+    assert cpu.run(5000) == (5000, False)
+
+    assert len(rebuilds) == 1
+    assert (sum(profiler.reads), sum(profiler.writes)) == (1000, 1000)
+    assert (profiler.reads[0x40], profiler.writes[0x40]) == (1000, 1000)
+
+
+@pytest.mark.parametrize("engine", ["predecode", "jit", "accelerate_loops", "fast_forward_idle"])
+def test_results_are_unchanged_whatever_the_engine(engine: str) -> None:
+    results: list[tuple[object, ...]] = []
+    for enabled in (False, True):
+        cpu = _profiled_cpu()
+        setattr(cpu, engine, enabled)
+        executed, halted = cpu.run(1000)
+        profiler = cpu.access_profiler
+        assert profiler is not None
+        results.append((executed, halted, list(profiler.reads), list(profiler.writes), cpu.architectural_state()))
+
+    assert results[0] == results[1]
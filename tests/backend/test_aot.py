@@ -0,0 +1,123 @@
+import os
+import pathlib
+import random
+
+import pytest
+
+import cpusim
+from cpusim.backend import aot
+from cpusim.backend import simulators
+from cpusim.common.types import Int16
+
+
+def _random_program(rng: random.Random, arch: aot.Arch) -> list[int]:
+    # straight-line code over the whole instruction set (data area included) closed by a random jump back
+    ops = [*range(0xB), 0xD, 0xF] if arch == "1d" else list(range(0xB))
+    program: list[int] = []
+    jumps: list[int] = []
+    for _ in range(rng.randrange(4, 24)):
+        op = rng.choice(ops)
+        if op in (0x8, 0x9, 0xA, 0xB):
+            jumps.append(len(program))
+            program.append(op << 12)
+        elif op in (0x4, 0x5, 0x6, 0x7):
+            program.append((op << 12) | rng.randrange(0x20, 0x28))
+        elif op == 0xF:
+            # keep indirect addresses inside the data area
+            program += [0x3C07, 0xDC20, 0xF000 | (rng.randrange(4) << 10) | (3 << 8) | rng.randrange(1, 0xC)]
+        else:
+            program.append((op << 12) | rng.randrange(0x1000))
+    program.append(0x8000 | rng.randrange(len(program)))
+    for address in jumps:
+        program[address] |= rng.randrange(len(program))
+    return program
+
+
+def _run(cpu: simulators.CPU[object], chunks: list[int]) -> tuple[object, ...]:
+    total, halted = 0, False
+    for chunk in chunks:
+        executed, halted = cpu.run(chunk)
+        total += executed
+        if halted:
+            break
+    memory = [cpu.memory.get(0x20 + i) for i in range(8)]
+    return total, halted, cpu.ir.value, cpu.architectural_state(), cpu.history.entries(), memory
+
+
+@pytest.mark.parametrize("seed", range(30))
+@pytest.mark.parametrize("arch", ["1a", "1d"])
+def test_compiled_program_matches_interpreter(arch: aot.Arch, seed: int, tmp_path: pathlib.Path) -> None:
+    rng = random.Random(seed)
+    program = _random_program(rng, arch)
+    chunks = [rng.randrange(1, 500) for _ in range(4)]
+    module = aot.load(program, arch, str(tmp_path))
+
+    results: list[tuple[object, ...]] = []
+    for compiled in (False, True):
+        cpu = simulators.CPU1a(program) if arch == "1a" else simulators.CPU1d(program)
+        if compiled:
+            cpu.compiled_program = aot.CompiledProgram(cpu, module)
+        results.append(_run(cpu, chunks))
+
+    assert results[0] == results[1]
+
+
+def test_cache_is_keyed_by_program_and_version(tmp_path: pathlib.Path) -> None:
+    path = aot.cache_path([0x1001, 0x8001], "1a", str(tmp_path))
+
+    assert path.startswith(str(tmp_path / cpusim.__version__))
+    assert path != aot.cache_path([0x1002, 0x8001], "1a", str(tmp_path))
+    assert path != aot.cache_path([0x1001, 0x8001], "1d", str(tmp_path))
+
+
+def test_cached_module_is_reused(tmp_path: pathlib.Path) -> None:
+    program = [0x1001, 0x8000]
+    aot.load(program, "1a", str(tmp_path))
+    path = aot.cache_path(program, "1a", str(tmp_path))
+    os.utime(path, (0, 0))
+
+    module = aot.load(program, "1a", str(tmp_path))
+
+    assert os.stat(path).st_mtime == 0
+    assert module.IMAGE == (0x1001, 0x8000)
+
+
+def test_stale_module_is_recompiled(tmp_path: pathlib.Path) -> None:
+    program = [0x1001, 0x8000]
+    path = aot.cache_path(program, "1a", str(tmp_path))
+    os.makedirs(os.path.dirname(path))
+    with open(path, "w") as f:
+        f.write("CPUSIM_VERSION = '0.0.0'\n")
+
+    module = aot.load(program, "1a", str(tmp_path))
+
+    assert cpusim.__version__ == module.CPUSIM_VERSION
+    assert aot.program_hash(program, "1a") == module.PROGRAM_HASH
+
+
+def test_self_modifying_store_falls_back_to_interpreter(tmp_path: pathlib.Path) -> None:
+    # ADD 1, LOAD 0x20, STORE 0, JUMPU 0 - after the first pass the ADD is replaced with SUB 1
+    program = [0x1001, 0x4020, 0x5000, 0x8000]
+    module = aot.load(program, "1a", str(tmp_path))
+    results: list[tuple[object, ...]] = []
+    for compiled in (False, True):
+        cpu = simulators.CPU1a(program)
+        cpu.memory.set(0x20, Int16(0x2001))
+        if compiled:
+            cpu.compiled_program = aot.CompiledProgram(cpu, module)
+        results.append(_run(cpu, [37, 200]))
+
+        if compiled:
+            assert cpu.compiled_program is not None
+            assert 0 < cpu.compiled_program.instructions < 237
+
+    assert results[0] == results[1]
+
+
+def test_module_for_another_program_is_rejected(tmp_path: pathlib.Path) -> None:
+    module = aot.load([0x1001, 0x8000], "1a", str(tmp_path))
+
+    with pytest.raises(ValueError):
+        aot.CompiledProgram(simulators.CPU1a([0x1002, 0x8000]), module)
+    with pytest.raises(ValueError):
+        aot.CompiledProgram(simulators.CPU1d([0x1001, 0x8000]), module)
@@ -0,0 +1,100 @@
+import pytest
+
+from cpusim.backend import branches
+from cpusim.backend import simulators
+
+
+def test_counted_loop() -> None:
+    # MOVE RB 4, SUB RB 1, JUMPNZ 1, JUMPU 3
+    cpu = simulators.CPU1d([0x0404, 0x2401, 0xA001, 0x8003])
+    profiler = cpu.branches = branches.BranchProfiler(cpu, history_length=4)
+
+    cpu.run(100)
+
+    assert profiler.addresses() == [2]
+    assert (profiler.taken[2], profiler.not_taken[2], profiler.branches) == (3, 1, 4)
+    # taken, taken, taken, not taken - static predicts the backward jump taken every time, and the one and two
+    # bit predictors start out predicting not taken
+    assert {p: profiler.correct[p][2] for p in branches.PREDICTORS} == {
+        "static": 3,
+        "one_bit": 2,
+        "two_bit": 2,
+        "gshare": 1,
+    }
+    assert profiler.accuracy("static") == profiler.accuracy("static", 2) == 0.75
+
+
+def test_static_predicts_forward_branches_not_taken() -> None:
+    # MOVE 0, ADD 0, JUMPZ 3, JUMPU 3 - the JUMPZ jumps forward, and is taken as the ADD sets the zero flag
+    cpu = simulators.CPU1a([0x0000, 0x1000, 0x9003, 0x8003])
+    profiler = cpu.branches = branches.BranchProfiler(cpu)
+
+    cpu.run(10)
+
+    assert (profiler.taken[2], profiler.not_taken[2]) == (1, 0)
+    assert profiler.correct["static"][2] == 0
+
+
+# ADD RA 1, JUMPC 0 and ADD RA 0, JUMPZ 0
+@pytest.mark.parametrize("program", [[0x1001, 0xB000], [0x1000, 0x9000]])
+def test_every_conditional_jump_is_profiled(program: list[int]) -> None:
+    cpu = simulators.CPU1d(program)
+    profiler = cpu.branches = branches.BranchProfiler(cpu)
+
+    cpu.run(4)
+
+    assert profiler.addresses() == [1]
+
+
+def test_gshare_learns_an_alternating_branch() -> None:
+    # ADD RA 1, AND RA 1, JUMPZ 4, MOVE RB 0, JUMPU 0 - the JUMPZ is taken every other time round
+    cpu = simulators.CPU1d([0x1001, 0x3001, 0x9004, 0x0400, 0x8000])
+    profiler = cpu.branches = branches.BranchProfiler(cpu, history_length=4)
+
+    cpu.run(4500)
+
+    assert profiler.branches == 1000
+    assert profiler.accuracy("one_bit") < 0.01
+    assert profiler.accuracy("two_bit") <= 0.5
+    assert profiler.accuracy("gshare") > 0.99
+
+
+def test_to_dict() -> None:
+    # MOVE RB 4, SUB RB 1, JUMPNZ 1, JUMPU 3
+    cpu = simulators.CPU1d([0x0404, 0x2401, 0xA001, 0x8003])
+    profiler = cpu.branches = branches.BranchProfiler(cpu)
+    cpu.run(100)
+
+    out = profiler.to_dict()
+
+    assert (out["history_length"], out["taken"], out["not_taken"]) == (8, 3, 1)
+    assert out["branches"] == [
+        {
+            "address": 2,
+            "taken": 3,
+            "not_taken": 1,
+            "accuracy": {"static": 0.75, "one_bit": 0.5, "two_bit": 0.5, "gshare": 0.25},
+        }
+    ]
+
+
+@pytest.mark.parametrize("history_length", [0, 17])
+def test_invalid_history_length_is_rejected(history_length: int) -> None:
+    with pytest.raises(ValueError):
+        branches.BranchProfiler(simulators.CPU1d(), history_length=history_length)
+
+
+@pytest.mark.parametrize("engine", ["predecode", "jit", "accelerate_loops", "fast_forward_idle"])
+def test_architectural_results_are_unchanged(engine: str) -> None:
+    # MOVE RB 50, ADD RA 3, SUB RB 1, JUMPNZ 1, STORE RA 0x40, JUMPU 5
+    program = [0x0432, 0x1003, 0x2401, 0xA001, 0x5040, 0x8005]
+    reference = simulators.CPU1d(program)
+    setattr(reference, engine, True)
+    expected = reference.run(1000), reference.architectural_state()
+
+    cpu = simulators.CPU1d(program)
+    setattr(cpu, engine, True)
+    profiler = cpu.branches = branches.BranchProfiler(cpu)
+
+    assert (cpu.run(1000), cpu.architectural_state()) == expected
+    assert (profiler.taken[3], profiler.not_taken[3]) == (49, 1)
@@ -0,0 +1,124 @@
+import pytest
+
+from cpusim.backend import cache
+from cpusim.backend import halting
+from cpusim.backend import simulators
+from cpusim.backend.peripherals import gpio
+
+
+def test_parse_config() -> None:
+    config = cache.CacheConfig.parse("64, 4, 2, FIFO")
+
+    assert (config.size, config.line_size, config.associativity, config.policy) == (64, 4, 2, "fifo")
+    assert repr(cache.CacheConfig.parse("0x20")) == "CacheConfig(32, 4, 1, 'lru')"
+
+
+@pytest.mark.parametrize("spec", ["", "64,4,2,lru,1", "sixty", "48", "64,3", "64,4,3", "8,4,4", "64,4,2,random"])
+def test_invalid_config_is_rejected(spec: str) -> None:
+    with pytest.raises(ValueError):
+        cache.CacheConfig.parse(spec)
+
+
+@pytest.mark.parametrize(
+    ("policy", "hits"), [("lru", [False, False, True, False, True]), ("fifo", [False, False, True, False, False])]
+)
+def test_replacement_policy(policy: cache.ReplacementPolicy, hits: list[bool]) -> None:
+    # a single set of two lines of one word
+    simulated = cache.Cache(cache.CacheConfig(2, 1, 2, policy), 64)
+
+    # LRU keeps 0 as it was used more recently than 1 when 2 comes in, FIFO replaces it as the oldest line
+    assert [simulated.access(address) for address in (0, 1, 0, 2, 0)] == hits
+
+
+def test_direct_mapped_lines_conflict() -> None:
+    simulated = cache.Cache(cache.CacheConfig(8, 4), 64, region_size=16)
+
+    assert [simulated.access(address) for address in (0, 3, 8, 1, 4, 20)] == [False, True, False, False, False, False]
+    assert list(simulated.regions()) == [(0, 1, 4), (16, 0, 1)]
+    assert simulated.hit_rate == pytest.approx(1 / 6)
+
+
+def _strided_loads() -> simulators.CPU1d:
+    # MOVE RB 0x40, MOVE RC 100, LOAD RA (RB), ADD RB 1, SUB RC 1, JUMPNZ 2, JUMPU 6
+    return simulators.CPU1d([0x0440, 0x0864, 0xF102, 0x1401, 0x2801, 0xA002, 0x8006])
+
+
+def test_hits_and_misses_per_instruction_and_region() -> None:
+    cpu = _strided_loads()
+    simulator = cpu.cache = cache.CacheSimulator(
+        cpu, instruction=cache.CacheConfig(16), data=cache.CacheConfig(16), region_size=64
+    )
+
+    assert cpu.run(1000) == (403, True)
+
+    assert simulator.instruction is not None and simulator.data is not None
+    # the whole program fits in two lines, so only the first fetch from each misses
+    assert (simulator.instruction.hits, simulator.instruction.misses) == (401, 2)
+    # one word in four starts a new line
+    assert (simulator.data.hits, simulator.data.misses) == (75, 25)
+    assert list(simulator.data.regions()) == [(0x40, 48, 16), (0x80, 27, 9)]
+    assert list(simulator.instructions()) == [(0, 1, 0, 0), (2, 0, 75, 25), (4, 1, 0, 0)]
+    assert simulator.uncached == {}
+
+
+def test_mem_mapped_accesses_are_uncached() -> None:
+    # LOAD 0xFC, STORE 0x20, LOAD 0x20, JUMPU 3
+    cpu = simulators.CPU1a([0x40FC, 0x5020, 0x4020, 0x8003])
+    cpu.gpio = gpio.GPIO(cpu, gpio.GPIOConfig(2, 0xFC))
+    cpu.gpio.set_device(0, gpio.BugTrap())
+    simulator = cpu.cache = cache.CacheSimulator(cpu, data=cache.CacheConfig(16))
+
+    cpu.run(4)
+
+    assert simulator.uncached == {"gpio": 1}
+    assert list(simulator.instructions()) == [(1, 0, 0, 1), (2, 0, 1, 0)]
+    assert simulator.instruction is None
+
+
+def test_only_accesses_made_by_instructions_are_counted() -> None:
+    cpu = _strided_loads()
+    simulator = cpu.cache = cache.CacheSimulator(cpu, data=cache.CacheConfig(16))
+    cpu.step()
+
+    cpu.memory.get(0x40)
+    cpu.cache = None
+    cpu.step()
+    cpu.step()
+
+    assert simulator.data is not None
+    assert simulator.data.accesses == 0
+
+
+def test_storing_jumps_does_not_rebuild_the_halt_table_every_step(monkeypatch: pytest.MonkeyPatch) -> None:
+    # LOAD RA 0x40, ADD RA 1, STORE RA 0x40, ... with 0x40 holding values which decode as jumps
+    cpu = simulators.CPU1d([0x0500, 0x4040, 0x1001, 0x5040, 0x2501, 0xA001, 0x8000])
+    cpu.memory[0x40] = 0x8000
+    simulator = cpu.cache = cache.CacheSimulator(cpu, data=cache.CacheConfig(64))
+    rebuilds: list[None] = []
+    rebuild = halting.HaltLoopTable.rebuild
+    monkeypatch.setattr(halting.HaltLoopTable, "rebuild", lambda table: rebuilds.append(rebuild(table)))
+
+    assert cpu.run(5000) == (5000, False)
+
+    assert len(rebuilds) == 1
+    assert list(simulator.instructions()) == [(1, 0, 999, 1), (3, 0, 1000, 0)]
+
+    # the table reads the whole image when it is rebuilt, none of which are accesses by the current instruction
+    simulator.fetch(0)
+    cpu.halt_table.rebuild()
+    assert list(simulator.instructions()) == [(1, 0, 999, 1), (3, 0, 1000, 0)]
+
+
+@pytest.mark.parametrize("engine", ["predecode", "jit", "accelerate_loops", "fast_forward_idle"])
+def test_architectural_results_are_unchanged(engine: str) -> None:
+    reference = _strided_loads()
+    setattr(reference, engine, True)
+    expected = reference.run(1000), reference.architectural_state()
+
+    cpu = _strided_loads()
+    setattr(cpu, engine, True)
+    simulator = cpu.cache = cache.CacheSimulator(cpu, instruction=cache.CacheConfig(4), data=cache.CacheConfig(4))
+
+    assert (cpu.run(1000), cpu.architectural_state()) == expected
+    assert simulator.instruction is not None
+    assert simulator.instruction.accesses == 403
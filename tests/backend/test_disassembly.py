@@ -0,0 +1,34 @@
+from cpusim.backend import disassembly
+from cpusim.backend import simulators
+from cpusim.backend.peripherals import gpio
+from cpusim.common.types import Int16
+
+
+def test_first_refresh_returns_every_address() -> None:
+    cpu = simulators.CPU1a([0x1001])
+    cache = disassembly.DisassemblyCache(cpu)
+
+    assert cache.refresh() == set(range(cpu.memory.size))
+    assert cache.get(0) == (0x1001, "add 0x1")
+
+
+def test_refresh_only_returns_written_addresses() -> None:
+    cpu = simulators.CPU1a([0x1001])
+    cache = disassembly.DisassemblyCache(cpu)
+    cache.refresh()
+
+    cpu.memory.set(5, Int16(0x2003))
+
+    assert cache.refresh() == {5}
+    assert cache.get(5) == (0x2003, "sub 0x3")
+    assert cache.refresh() == set()
+
+
+def test_mem_mapped_addresses_are_not_read() -> None:
+    cpu = simulators.CPU1a()
+    cpu.gpio = gpio.GPIO(cpu)
+    cache = disassembly.DisassemblyCache(cpu)
+    cache.refresh()
+
+    assert cache.get(0xFC) is None
+    assert cache.get(0xFB) == (0, "move 0x0")
@@ -0,0 +1,71 @@
+import pytest
+
+from cpusim.backend import simulators
+from cpusim.backend.peripherals import gpio
+from cpusim.backend.peripherals import stimulus
+from cpusim.backend.peripherals import timer
+from cpusim.common.types import Int16
+
+# LOAD 0xFC, AND 1, JUMPZ 0, JUMPU 3 - waits for the fire button, then halts
+POLL_BUTTON = [0x40FC, 0x3001, 0x9000, 0x8003]
+
+
+def _bug_trap_cpu(program: list[int], fast_forward: bool) -> simulators.CPU1a:
+    cpu = simulators.CPU1a(program)
+    cpu.fast_forward_idle = fast_forward
+    cpu.gpio = gpio.GPIO(cpu)
+    cpu.gpio.set_device(0, gpio.BugTrap())
+    cpu.gpio.set_device(1, timer.Timer(cpu.scheduler))
+    return cpu
+
+
+@pytest.mark.parametrize("chunk", [7, 1000, 100_000])
+def test_fast_forward_matches_real_execution(chunk: int) -> None:
+    results: list[tuple[object, ...]] = []
+    for fast_forward in (False, True):
+        cpu = _bug_trap_cpu(POLL_BUTTON, fast_forward)
+        stimulus.schedule_stimulus(cpu, stimulus.parse_stimulus("20001 bugtrap.fire_button_pressed 1"))
+
+        total, halted = 0, False
+        while not halted:
+            executed, halted = cpu.run(chunk)
+            total += executed
+
+        results.append((total, cpu.scheduler.cycle, cpu.architectural_state(), cpu.history.entries()))
+        if fast_forward:
+            assert cpu.idle_instructions_skipped > 0
+
+    assert results[0] == results[1]
+
+
+def test_loop_with_side_effects_is_not_skipped() -> None:
+    # LOAD 0x80, ADD 1, STORE 0x80, JUMPU 0 - counts in RAM
+    cpu = _bug_trap_cpu([0x4080, 0x1001, 0x5080, 0x8000], True)
+    cpu.run(400)
+
+    assert cpu.idle_instructions_skipped == 0
+    assert cpu.memory.get(0x80) == Int16(100)
+
+
+def test_loop_reading_changing_input_is_not_skipped() -> None:
+    # LOAD 0xFE, AND 0, JUMPZ 0 - polls the timer's remaining count, which changes every cycle
+    cpu = _bug_trap_cpu([0x40FE, 0x3000, 0x9000], True)
+    cpu.memory.set(0xFE, Int16(50))
+    cpu.run(300)
+
+    assert cpu.idle_instructions_skipped == 0
+
+
+def test_loop_polling_timer_expirations_is_skipped() -> None:
+    # LOAD 0xFF, AND 1, JUMPZ 0, JUMPU 3 - waits for the first timer expiry
+    results: list[tuple[object, ...]] = []
+    for fast_forward in (False, True):
+        cpu = _bug_trap_cpu([0x40FF, 0x3001, 0x9000, 0x8003], fast_forward)
+        cpu.memory.set(0xFE, Int16(5000))
+
+        executed, halted = cpu.run(10_000)
+        assert halted
+        results.append((executed, cpu.architectural_state()))
+
+    assert results[0] == results[1]
+    assert cpu.idle_instructions_skipped > 4000
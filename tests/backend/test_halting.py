@@ -0,0 +1,52 @@
+from cpusim.backend import simulators
+from cpusim.common.types import Int16
+
+
+def test_two_instruction_halt_loop() -> None:
+    # MOVE 1, JUMPU 2, JUMPU 1
+    cpu = simulators.CPU1a([0x0001, 0x8002, 0x8001])
+
+    executed, halted = cpu.run(100)
+
+    assert halted
+    assert executed == 2
+    assert cpu.pc.value == 1
+
+
+def test_conditional_self_jump_halts_only_when_taken() -> None:
+    # SUB RA 0 (zero set), JUMPZ 1
+    cpu = simulators.CPU1d([0x2000, 0x9001])
+    assert cpu.run(100) == (2, True)
+
+    # ADD RA 1 (zero clear), JUMPZ 1, JUMPU 2
+    cpu = simulators.CPU1d([0x1001, 0x9001, 0x8002])
+    assert cpu.run(100) == (3, True)
+    assert cpu.pc.value == 2
+
+
+def test_conditional_ring_halts() -> None:
+    # SUB RA 0, JUMPZ 2, JUMPNZ 5, JUMPU 1 - zero is never cleared inside the 1 -> 2 -> 3 -> 1 ring
+    cpu = simulators.CPU1d([0x2000, 0x9002, 0xA005, 0x8001])
+
+    executed, halted = cpu.run(100)
+
+    assert halted
+    assert executed == 2
+
+
+def test_loop_with_side_effects_is_not_a_halt() -> None:
+    # ADD 1, JUMPU 0
+    cpu = simulators.CPU1a([0x1001, 0x8000])
+
+    assert cpu.run(100) == (100, False)
+
+
+def test_self_modifying_code_updates_table() -> None:
+    # JUMPU 1, then overwritten with ADD 1 - the ring 1 -> 1 must no longer halt
+    cpu = simulators.CPU1a([0x8001, 0x8001])
+    assert cpu.halt_table.masks[1]
+
+    cpu.memory.set(1, Int16(0x1001))
+    assert cpu.step() is False
+    assert cpu.step() is False
+    assert cpu.acc.value == 1
@@ -0,0 +1,135 @@
+import random
+
+import pytest
+
+from cpusim.backend import simulators
+from cpusim.common.types import Int16
+
+_IMMEDIATE_OPS_1D = [0x0, 0x1, 0x2, 0x3, 0xD]  # move, add, sub, and, or
+_REGISTER_OPS_1D = [0x1, 0x4, 0x5, 0x6, 0x7, 0x8, 0x9, 0xA, 0xB]  # move, rol, ror, add, sub, and, or, xor, asl
+_MEMORY_OPS = [0x4, 0x5, 0x6, 0x7]  # load, store, addm, subm
+_DATA = 0x80
+
+
+def _instruction_1a(rng: random.Random) -> list[int]:
+    if rng.random() < 0.3:
+        return [(rng.choice(_MEMORY_OPS) << 12) | (_DATA + rng.randrange(8))]
+    return [(rng.randrange(4) << 12) | rng.randrange(0x100)]
+
+
+def _instruction_1d(rng: random.Random) -> list[int]:
+    reg, src = rng.randrange(4), rng.randrange(4)
+    roll = rng.random()
+    if roll < 0.2:
+        return [(rng.choice(_MEMORY_OPS) << 12) | (_DATA + rng.randrange(8))]
+    if roll < 0.3:
+        # keep the address register inside the data area before an indirect load or store
+        store = rng.random() < 0.5
+        return [0x3C0F, 0xDC00 | _DATA, 0xF000 | (reg << 10) | (3 << 8) | (0x3 if store else 0x2)]
+    if roll < 0.65:
+        return [(rng.choice(_IMMEDIATE_OPS_1D) << 12) | (reg << 10) | rng.randrange(0x100)]
+    return [0xF000 | (reg << 10) | (src << 8) | rng.choice(_REGISTER_OPS_1D)]
+
+
+def _random_program(rng: random.Random, arch: str) -> list[int]:
+    # a loop of several blocks, split by forward conditional jumps that become guards in a trace
+    jumps = [0x9, 0xA] if arch == "1a" else [0x9, 0xA, 0xB]
+    registers = 1 if arch == "1a" else 4
+    program = [(reg << 10) | rng.randrange(0x100) for reg in range(registers)]
+    head = len(program)
+
+    blocks: list[list[int]] = []
+    for _ in range(rng.randrange(1, 4)):
+        block: list[int] = []
+        for _ in range(rng.randrange(1, 5)):
+            block += _instruction_1a(rng) if arch == "1a" else _instruction_1d(rng)
+        blocks.append(block)
+
+    for i, block in enumerate(blocks):
+        program += block
+        if i < len(blocks) - 1:
+            # jump over part of the next block, or to its start
+            skip = rng.randrange(len(blocks[i + 1]))
+            program.append((rng.choice(jumps) << 12) | (len(program) + 1 + skip))
+
+    program.append((rng.choice([0x8, *jumps]) << 12) | head)
+    program.append(0x8000 | len(program))
+    return program
+
+
+def _run(cpu: simulators.CPU[object], chunks: list[int]) -> tuple[object, ...]:
+    total, halted = 0, False
+    for chunk in chunks:
+        executed, halted = cpu.run(chunk)
+        total += executed
+        if halted:
+            break
+    memory = [cpu.memory.get(_DATA + i) for i in range(8)]
+    return total, halted, cpu.ir.value, cpu.architectural_state(), cpu.history.entries(), cpu.history.total, memory
+
+
+@pytest.mark.parametrize("seed", range(40))
+@pytest.mark.parametrize("arch", ["1a", "1d"])
+def test_traces_match_interpreter(arch: str, seed: int) -> None:
+    rng = random.Random(seed)
+    program = _random_program(rng, arch)
+    chunks = [rng.randrange(1, 800) for _ in range(8)]
+
+    results: list[tuple[object, ...]] = []
+    for jit in (False, True):
+        cpu = simulators.CPU1a(program) if arch == "1a" else simulators.CPU1d(program)
+        cpu.jit = jit
+        results.append(_run(cpu, chunks))
+
+    assert results[0] == results[1]
+
+
+def test_hot_loop_is_traced() -> None:
+    # ADD RA 1, AND RA 0x0F, JUMPZ 4, JUMPU 0, ADD RB 1, JUMPU 0
+    program = [0x1001, 0x300F, 0x9004, 0x8000, 0x1401, 0x8000]
+    cpu = simulators.CPU1d(program)
+    cpu.jit = True
+
+    executed, halted = cpu.run(10_000)
+
+    assert (executed, halted) == (10_000, False)
+    assert 0 in cpu.trace_jit.traces
+    assert cpu.trace_jit.instructions_traced > 9_000
+    # the guard on JUMPZ fails every sixteenth iteration, sending the CPU down the other path
+    reference = simulators.CPU1d(program)
+    reference.run(10_000)
+    assert cpu.registers.get(1) == reference.registers.get(1) == Int16(10_000 // 65)
+
+
+def test_breakpoint_inside_trace_stops_run() -> None:
+    # ADD RA 1, ADD RB 1, JUMPU 0
+    program = [0x1001, 0x1401, 0x8000]
+    cpu = simulators.CPU1d(program)
+    cpu.jit = True
+    cpu.run(1000)
+    assert cpu.trace_jit.traces
+
+    cpu.breakpoints = {1}
+    executed, halted = cpu.run(1000)
+
+    assert not halted
+    assert cpu.pc.value == 1
+    assert executed <= 3
+
+    cpu.breakpoints = set()
+    reference = simulators.CPU1d(program)
+    reference.run(1000 + executed)
+    assert cpu.architectural_state() == reference.architectural_state()
+
+
+def test_overwritten_trace_is_recompiled() -> None:
+    # ADD 1, LOAD 0x20, STORE 0, JUMPU 0 - after the first pass the ADD is replaced with SUB 1
+    program = [0x1001, 0x4020, 0x5000, 0x8000]
+    results: list[tuple[object, ...]] = []
+    for jit in (False, True):
+        cpu = simulators.CPU1a(program)
+        cpu.memory.set(0x20, Int16(0x2001))
+        cpu.jit = jit
+        results.append(_run(cpu, [37, 200, 5]))
+
+    assert results[0] == results[1]
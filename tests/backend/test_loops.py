@@ -0,0 +1,152 @@
+import random
+
+import pytest
+
+from cpusim.backend import simulators
+from cpusim.common.types import Int16
+
+# opcodes of the register-only instructions a counted loop may contain
+_OPS_1A = [0x0, 0x1, 0x2, 0x3]  # move, add, sub, and
+_IMMEDIATE_OPS_1D = [0x0, 0x1, 0x2, 0x3, 0xD]  # move, add, sub, and, or
+_REGISTER_OPS_1D = [0x1, 0x4, 0x5, 0x6, 0x7, 0x8, 0x9, 0xA, 0xB]  # move, rol, ror, add, sub, and, or, xor, asl
+_JUMPS_1A = [0x8, 0x9, 0xA]
+_JUMPS_1D = [0x8, 0x9, 0xA, 0xB]
+
+
+def _random_program_1a(rng: random.Random) -> list[int]:
+    program = [rng.randrange(0x100)]  # MOVE kk
+    head = len(program)
+    for _ in range(rng.randrange(1, 5)):
+        program.append((rng.choice(_OPS_1A) << 12) | rng.choice([1, 2, 0xFF, rng.randrange(0x100)]))
+    if rng.random() < 0.5:
+        program.append(0x2001)  # SUB 1
+    program.append((rng.choice(_JUMPS_1A) << 12) | head)
+    program.append(0x8000 | len(program))
+    return program
+
+
+def _random_program_1d(rng: random.Random) -> list[int]:
+    program = [(reg << 10) | rng.randrange(0x100) for reg in range(4)]  # MOVE Rx kk
+    head = len(program)
+    for _ in range(rng.randrange(1, 6)):
+        reg, src = rng.randrange(4), rng.randrange(4)
+        if rng.random() < 0.6:
+            program.append((rng.choice(_IMMEDIATE_OPS_1D) << 12) | (reg << 10) | rng.randrange(0x100))
+        else:
+            program.append(0xF000 | (reg << 10) | (src << 8) | rng.choice(_REGISTER_OPS_1D))
+    if rng.random() < 0.5:
+        program.append(0x2001 | (rng.randrange(4) << 10))  # SUB Rx 1
+    program.append((rng.choice(_JUMPS_1D) << 12) | head)
+    program.append(0x8000 | len(program))
+    return program
+
+
+def _random_counter_program(rng: random.Random, arch: str) -> list[int]:
+    # constant adds and subtracts closed by JUMPNZ, with the counter stepped by the last one
+    registers = 1 if arch == "1a" else 4
+    program = [(reg << 10) | rng.randrange(0x100) for reg in range(registers)]
+    head = len(program)
+    for _ in range(rng.randrange(0, 4)):
+        program.append((rng.choice([0x1, 0x2]) << 12) | (rng.randrange(registers) << 10) | rng.randrange(0x100))
+    program.append((rng.choice([0x1, 0x2]) << 12) | (rng.randrange(registers) << 10) | rng.choice([1, 2, 3, 4, 0xFF]))
+    program.append(0xA000 | head)
+    program.append(0x8000 | len(program))
+    return program
+
+
+def _run(cpu: simulators.CPU[object], chunks: list[int]) -> tuple[object, ...]:
+    total, halted = 0, False
+    for chunk in chunks:
+        executed, halted = cpu.run(chunk)
+        total += executed
+        if halted:
+            break
+    return total, halted, cpu.scheduler.cycle, cpu.architectural_state(), cpu.ir.value, cpu.history.entries()
+
+
+@pytest.mark.parametrize("seed", range(40))
+@pytest.mark.parametrize("arch", ["1a", "1d"])
+def test_accelerated_loops_match_interpreter(arch: str, seed: int) -> None:
+    rng = random.Random(seed)
+    program = _random_program_1a(rng) if arch == "1a" else _random_program_1d(rng)
+    chunks = [rng.randrange(1, 800) for _ in range(8)]
+
+    results: list[tuple[object, ...]] = []
+    for accelerate in (False, True):
+        cpu = simulators.CPU1a(program) if arch == "1a" else simulators.CPU1d(program)
+        cpu.accelerate_loops = accelerate
+        results.append(_run(cpu, chunks))
+
+    assert results[0] == results[1]
+
+
+@pytest.mark.parametrize("seed", range(40))
+@pytest.mark.parametrize("arch", ["1a", "1d"])
+def test_closed_form_loops_match_interpreter(arch: str, seed: int) -> None:
+    rng = random.Random(seed)
+    program = _random_counter_program(rng, arch)
+    chunks = [rng.randrange(1, 5000) for _ in range(4)]
+
+    results: list[tuple[object, ...]] = []
+    for accelerate in (False, True):
+        cpu = simulators.CPU1a(program) if arch == "1a" else simulators.CPU1d(program)
+        cpu.accelerate_loops = accelerate
+        results.append(_run(cpu, chunks))
+        if accelerate:
+            loop = cpu.loop_accelerator.find(1 if arch == "1a" else 4)
+            assert loop is not None
+            assert loop.translation is not None
+
+    assert results[0] == results[1]
+
+
+def test_counter_loop_is_computed_in_closed_form() -> None:
+    # SUB RA 1, ADD RB 5, JUMPNZ 0, JUMPU 3 - RA starts at 0 so the loop wraps all the way around
+    cpu = simulators.CPU1d([0x2001, 0x1405, 0xA000, 0x8003])
+    cpu.accelerate_loops = True
+
+    executed, halted = cpu.run(1_000_000)
+
+    assert halted
+    assert executed == 0x10000 * 3 + 1
+    assert cpu.registers.get(0) == Int16(0)
+    assert cpu.registers.get(1) == Int16(0)
+    assert cpu.loop_instructions_skipped > 0x10000 * 3 - 10
+    assert cpu.history.entries()[-4:] == [(0, 0x2001), (1, 0x1405), (2, 0xA000), (3, 0x8003)]
+
+
+@pytest.mark.parametrize("chunks", [[249, 392], [250, 391], [5000]])
+def test_loop_entered_from_another_jump_leaves_ir_exact(chunks: list[int]) -> None:
+    # SUB 0xA3, JUMPNZ 0, JUMPC 0 - the loop at 0 closed by JUMPNZ is also entered from JUMPC
+    program = [0x20A3, 0xA000, 0x9000]
+
+    results: list[tuple[object, ...]] = []
+    for accelerate in (False, True):
+        cpu = simulators.CPU1a(program)
+        cpu.accelerate_loops = accelerate
+        results.append(_run(cpu, chunks))
+
+    assert results[0] == results[1]
+
+
+def test_loop_overwritten_by_code_is_not_reused() -> None:
+    # MOVE 6, SUB 1, JUMPNZ 1, LOAD 0x20, STORE 1, JUMPU 0 - the loop body is replaced by SUB 2 after it exits
+    program = [0x0006, 0x2001, 0xA001, 0x4020, 0x5001, 0x8000]
+    results: list[tuple[object, ...]] = []
+    for accelerate in (False, True):
+        cpu = simulators.CPU1a(program)
+        cpu.memory.set(0x20, Int16(0x2002))
+        cpu.accelerate_loops = accelerate
+        results.append(_run(cpu, [97, 13, 200]))
+
+    assert results[0] == results[1]
+
+
+def test_loops_touching_memory_are_not_accelerated() -> None:
+    # LOAD 0x80, ADD 1, STORE 0x80, JUMPU 0
+    cpu = simulators.CPU1a([0x4080, 0x1001, 0x5080, 0x8000])
+    cpu.accelerate_loops = True
+    cpu.run(400)
+
+    assert cpu.loop_instructions_skipped == 0
+    assert cpu.memory.get(0x80) == Int16(100)
@@ -0,0 +1,143 @@
+import typing as t
+
+import pytest
+
+from cpusim.backend.components import Memory
+from cpusim.common.types import Int16
+
+
+def _hooks(log: list[tuple[str, int]]) -> tuple[t.Callable[[int], Int16], t.Callable[[int, Int16], None]]:
+    def on_read(addr: int) -> Int16:
+        log.append(("r", addr))
+        return Int16(0x42)
+
+    def on_write(addr: int, value: Int16) -> None:
+        log.append(("w", addr))
+
+    return on_read, on_write
+
+
+def test_memmap_coalesces_into_regions() -> None:
+    memory = Memory([], 64)
+    memory.memmap("dev", [3, 1, 2, 10], *_hooks([]))
+
+    assert [(r.start, r.end, r.id) for r in memory.regions] == [(1, 4, "dev"), (10, 11, "dev")]
+    region = memory.region_at(2)
+    assert region is not None and region.id == "dev"
+    assert memory.region_at(4) is None
+    assert memory.is_mapped(10)
+    assert not memory.is_mapped(11)
+
+
+def test_memmap_dispatches_to_hooks() -> None:
+    log: list[tuple[str, int]] = []
+    memory = Memory([], 64)
+    memory.memmap("dev", range(16, 18), *_hooks(log))
+    tracker = memory.track_writes()
+
+    assert memory.get(17) == Int16(0x42)
+    memory.set(16, Int16(5))
+    memory.set(18, Int16(7))
+
+    assert log == [("r", 17), ("w", 16)]
+    assert memory.get(18) == Int16(7)
+    assert tracker == {18}
+
+
+def test_untracked_writes_are_no_longer_recorded() -> None:
+    memory = Memory([], 64)
+    kept, dropped = memory.track_writes(), memory.track_writes()
+    memory.untrack_writes(dropped)
+    memory.set(3, Int16(1))
+
+    assert (kept, dropped) == ({3}, set())
+
+
+def test_memmap_rejects_overlap_and_out_of_bounds() -> None:
+    memory = Memory([], 64)
+    memory.memmap("a", range(8, 12), *_hooks([]))
+
+    with pytest.raises(ValueError):
+        memory.memmap("b", range(11, 14), *_hooks([]))
+    with pytest.raises(ValueError):
+        memory.memmap("b", [64], *_hooks([]))
+    assert [r.id for r in memory.regions] == ["a"]
+
+
+def test_unmemmap_restores_ram() -> None:
+    log: list[tuple[str, int]] = []
+    memory = Memory([0, 0, 0, 9], 64)
+    memory.memmap("a", [2, 3], *_hooks(log))
+    memory.memmap("b", [4], *_hooks(log))
+    memory.unmemmap("a")
+
+    assert memory.get(3) == Int16(9)
+    assert memory.is_mapped(4)
+    assert memory.get(4) == Int16(0x42)
+    assert log == [("r", 4)]
+
+
+def test_out_of_bounds_access() -> None:
+    memory = Memory([], 16)
+    with pytest.raises(ValueError):
+        memory.get(16)
+    with pytest.raises(ValueError):
+        memory.set(16, Int16(0))
+
+
+def test_probe_classifies_accesses() -> None:
+    memory = Memory([0, 7], 64)
+    memory.memmap("pure", [32], *_hooks([]), is_pure_read=lambda _: True)
+    memory.memmap("impure", [33], *_hooks([]))
+
+    probe = memory.begin_probe()
+    memory.get(0)
+    memory.get(32)
+    memory.set(1, Int16(7))
+    assert probe.clean
+
+    memory.get(33)
+    memory.set(1, Int16(8))
+    memory.set(32, Int16(0))
+    assert memory.end_probe() is probe
+    assert (probe.impure_reads, probe.side_effects) == (1, 2)
+    assert memory.get(1) == Int16(8)
+
+
+def test_observers_see_every_access() -> None:
+    log: list[tuple[str, int]] = []
+    observed: list[tuple[int, bool]] = []
+    memory = Memory([], 64)
+
+    def observer(addr: int, write: bool) -> None:
+        observed.append((addr, write))
+
+    def other(addr: int, write: bool) -> None:
+        observed.append((-addr, write))
+
+    memory.observe(observer)
+    memory.observe(other)
+    # mapped while observed, so it has to be kept in the page map that is restored afterwards
+    memory.memmap("dev", [20], *_hooks(log))
+
+    memory.get(3)
+    memory.set(40, Int16(1))
+    memory.unobserve(observer)
+    memory.get(20)
+    memory.unobserve(other)
+    memory.get(4)
+
+    assert observed == [(3, False), (-3, False), (40, True), (-40, True), (-20, False)]
+    assert memory.get(20) == Int16(0x42)
+    assert log == [("r", 20), ("r", 20)]
+
+
+def test_peeking_is_not_observed() -> None:
+    observed: list[tuple[int, bool]] = []
+    memory = Memory([7], 64)
+    memory.observe(lambda addr, write: observed.append((addr, write)))
+    probe = memory.begin_probe()
+
+    assert memory.peek(0) == Int16(7)
+    assert observed == []
+    assert memory.end_probe() is probe and probe.clean
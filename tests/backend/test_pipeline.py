@@ -0,0 +1,105 @@
+import pytest
+
+from cpusim.backend import pipeline
+from cpusim.backend import simulators
+from cpusim.common.instructions import xops
+
+
+def _run(program: list[int], steps: int, *, forwarding: bool = False) -> pipeline.PipelineModel:
+    cpu = simulators.CPU1d(program)
+    model = cpu.pipeline = pipeline.PipelineModel(cpu, forwarding=forwarding)
+    for _ in range(steps):
+        cpu.step()
+    return model
+
+
+def test_independent_instructions_do_not_stall() -> None:
+    # MOVE RA 1, MOVE RB 2, MOVE RC 3, ADD RD 4
+    model = _run([0x0001, 0x0402, 0x0803, 0x1C04], 4)
+
+    assert (model.instructions, model.cycles, model.stall_cycles, model.flush_cycles) == (4, 7, 0, 0)
+
+
+@pytest.mark.parametrize(("forwarding", "stalls"), [(False, {1: 1}), (True, {})])
+def test_register_read_after_write(forwarding: bool, stalls: dict[int, int]) -> None:
+    # MOVE RA 1, ADD RB RA, MOVE RC 3, ADD RD RB
+    model = _run([0x0001, 0xF406, 0x0803, 0xFD06], 4, forwarding=forwarding)
+
+    # ADD RD RB is two instructions behind ADD RB RA, so its operand is already written back
+    assert model.stalls == stalls
+    assert model.cycles == 7 + sum(stalls.values())
+
+
+@pytest.mark.parametrize("forwarding", [False, True])
+def test_load_use_stalls_even_with_forwarding(forwarding: bool) -> None:
+    # LOAD RA 0x40, ADD RB RA
+    model = _run([0x4040, 0xF406], 2, forwarding=forwarding)
+
+    assert model.stalls == {1: 1}
+
+
+def test_indirect_address_register_is_read() -> None:
+    # MOVE RB 0x40, LOAD RA (RB)
+    model = _run([0x0440, 0xF102], 2)
+
+    assert model.stalls == {1: 1}
+
+
+def test_flag_hazard_and_taken_jump_flushes() -> None:
+    # MOVE RB 3, SUB RB 1, JUMPNZ 1, JUMPU 3
+    cpu = simulators.CPU1d([0x0403, 0x2401, 0xA001, 0x8003])
+    model = cpu.pipeline = pipeline.PipelineModel(cpu)
+
+    assert cpu.run(100) == (8, True)
+
+    # SUB waits once for the MOVE, and each JUMPNZ for the flags of the SUB before it
+    assert model.stalls == {1: 1, 2: 3}
+    # the JUMPNZ is taken twice, then falls through to the JUMPU
+    assert model.flushes == {2: 4, 3: 2}
+    assert (model.stall_cycles, model.flush_cycles) == (4, 6)
+    # 8 instructions filling the pipeline, the stalls and the two flushes before the last instruction
+    assert model.cycles == 8 + 3 + 4 + 4
+
+
+def test_xop_operands_come_from_its_definition() -> None:
+    # MOVE RA 1, BUMP RC, MOVE RD 1, JUMPZ 0
+    cpu = simulators.CPU1d([0x0001, 0xF80D, 0x0C01, 0x9000])
+    cpu.register_xop(3, xops.XopDefinition("bump", lambda args, cpu: None, reads={"ra"}, writes={"r1"}, flags=True))
+    model = cpu.pipeline = pipeline.PipelineModel(cpu)
+
+    for _ in range(4):
+        cpu.step()
+
+    # the XOP reads RA straight after it is written, and JUMPZ reads the flags two instructions after the XOP
+    assert model.stalls == {1: 1}
+    assert model.flushes == {}
+
+
+def test_registering_an_xop_forgets_decoded_operands() -> None:
+    # MOVE RB 1, XOP3 RA RB
+    cpu = simulators.CPU1d([0x0401, 0xF10D])
+    model = cpu.pipeline = pipeline.PipelineModel(cpu)
+    model.issue(1, 0xF10D, False, False)
+    assert model.stalls == {}
+
+    cpu.register_xop(3, xops.XopDefinition("mul", lambda args, cpu: None, reads={"r1", "r2"}, writes={"r1"}))
+    cpu.step()
+    cpu.step()
+
+    assert model.stalls == {1: 1}
+
+
+@pytest.mark.parametrize("engine", ["predecode", "jit", "accelerate_loops", "fast_forward_idle"])
+def test_architectural_results_are_unchanged(engine: str) -> None:
+    # MOVE RB 50, ADD RA 3, SUB RB 1, JUMPNZ 1, STORE RA 0x40, JUMPU 5
+    program = [0x0432, 0x1003, 0x2401, 0xA001, 0x5040, 0x8005]
+    reference = simulators.CPU1d(program)
+    setattr(reference, engine, True)
+    expected = reference.run(1000), reference.architectural_state(), reference.memory.get(0x40)
+
+    cpu = simulators.CPU1d(program)
+    setattr(cpu, engine, True)
+    model = cpu.pipeline = pipeline.PipelineModel(cpu)
+
+    assert (cpu.run(1000), cpu.architectural_state(), cpu.memory.get(0x40)) == expected
+    assert model.instructions == 153
@@ -0,0 +1,170 @@
+import random
+
+import pytest
+
+from cpusim.backend import predecode
+from cpusim.backend import simulators
+from cpusim.common.instructions.v1a import primary as primary_1a
+from cpusim.common.instructions.v1d import primary as primary_1d
+from cpusim.common.instructions.v1d import secondary as secondary_1d
+from cpusim.common.types import Int16
+
+
+def _random_program_1a(rng: random.Random) -> list[int]:
+    # arithmetic, memory access into a small data area (and sometimes into the code) and forward/backward jumps
+    program: list[int] = []
+    for _ in range(24):
+        opcode = rng.choice([0x0, 0x1, 0x2, 0x3, 0x4, 0x4, 0x5, 0x6, 0x6, 0x7, 0x8, 0x9, 0xA, 0xA])
+        if opcode in (0x8, 0x9, 0xA):
+            operand = rng.randrange(25)
+        elif opcode in (0x4, 0x5, 0x6, 0x7):
+            operand = rng.choice([0x40, 0x41, 0x42, rng.randrange(24)])
+        else:
+            operand = rng.randrange(0x100)
+        program.append((opcode << 12) | operand)
+    program.append(0x8000 | len(program))
+    return program
+
+
+def _run(cpu: simulators.CPU[object], chunks: list[int]) -> tuple[object, ...]:
+    total, halted = 0, False
+    for chunk in chunks:
+        executed, halted = cpu.run(chunk)
+        total += executed
+        if halted:
+            break
+    memory = [cpu.memory.get(address).unsigned_value for address in range(cpu.memory.size)]
+    return total, halted, cpu.ir.value, cpu.architectural_state(), cpu.history.entries(), memory
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_predecoded_run_matches_interpreter(seed: int) -> None:
+    rng = random.Random(seed)
+    program = _random_program_1a(rng)
+    chunks = [rng.randrange(1, 300) for _ in range(6)]
+    data = rng.randrange(0x100)
+
+    results: list[tuple[object, ...]] = []
+    for enabled in (False, True):
+        cpu = simulators.CPU1a(program)
+        cpu.memory.set(0x40, Int16(data))
+        cpu.predecode = enabled
+        results.append(_run(cpu, chunks))
+
+    assert results[0] == results[1]
+
+
+def test_read_modify_write_is_fused() -> None:
+    # LOAD 0x80, ADDM 0x81, STORE 0x80, JUMPU 0
+    cpu = simulators.CPU1d([0x4080, 0x6081, 0x5080, 0x8000])
+    cpu.memory.set(0x81, Int16(3))
+    cpu.predecode = True
+
+    cpu.run(400)
+
+    assert cpu.memory.get(0x80) == Int16(300)
+    assert cpu.decoded_program.instructions == 400
+    assert cpu.decoded_program.dispatches == 200
+    assert cpu.decoded_program.dispatch_reduction == 0.5
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_fused_arithmetic_matches_interpreter_1d(seed: int) -> None:
+    # runs of immediate and register-mode arithmetic closed by conditional jumps, so most flag writes are dead
+    rng = random.Random(seed)
+    program: list[int] = []
+    for _ in range(20):
+        reg, src = rng.randrange(4) << 10, rng.randrange(4) << 8
+        if rng.random() < 0.15:
+            program.append((rng.choice([0x9, 0xA, 0xB]) << 12) | rng.randrange(21))
+        elif rng.random() < 0.5:
+            program.append((rng.choice([0x0, 0x1, 0x2, 0x3, 0xD]) << 12) | reg | rng.randrange(0x100))
+        else:
+            program.append(0xF000 | reg | src | rng.choice([0x1, 0x4, 0x5, 0x6, 0x7, 0x8, 0x9, 0xA, 0xB]))
+    program.append(0x8000)
+
+    results: list[tuple[object, ...]] = []
+    for enabled in (False, True):
+        cpu = simulators.CPU1d(program)
+        cpu.predecode = enabled
+        results.append(_run(cpu, [777, 1000]))
+
+    assert results[0] == results[1]
+
+
+def test_dead_flags_inside_superinstruction_are_not_computed() -> None:
+    # ADD RA 1, SUB RB 1, JUMPNZ 0 - only the sub's flags can be observed
+    cpu = simulators.CPU1d([0x1001, 0x2401, 0xA000])
+    cpu.predecode = True
+    cpu.run(3)
+
+    entry = cpu.decoded_program._entries[0][0]  # pyright: ignore[reportPrivateUsage]
+    assert entry is not None
+    assert (
+        [member.execute for member in entry]
+        == [
+            predecode._FLAG_FREE[primary_1d.Add],  # pyright: ignore[reportPrivateUsage]
+            *(member.execute for member in entry[1:]),
+        ]
+    )
+    assert entry[1].execute != predecode._FLAG_FREE[primary_1d.Sub]  # pyright: ignore[reportPrivateUsage]
+
+
+def test_fused_jump_still_detects_halt_loop() -> None:
+    # ADD 0, JUMPZ 1 - the add sets the zero flag, so the jump is a halt loop
+    cpu = simulators.CPU1a([0x1000, 0x9001])
+    cpu.predecode = True
+
+    assert cpu.run(100) == (2, True)
+    assert cpu.pc.value == 1
+
+
+def test_overwritten_instruction_is_redecoded() -> None:
+    # ADD 1, STORE 0, JUMPU 0 - the first store turns the add into MOVE 1
+    program = [0x1001, 0x5000, 0x8000]
+    results: list[tuple[object, ...]] = []
+    for enabled in (False, True):
+        cpu = simulators.CPU1a(program)
+        cpu.predecode = enabled
+        results.append(_run(cpu, [50]))
+
+    assert results[0] == results[1]
+    assert cpu.acc.value == 1
+
+
+def test_raising_fused_member_leaves_the_same_state_as_step() -> None:
+    # ADD RA 1, RET (not implemented), ADD RA 1 - fused into one superinstruction
+    program = [0x1001, 0xF000, 0x1001]
+    stepped = simulators.CPU1d(program)
+    stepped.step()
+    with pytest.raises(NotImplementedError):
+        stepped.step()
+
+    cpu = simulators.CPU1d(program)
+    cpu.decoded_program = predecode.DecodedProgram(cpu, frozenset({(primary_1d.Add, secondary_1d.Ret, primary_1d.Add)}))
+    cpu.predecode = True
+    with pytest.raises(NotImplementedError):
+        cpu.run(10)
+
+    assert cpu.decoded_program.dispatches == 1
+    assert cpu.decoded_program.instructions == 2
+    assert cpu.ir.value == stepped.ir.value == 0xF000
+    assert cpu.history.entries() == stepped.history.entries()
+    assert cpu.architectural_state() == stepped.architectural_state()
+
+
+def test_learn_fusions_from_trace() -> None:
+    # LOAD 0x80, ADDM 0x81, STORE 0x80, JUMPU 0
+    cpu = simulators.CPU1a([0x4080, 0x6081, 0x5080, 0x8000])
+    cpu.run(40)
+
+    fusions = predecode.learn_fusions(cpu, [pc for pc, _ in cpu.history.entries()])
+
+    assert (primary_1a.Load, primary_1a.AddM, primary_1a.Store) in fusions
+    # a store can only end a fused sequence
+    assert (primary_1a.Store, primary_1a.JumpU) not in fusions
+
+    cpu.decoded_program = predecode.DecodedProgram(cpu, fusions)
+    cpu.predecode = True
+    cpu.run(40)
+    assert cpu.decoded_program.dispatches < 40
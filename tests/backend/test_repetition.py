@@ -0,0 +1,58 @@
+from cpusim.backend import repetition
+from cpusim.backend import simulators
+from cpusim.backend.peripherals import gpio
+from cpusim.backend.peripherals import replay
+from cpusim.common.types import Int16
+
+
+def test_detects_loop_that_static_analysis_cannot() -> None:
+    # MOVE 1, SUB 1, ADD 1, JUMPNZ 1 - the accumulator alternates but the loop never ends
+    cpu = simulators.CPU1a([0x0001, 0x2001, 0x1001, 0xA001])
+    cpu.repetition = repetition.RepetitionDetector(cpu, interval=10)
+
+    executed, halted = cpu.run(100_000)
+
+    assert halted
+    assert executed < 1000
+    assert cpu.repetition.period is not None
+    assert cpu.repetition.period % 3 == 0
+
+
+def test_loop_that_keeps_changing_memory_is_not_reported() -> None:
+    # LOAD 0x80, ADD 1, STORE 0x80, JUMPU 0 - counts in RAM, wrapping every 256 iterations
+    cpu = simulators.CPU1a([0x4080, 0x1001, 0x5080, 0x8000])
+    cpu.repetition = repetition.RepetitionDetector(cpu, interval=8)
+
+    executed, halted = cpu.run(500)
+    assert (executed, halted) == (500, False)
+
+    # the counter is 8 bits wide, so the memory state really does repeat after 256 iterations
+    _, halted = cpu.run(10_000)
+    assert halted
+    assert cpu.repetition.period == 1024
+
+
+def test_memory_hash_tracks_writes() -> None:
+    cpu = simulators.CPU1a([0x8000])
+    detector = repetition.RepetitionDetector(cpu)
+    detector.check()
+    initial = detector._memory_hash
+
+    cpu.memory.set(5, Int16(3))
+    detector.check()
+    assert detector._memory_hash != initial
+
+    cpu.memory.set(5, Int16(0))
+    detector.check()
+    assert detector._memory_hash == initial
+
+
+def test_open_system_is_never_reported() -> None:
+    # LOAD 0xFC, JUMPU 0 - polling a replayed input may see a different value at any time
+    cpu = simulators.CPU1a([0x40FC, 0x8000])
+    cpu.gpio = gpio.GPIO(cpu)
+    cpu.gpio.set_device(0, gpio.BugTrap())
+    replay.InputRecorder(cpu, cpu.gpio)
+    cpu.repetition = repetition.RepetitionDetector(cpu, interval=5)
+
+    assert cpu.run(1000) == (1000, False)
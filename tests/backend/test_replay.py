@@ -0,0 +1,62 @@
+import pytest
+
+from cpusim.backend import simulators
+from cpusim.backend.peripherals import gpio
+from cpusim.backend.peripherals import replay
+from cpusim.backend.peripherals import stimulus
+
+# LOAD 0xFC, STORE 0x80, JUMPU 0 - polls the bug trap inputs into RAM
+PROGRAM = [0x40FC, 0x5080, 0x8000]
+
+
+def _record(steps: int) -> tuple[bytes, simulators.CPU1a]:
+    cpu = simulators.CPU1a(PROGRAM)
+    cpu.gpio = gpio.GPIO(cpu)
+    cpu.gpio.set_device(0, gpio.BugTrap())
+    stimulus.schedule_stimulus(
+        cpu, stimulus.parse_stimulus("10 bugtrap.fire_button_pressed 1\n400 bugtrap.sensor_2_triggered 1")
+    )
+    recorder = replay.InputRecorder(cpu, cpu.gpio)
+
+    cpu.run(steps)
+    assert recorder.count == steps // 3
+    return recorder.to_bytes(), cpu
+
+
+def test_replay_reproduces_recorded_run() -> None:
+    log, recorded = _record(600)
+
+    cpu = simulators.CPU1a(PROGRAM)
+    replayer = replay.InputReplayer(cpu, log)
+    cpu.run(600)
+
+    assert replayer.remaining == 0
+    assert cpu.memory.get(0x80) == recorded.memory.get(0x80)
+    assert cpu.memory.get(0x80).unsigned_value == 0b101
+
+
+def test_replay_detects_divergence() -> None:
+    log, _ = _record(30)
+
+    # an extra instruction before the loop shifts every read by one instruction
+    cpu = simulators.CPU1a([0x0000, 0x40FC, 0x5080, 0x8001])
+    replay.InputReplayer(cpu, log)
+
+    with pytest.raises(replay.ReplayError, match="diverged"):
+        cpu.run(30)
+
+
+def test_replay_detects_reading_past_end_of_log() -> None:
+    log, _ = _record(30)
+
+    cpu = simulators.CPU1a(PROGRAM)
+    replay.InputReplayer(cpu, log)
+
+    with pytest.raises(replay.ReplayError, match="end of the replay log"):
+        cpu.run(60)
+
+
+@pytest.mark.parametrize("data", [b"", b"nope\x01\x00\xfc\x00\x02", b"CPSR\x01\x00\xfc\x00\x02\x05\x00"])
+def test_replay_rejects_bad_logs(data: bytes) -> None:
+    with pytest.raises(replay.ReplayError):
+        replay.InputReplayer(simulators.CPU1a(PROGRAM), data)
@@ -0,0 +1,124 @@
+import pytest
+
+from cpusim.backend import components
+from cpusim.backend import simulators
+from cpusim.backend.peripherals import gpio
+from cpusim.backend.peripherals import timer
+from cpusim.common.types import Int16
+
+
+def test_events_fire_in_due_order() -> None:
+    scheduler = components.EventScheduler()
+    fired: list[tuple[str, int]] = []
+    scheduler.schedule(5, lambda c: fired.append(("b", c)))
+    scheduler.schedule(2, lambda c: fired.append(("a", c)))
+    scheduler.schedule(5, lambda c: fired.append(("c", c)))
+
+    scheduler.advance(4)
+    assert fired == [("a", 2)]
+    scheduler.advance(1)
+    assert fired == [("a", 2), ("b", 5), ("c", 5)]
+    assert scheduler.cycle == 5
+    assert len(scheduler) == 0
+
+
+def test_cancelled_events_do_not_fire() -> None:
+    scheduler = components.EventScheduler()
+    fired: list[int] = []
+    handle = scheduler.schedule(3, fired.append)
+    scheduler.schedule(10, fired.append)
+
+    scheduler.cancel(handle)
+    assert scheduler.next_due == 10
+
+    scheduler.advance(10)
+    assert fired == [10]
+
+
+def test_cannot_schedule_in_the_past() -> None:
+    scheduler = components.EventScheduler()
+    scheduler.advance(5)
+
+    with pytest.raises(ValueError):
+        scheduler.schedule_at(5, lambda _: None)
+
+
+def test_cpu_run_advances_clock_and_fires_events() -> None:
+    cpu = simulators.CPU1a([0x8000])  # JUMPU 0
+    fired: list[int] = []
+    cpu.scheduler.schedule(7, fired.append)
+
+    executed, halted = cpu.run(20, detect_halt_loop=False)
+
+    assert (executed, halted) == (20, False)
+    assert cpu.scheduler.cycle == 20
+    assert fired == [7]
+
+
+def test_step_advances_clock() -> None:
+    cpu = simulators.CPU1a([0x8001, 0x8000])  # JUMPU 1, JUMPU 0
+    cpu.step()
+    cpu.step(detect_halt_loop=False)
+
+    assert cpu.scheduler.cycle == 2
+
+
+def test_timer_counts_expirations() -> None:
+    cpu = simulators.CPU1a([0x8000])  # JUMPU 0
+    cpu.gpio = gpio.GPIO(cpu, gpio.GPIOConfig(1, 0xFC))
+    cpu.gpio.set_device(0, timer.Timer(cpu.scheduler))
+
+    cpu.memory.set(0xFC, Int16(10))
+    cpu.run(35, detect_halt_loop=False)
+
+    assert cpu.memory.get(0xFD).unsigned_value == 3
+    assert cpu.memory.get(0xFC).unsigned_value == 5
+
+    cpu.memory.set(0xFD, Int16(0))
+    cpu.memory.set(0xFC, Int16(0))
+    cpu.run(50, detect_halt_loop=False)
+
+    assert cpu.memory.get(0xFD).unsigned_value == 0
+    assert len(cpu.scheduler) == 0
+
+
+# 0: MOVE 100, 1: STORE 0xFC, 2-6: ADD 0, 7: LOAD 0xFC, 8: STORE 0x80 <- the cycles left on the timer
+# 9: MOVE 3, 10: STORE 0xFC, 11-20: ADD 0, 21: LOAD 0xFD, 22: STORE 0x81 <- its expirations, 23: JUMPU 23
+TIMER_PROGRAM = [0x0064, 0x50FC, *[0x1000] * 5, 0x40FC, 0x5080, 0x0003, 0x50FC, *[0x1000] * 10, 0x40FD, 0x5081, 0x8017]
+
+
+def _timed_cpu() -> simulators.CPU1a:
+    cpu = simulators.CPU1a(TIMER_PROGRAM)
+    cpu.gpio = gpio.GPIO(cpu, gpio.GPIOConfig(1, 0xFC))
+    cpu.gpio.set_device(0, timer.Timer(cpu.scheduler))
+    return cpu
+
+
+@pytest.mark.parametrize("engine", [None, "predecode", "jit", "accelerate_loops", "fast_forward_idle"])
+def test_timer_sees_the_same_clock_stepped_or_run(engine: str | None) -> None:
+    stepped = _timed_cpu()
+    while not stepped.step():
+        pass
+
+    run = _timed_cpu()
+    if engine is not None:
+        setattr(run, engine, True)
+    run.run(40)
+
+    assert stepped.memory.get(0x80).unsigned_value == 100 - 6
+    assert stepped.memory.get(0x81).unsigned_value == 3
+    for address in (0x80, 0x81):
+        assert run.memory.get(address) == stepped.memory.get(address)
+    assert run.scheduler.cycle == stepped.scheduler.cycle
+
+
+def test_devices_see_the_cycle_of_the_instruction_accessing_them() -> None:
+    cpu = _timed_cpu()
+    assert cpu.gpio is not None
+    cycles: list[int] = []
+    cpu.gpio.add_write_listener(lambda device: cycles.append(cpu.scheduler.now))
+
+    cpu.run(40)
+
+    # the timer is started by the instructions at 1 and 10
+    assert cycles == [1, 10]
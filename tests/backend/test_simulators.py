@@ -17,6 +17,7 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
+from cpusim.backend import components
 from cpusim.backend import simulators
 
 
@@ -32,3 +33,30 @@ def test_auto_halt_does_not_halt_when_no_catch() -> None:
 
     halted = cpu.step()
     assert halted is False
+
+
+def test_history_records_executed_instructions() -> None:
+    cpu = simulators.CPU1a([0x0005, 0x1001, 0x8002])  # MOVE 5, ADD 1, JUMPU 2
+
+    while not cpu.step():
+        pass
+
+    assert cpu.history.entries() == [(0, 0x0005), (1, 0x1001), (2, 0x8002)]
+
+
+def test_history_only_keeps_most_recent_entries() -> None:
+    cpu = simulators.CPU1a([0x1001] * 10)
+    cpu.history = components.InstructionHistory(4)
+
+    for _ in range(10):
+        cpu.step()
+
+    assert [pc for pc, _ in cpu.history.entries()] == [6, 7, 8, 9]
+    assert cpu.history.total == 10
+
+
+def test_disassemble_unknown_opcode() -> None:
+    cpu = simulators.CPU1a()
+
+    assert cpu.disassemble(0x1001) == "add 0x1"
+    assert cpu.disassemble(0xF000) == "????"
@@ -0,0 +1,65 @@
+import pytest
+
+from cpusim.backend import simulators
+from cpusim.backend.peripherals import gpio
+from cpusim.backend.peripherals import stimulus
+
+
+def _bug_trap_cpu() -> simulators.CPU1a:
+    # LOAD 0xFC, STORE 0xFC, JUMPU 0 - copies the bug trap inputs straight to its outputs
+    cpu = simulators.CPU1a([0x40FC, 0x50FC, 0x8000])
+    cpu.gpio = gpio.GPIO(cpu)
+    cpu.gpio.set_device(0, gpio.BugTrap())
+    return cpu
+
+
+def test_parse_stimulus() -> None:
+    stimuli = stimulus.parse_stimulus(
+        "# comment\n20 bugtrap.sensor_1_triggered on\n\n5 bugtrap.fire_button_pressed 1  # trailing\n"
+    )
+
+    assert stimuli == [
+        stimulus.Stimulus(5, "bugtrap", "fire_button_pressed", True),
+        stimulus.Stimulus(20, "bugtrap", "sensor_1_triggered", True),
+    ]
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "5 bugtrap.sensor_1_triggered",
+        "x bugtrap.led_on 1",
+        "5 foo.bar 1",
+        "5 bugtrap.led_on 1",
+        "5 bugtrap.sensor_1_triggered 2",
+    ],
+)
+def test_parse_stimulus_rejects_bad_lines(line: str) -> None:
+    with pytest.raises(stimulus.StimulusError, match="line 1"):
+        stimulus.parse_stimulus(line)
+
+
+def test_schedule_stimulus_requires_device() -> None:
+    cpu = simulators.CPU1a([0x8000])
+
+    with pytest.raises(stimulus.StimulusError):
+        stimulus.schedule_stimulus(cpu, [stimulus.Stimulus(5, "bugtrap", "fire_button_pressed", True)])
+
+
+def test_stimulus_applied_at_exact_cycle_and_outputs_recorded() -> None:
+    cpu = _bug_trap_cpu()
+    stimulus.schedule_stimulus(
+        cpu, stimulus.parse_stimulus("10 bugtrap.fire_button_pressed 1\n30 bugtrap.fire_button_pressed 0")
+    )
+    recorder = stimulus.OutputRecorder(cpu)
+
+    cpu.run(100)
+
+    # the input changes after instruction 10, is loaded by instruction 13 and stored by instruction 14
+    assert recorder.changes == [
+        (0, "bugtrap", "trap_closed", False),
+        (0, "bugtrap", "led_on", False),
+        (14, "bugtrap", "trap_closed", True),
+        (32, "bugtrap", "trap_closed", False),
+    ]
+    assert recorder.format().splitlines()[2] == "14 bugtrap.trap_closed 1"
@@ -0,0 +1,125 @@
+import pytest
+
+from cpusim.backend import simulators
+from cpusim.backend import timing
+from cpusim.backend.peripherals import gpio
+from cpusim.common.instructions import base
+from cpusim.common.instructions import xops
+
+
+def _cycles_per_step(cpu: simulators.CPU1a | simulators.CPU1d, steps: int) -> list[int]:
+    out: list[int] = []
+    for _ in range(steps):
+        before = cpu.cycles
+        cpu.step()
+        out.append(cpu.cycles - before)
+    return out
+
+
+def test_default_costs_by_instruction_class() -> None:
+    # MOVE 1, ADD 1, STORE 0x20, LOAD 0x20, ADDM 0x20, JUMPU 0
+    cpu = simulators.CPU1a([0x0001, 0x1001, 0x5020, 0x4020, 0x6020, 0x8000])
+    cpu.timing = timing.CycleCosts()
+
+    assert _cycles_per_step(cpu, 6) == [3, 3, 4, 4, 4, 3]
+    assert cpu.cycles == 21
+
+
+def test_addressing_mode_and_memory_costs() -> None:
+    # MOVE RB 0x20, LOAD RA (RB), ADD RA RB
+    cpu = simulators.CPU1d([0x0420, 0xF102, 0xF106])
+    cpu.timing = timing.CycleCosts(
+        {"alu": 2}, {base.AddressingMode.REGISTER_INDIRECT: 2, base.AddressingMode.IMMEDIATE: 1}, memory=5
+    )
+
+    assert _cycles_per_step(cpu, 3) == [4, 10, 2]
+
+
+def test_mmio_accesses_cost_extra() -> None:
+    # LOAD 0xFC, LOAD 0x20
+    cpu = simulators.CPU1a([0x40FC, 0x4020])
+    cpu.gpio = gpio.GPIO(cpu, gpio.GPIOConfig(2, 0xFC))
+    cpu.gpio.set_device(0, gpio.BugTrap())
+    cpu.timing = timing.CycleCosts(mmio=10)
+
+    assert _cycles_per_step(cpu, 2) == [14, 4]
+
+
+def test_xop_takes_the_cycles_of_its_definition() -> None:
+    cpu = simulators.CPU1d([0xF10D])
+    cpu.timing = timing.CycleCosts()
+    cpu.register_xop(3, xops.XopDefinition("nop", lambda args, cpu: None, cycles=17))
+
+    assert _cycles_per_step(cpu, 1) == [17]
+
+
+@pytest.mark.parametrize("engine", ["predecode", "jit", "accelerate_loops", "fast_forward_idle"])
+def test_cycles_are_counted_whatever_the_engine(engine: str) -> None:
+    # MOVE RB 50, ADD RA 3, SUB RB 1, JUMPNZ 1, STORE RA 0x40, JUMPU 5
+    program = [0x0432, 0x1003, 0x2401, 0xA001, 0x5040, 0x8005]
+    results: list[tuple[object, ...]] = []
+    for enabled in (False, True):
+        cpu = simulators.CPU1d(program)
+        cpu.timing = timing.CycleCosts()
+        setattr(cpu, engine, enabled)
+        executed, halted = cpu.run(1000)
+        results.append((executed, halted, cpu.cycles, cpu.architectural_state()))
+
+    assert results[0] == results[1]
+    assert results[0][:3] == (153, True, 153 * 3 + 1)
+
+
+def test_breakpoints_stop_a_timed_run() -> None:
+    # ADD RA 1, ADD RB 1, JUMPU 0
+    cpu = simulators.CPU1d([0x1001, 0x1401, 0x8000])
+    cpu.timing = timing.CycleCosts()
+    cpu.breakpoints = {2}
+
+    assert cpu.run(100) == (2, False)
+    assert cpu.cycles == 6
+
+
+def test_parse_cost_file() -> None:
+    costs = timing.CycleCosts.parse('{"classes": {"jump": 4}, "modes": {"register_indirect": 1}, "mmio": 10}')
+
+    assert costs.classes == {"move": 3, "alu": 3, "load": 3, "store": 3, "jump": 4}
+    assert costs.modes[base.AddressingMode.REGISTER_INDIRECT] == 1
+    assert (costs.memory, costs.mmio) == (1, 10)
+
+
+@pytest.mark.parametrize(
+    "contents",
+    [
+        "[1, 2]",
+        "{",
+        '{"cycles": 1}',
+        '{"classes": {"mul": 1}}',
+        '{"modes": {"indirect": 1}}',
+        '{"memory": -1}',
+        '{"mmio": 1.5}',
+        '{"classes": {"alu": true}}',
+    ],
+)
+def test_malformed_cost_file_is_rejected(contents: str) -> None:
+    with pytest.raises(timing.TimingError):
+        timing.CycleCosts.parse(contents)
+
+
+def test_loop_timings() -> None:
+    # 0: MOVE RB 10
+    # 1: SUB RB 1      <- outer loop
+    # 2: JUMPZ 5
+    # 3: LOAD RA 0x40  <- one path through the loop
+    # 4: JUMPU 1
+    # 5: MOVE RC 4     <- the other, with an inner loop
+    # 6: SUB RC 1
+    # 7: JUMPNZ 6
+    # 8: JUMPU 1
+    cpu = simulators.CPU1d([0x040A, 0x2401, 0x9005, 0x4040, 0x8001, 0x0804, 0x2801, 0xA006, 0x8001])
+
+    loop_timings = timing.loop_timings(cpu, timing.CycleCosts())
+
+    assert loop_timings == [
+        timing.LoopTiming(1, 3 + 3 + 4 + 3, 3 + 3 + 3 + 3 + 3 + 3, True),
+        timing.LoopTiming(6, 6, 6, False),
+    ]
@@ -0,0 +1,165 @@
+import random
+
+import pytest
+
+from cpusim.backend import simulators
+from cpusim.common.instructions import xops
+from cpusim.common.types import Int16
+from cpusim.frontend.cli.interactive import runner
+
+
+def _mul(args: tuple[int, ...], cpu: simulators.CPU1d) -> None:
+    product = cpu.registers.get(args[0]).unsigned_value * cpu.registers.get(args[1]).unsigned_value
+    cpu.registers.set(args[0], Int16(product & 0xFFFF))
+
+
+def _mul_cpu(program: list[int]) -> simulators.CPU1d:
+    cpu = simulators.CPU1d(program)
+    cpu.register_xop(3, xops.XopDefinition("mul", _mul, reads={"r1", "r2"}, writes={"r1"}, cycles=4))
+    return cpu
+
+
+def _run(cpu: simulators.CPU1d, chunks: list[int]) -> tuple[object, ...]:
+    total, halted = 0, False
+    for chunk in chunks:
+        executed, halted = cpu.run(chunk)
+        total += executed
+        if halted:
+            break
+    memory = [cpu.memory.get(0x40 + i) for i in range(4)]
+    return total, halted, cpu.architectural_state(), cpu.history.entries(), cpu.history.total, memory
+
+
+def test_multiply_loop_replaced_by_xop() -> None:
+    # MOVE RB 123, MOVE RC 100, MOVE RA 0, ADD RA RB, SUB RC 1, JUMPNZ 3, JUMPU 6
+    loop = simulators.CPU1d([0x047B, 0x0864, 0x0000, 0xF106, 0x2801, 0xA003, 0x8006])
+    # MOVE RA 123, MOVE RB 100, MUL RA RB, JUMPU 3
+    xop = _mul_cpu([0x007B, 0x0464, 0xF10D, 0x8003])
+
+    loop_executed, loop_halted = loop.run(10_000)
+    xop_executed, xop_halted = xop.run(10_000)
+
+    assert loop_halted and xop_halted
+    assert loop.registers.get(0) == xop.registers.get(0) == Int16(123 * 100)
+    assert (loop_executed, xop_executed) == (304, 4)
+
+
+def test_reregistering_does_not_leave_write_trackers_behind() -> None:
+    cpu = _mul_cpu([0x007B, 0x0464, 0xF10D, 0x8003])
+    cpu.predecode = cpu.jit = cpu.accelerate_loops = True
+    cpu.run(10)
+    trackers = len(cpu.memory._write_trackers)
+
+    for _ in range(5):
+        cpu.register_xop(1, xops.XopDefinition("nop", lambda args, cpu: None))
+        cpu.pc.set(0)
+        cpu.run(10)
+
+    assert len(cpu.memory._write_trackers) == trackers
+
+
+def test_xop_is_disassembled_by_name() -> None:
+    cpu = simulators.CPU1d([0xF10D])
+    assert cpu.disassemble(0xF10D) == "xop3 RA RB"
+
+    cpu.register_xop(3, xops.XopDefinition("mul", _mul, reads={"r1", "r2"}, writes={"r1"}))
+    cpu.register_xop(1, xops.XopDefinition("bump", lambda args, cpu: None, writes={"r1"}))
+
+    assert cpu.disassemble(0xF10D) == "mul RA RB"
+    assert cpu.disassemble(0xE805) == "bump RC 0x5"
+    debugger = runner.CPU1dInteractiveDebugger(cpu)
+    assert debugger.execute_command("disassemble 0") == "Instruction at address 0x0:\n    mul RA RB"
+
+
+def test_unbound_xop_still_traps() -> None:
+    cpu = _mul_cpu([0xF10F])
+
+    with pytest.raises(NotImplementedError):
+        cpu.step()
+
+
+@pytest.mark.parametrize(
+    ("slot", "definition"), [(6, xops.XopDefinition("mul", _mul)), (1, xops.XopDefinition("mul", _mul, reads={"r2"}))]
+)
+def test_invalid_registration_is_rejected(slot: int, definition: xops.XopDefinition) -> None:
+    with pytest.raises(ValueError):
+        simulators.CPU1d().register_xop(slot, definition)
+
+
+def test_invalid_definition_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        xops.XopDefinition("mul", _mul, reads={"re"})
+    with pytest.raises(ValueError):
+        xops.XopDefinition("two words", _mul)
+
+
+def _checksum(args: tuple[int, ...], cpu: simulators.CPU1d) -> None:
+    # RA += (R2) + (R2 + 1), setting the flags from the sum
+    address = cpu.registers.get(args[1]).unsigned_value
+    total = cpu.alu.add(cpu.memory.get(address), cpu.memory.get(address + 1))
+    cpu.registers.set(0, cpu.alu.add(cpu.registers.get(0), total))
+
+
+def _scatter(args: tuple[int, ...], cpu: simulators.CPU1d) -> None:
+    # (R2) = R1
+    cpu.memory.set(cpu.registers.get(args[1]).unsigned_value, cpu.registers.get(args[0]))
+
+
+_DEFINITIONS = {
+    3: xops.XopDefinition("mul", _mul, reads={"r1", "r2"}, writes={"r1"}),
+    2: xops.XopDefinition("csum", _checksum, reads={"ra", "r2"}, writes={"ra"}, reads_memory=True, flags=True),
+    4: xops.XopDefinition("scatter", _scatter, reads={"r1", "r2"}, writes_memory=True),
+}
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("engine", ["jit", "predecode"])
+def test_engines_run_xops_like_the_interpreter(engine: str, seed: int) -> None:
+    rng = random.Random(seed)
+    # MOVE RD 0x40, then a loop of register arithmetic and XOPs closed by JUMPNZ on the flags of the last ADD
+    body = [0xF000 | (rng.randrange(3) << 10) | (rng.randrange(3) << 8) | rng.choice([0x6, 0x7, 0xA]) for _ in range(3)]
+    for _ in range(rng.randrange(1, 4)):
+        reg = rng.randrange(3)
+        body.insert(rng.randrange(len(body) + 1), rng.choice([0xF30D, 0xF30E | (reg << 10), 0xF00C | (3 << 8)]))
+    program = [0x0C40, *body, 0x1001, 0xA001, 0x8000 | (len(body) + 3)]
+    chunks = [rng.randrange(1, 600) for _ in range(6)]
+
+    results: list[tuple[object, ...]] = []
+    for enabled in (False, True):
+        cpu = simulators.CPU1d(program)
+        for slot, definition in _DEFINITIONS.items():
+            cpu.register_xop(slot, definition)
+        if engine == "jit":
+            cpu.jit = enabled
+        else:
+            cpu.predecode = enabled
+        results.append(_run(cpu, chunks))
+
+    assert results[0] == results[1]
+
+
+def test_register_only_xop_is_inlined_into_trace() -> None:
+    # MOVE RA 1, ADD RB 1, MUL RA RB, JUMPU 1
+    program = [0x0001, 0x1401, 0xF10D, 0x8001]
+    cpu = _mul_cpu(program)
+    cpu.jit = True
+
+    cpu.run(3000)
+
+    assert 1 in cpu.trace_jit.traces
+    assert cpu.trace_jit.instructions_traced > 2900
+    reference = _mul_cpu(program)
+    reference.run(3000)
+    assert cpu.architectural_state() == reference.architectural_state()
+
+
+def test_memory_writing_xop_is_left_to_interpreter() -> None:
+    # MOVE RB 0x40, ADD RA 1, SCATTER RA (RB), JUMPU 1
+    cpu = simulators.CPU1d([0x0440, 0x1001, 0xF10E, 0x8001])
+    cpu.register_xop(4, _DEFINITIONS[4])
+    cpu.jit = True
+
+    cpu.run(3000)
+
+    assert cpu.trace_jit.instructions_traced == 0
+    assert cpu.memory.get(0x40) == cpu.registers.get(0) == Int16(1000)
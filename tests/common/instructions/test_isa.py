@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from cpusim.backend import simulators
+from cpusim.common.instructions import base
+from cpusim.common.instructions import isa
+from cpusim.common.types import Int16
+
+
+def _reference_decode_1a(word: int) -> tuple[int, tuple[int, ...]]:
+    opcode, arg = word >> 12, word & 0xFF
+    mode = next(spec.mode for spec in isa.ISA_1A if spec.opcode == opcode)
+    return opcode, (0, arg) if mode is base.AddressingMode.IMMEDIATE else (arg,)
+
+
+def _reference_decode_1d(word: int) -> tuple[tuple[int, int], tuple[int, ...]]:
+    primary, secondary = word >> 12, word & 0xF if word >> 12 == 0xF else -1
+    mode = next(spec.mode for spec in isa.ISA_1D if (spec.opcode, spec.secondary) == (primary, secondary))
+    if mode in (base.AddressingMode.REGISTER, base.AddressingMode.REGISTER_INDIRECT):
+        return (primary, secondary), ((word >> 10) & 3, (word >> 8) & 3)
+    if mode is base.AddressingMode.IMMEDIATE:
+        return (primary, secondary), ((word >> 10) & 3, word & 0xFF)
+    return (primary, secondary), (word & 0xFFF,)
+
+
+@pytest.mark.parametrize("arch", ["1a", "1d"])
+def test_specs_agree_with_instruction_classes(arch: str) -> None:
+    for spec in isa.ISA_1A if arch == "1a" else isa.ISA_1D:
+        assert spec.kind.addressing_mode is spec.mode
+        assert spec.kind.incr_pc is spec.incr_pc
+        assert isa.spec_for(spec.kind) is spec
+
+
+def test_decoders_match_bit_layouts() -> None:
+    cpu_1a, cpu_1d = simulators.CPU1a(), simulators.CPU1d()
+    for word in range(0x10000):
+        if word >> 12 <= 0xA:
+            instruction, args = cpu_1a.decode_word(word)
+            opcode, expected = _reference_decode_1a(word)
+            assert (type(instruction), args) == (type(cpu_1a.INSTRUCTION_SET[opcode]), expected)
+        else:
+            with pytest.raises(NotImplementedError):
+                cpu_1a.decode_word(word)
+
+        instruction, args = cpu_1d.decode_word(word)
+        key, expected = _reference_decode_1d(word)
+        assert (type(instruction), args) == (type(cpu_1d.INSTRUCTION_SET[key]), expected)
+
+
+@pytest.mark.parametrize("arch", ["1a", "1d"])
+def test_disassembly_matches_instruction_classes(arch: str) -> None:
+    cpu = simulators.CPU1a() if arch == "1a" else simulators.CPU1d()
+    for word in range(0, 0x10000, 7):
+        try:
+            instruction, args = cpu.decode_word(word)
+        except NotImplementedError:
+            continue
+        assert cpu.disassemble(word) == instruction.repr(args)
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("arch", ["1a", "1d"])
+def test_generated_executors_match_instruction_classes(arch: str, seed: int) -> None:
+    rng = random.Random(seed)
+    for spec in isa.ISA_1A if arch == "1a" else isa.ISA_1D:
+        if not spec.implemented:
+            continue
+
+        word = (spec.opcode << 12) | rng.randrange(0x1000)
+        if spec.secondary >= 0:
+            word = (word & 0xFFF0) | spec.secondary
+        states = []
+        for generated in (False, True):
+            rng_state = random.Random(seed)
+            cpu = simulators.CPU1a() if arch == "1a" else simulators.CPU1d()
+            for address in range(cpu.memory.size):
+                cpu.memory.set(address, Int16(rng_state.randrange(0x10000)))
+            if isinstance(cpu, simulators.CPU1a):
+                cpu.acc.set(rng_state.randrange(0x100))
+            else:
+                # indirect addresses have to stay inside memory
+                limit = cpu.memory.size if spec.mode is base.AddressingMode.REGISTER_INDIRECT else 0x10000
+                for register in range(4):
+                    cpu.registers.set(register, Int16(rng_state.randrange(limit)))
+            cpu.alu.zero, cpu.alu.carry = rng_state.random() < 0.5, rng_state.random() < 0.5
+
+            instruction, args = cpu.decode_word(word)
+            if generated:
+                isa.build_executor(spec, arch == "1d")(args, cpu)
+            else:
+                instruction.execute(args, cpu)
+            states.append((cpu.architectural_state(), [cpu.memory.get(a) for a in range(cpu.memory.size)]))
+
+        assert states[0] == states[1], spec.kind.__name__
+
+
+def test_unimplemented_instructions_trap() -> None:
+    spec = isa.spec_for(isa.ISA_1D[-1].kind)
+    assert spec is not None
+    assert not spec.implemented
+
+    with pytest.raises(NotImplementedError):
+        isa.build_executor(spec, True)((0, 0), simulators.CPU1d())
@@ -64,7 +64,7 @@ def test_jumpu(cpu: simulators.CPU1a) -> None:
 def test_jumpz(cpu: simulators.CPU1a) -> None:
     cpu.alu.zero = False
     primary.JumpZ().execute((25,), cpu)
-    assert cpu.pc.value == 0
+    assert cpu.pc.value == 1
 
     cpu.pc.set(0)
 
@@ -82,4 +82,4 @@ def test_jumpnz(cpu: simulators.CPU1a) -> None:
 
     cpu.alu.zero = True
     primary.JumpNZ().execute((25,), cpu)
-    assert cpu.pc.value == 0
+    assert cpu.pc.value == 1
@@ -68,7 +68,7 @@ def test_jumpu(cpu: simulators.CPU1d) -> None:
 def test_jumpz(cpu: simulators.CPU1d) -> None:
     cpu.alu.zero = False
     primary.JumpZ().execute((25,), cpu)
-    assert cpu.pc.value == 0
+    assert cpu.pc.value == 1
 
     cpu.pc.set(0)
 
@@ -86,13 +86,13 @@ def test_jumpnz(cpu: simulators.CPU1d) -> None:
 
     cpu.alu.zero = True
     primary.JumpNZ().execute((25,), cpu)
-    assert cpu.pc.value == 0
+    assert cpu.pc.value == 1
 
 
 def test_jumpc(cpu: simulators.CPU1d) -> None:
     cpu.alu.carry = False
     primary.JumpC().execute((25,), cpu)
-    assert cpu.pc.value == 0
+    assert cpu.pc.value == 1
 
     cpu.pc.set(0)
 
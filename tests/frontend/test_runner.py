@@ -0,0 +1,182 @@
+from cpusim.backend import accesses
+from cpusim.backend import branches
+from cpusim.backend import cache
+from cpusim.backend import pipeline
+from cpusim.backend import simulators
+from cpusim.backend import timing
+from cpusim.frontend.cli.interactive import runner
+
+
+def test_info_memory_range() -> None:
+    cpu = simulators.CPU1a([0x1001, 0x2002, 0x3003, 0x1004])
+    debugger = runner.CPU1aInteractiveDebugger(cpu)
+
+    lines = debugger.execute_command("info memory 1 2")
+    assert lines is not None
+    assert [line.split(" | ")[0].strip() for line in lines.splitlines()] == ["Addr", "0x1", "0x2"]
+
+
+def test_info_memory_start_shows_single_page() -> None:
+    cpu = simulators.CPU1a([0x1001] * 256)
+    debugger = runner.CPU1aInteractiveDebugger(cpu)
+
+    lines = debugger.info_memory(0x10).splitlines()
+    assert len(lines) == 1 + 256 - 0x10
+    assert lines[1].startswith("0x10 ")
+    assert lines[-1].startswith("0xff ")
+
+
+def test_run_can_be_interrupted_and_resumed() -> None:
+    # MOVE RA 0, ADD RA 1 * 3000, JUMPU 3001
+    program = [0x0000, *([0x1001] * 3000), 0x8BB9]
+    debugger = runner.CPU1dInteractiveDebugger(simulators.CPU1d(program))
+    debugger.interrupt_check_interval = 100
+    debugger.progress_interval = 0
+    debugger.progress_fn = lambda *_: debugger.interrupt()
+
+    result = debugger.run()
+    assert result == runner.RunResult(runner.StopReason.INTERRUPTED, 100)
+    assert debugger.register_values()["pc"] == 100
+
+    debugger.progress_fn = None
+    result = debugger.run()
+    assert result == runner.RunResult(runner.StopReason.HALTED, 2902)
+    assert debugger.register_values()["ra"] == 3000
+
+
+def test_run_stops_at_step_limit() -> None:
+    debugger = runner.CPU1aInteractiveDebugger(simulators.CPU1a([0x1001] * 100))
+
+    assert debugger.run(10) == runner.RunResult(runner.StopReason.STEP_LIMIT, 10)
+
+
+def test_line_breakpoint_stops_traced_loop() -> None:
+    # MOVE RA 0, ADD RA 1, SUB RB 1, JUMPNZ 1, JUMPU 4 - break on the SUB once the loop is hot
+    cpu = simulators.CPU1d([0x0000, 0x1001, 0x2401, 0xA001, 0x8004])
+    cpu.jit = True
+    debugger = runner.CPU1dInteractiveDebugger(cpu)
+    debugger.run(500)
+
+    debugger.execute_command("breakpoint create --line 2")
+    result = debugger.run(1000)
+
+    assert result == runner.RunResult(runner.StopReason.BREAKPOINT, 3, 0)
+    assert debugger.register_values()["pc"] == 2
+    assert debugger.register_values()["ra"] == 168
+    assert cpu.breakpoints == set()
+
+
+def test_info_cycles() -> None:
+    cpu = simulators.CPU1a([0x1001, 0x4020, 0x8002])
+    debugger = runner.CPU1aInteractiveDebugger(cpu)
+    assert debugger.execute_command("info cycles") == (
+        "Timing model not enabled - run with --timing to count clock cycles."
+    )
+
+    cpu.timing = timing.CycleCosts()
+    debugger.run(3)
+
+    lines = debugger.execute_command("info cycles")
+    assert lines is not None
+    assert [line.split()[-1] for line in lines.splitlines()[1:]] == ["3", "10", "3.33"]
+    assert debugger.execute_command("assert cycles == 10") == "Assertion passed: cycles == 10"
+
+
+def test_info_pipeline() -> None:
+    # MOVE RA 1, ADD RB RA, JUMPU 2
+    cpu = simulators.CPU1d([0x0001, 0xF406, 0x8002])
+    debugger = runner.CPU1dInteractiveDebugger(cpu)
+    assert debugger.execute_command("info pipeline") == (
+        "Pipeline model not enabled - run with --pipeline to estimate pipeline stalls."
+    )
+
+    cpu.pipeline = pipeline.PipelineModel(cpu)
+    debugger.run(3)
+
+    lines = debugger.execute_command("info pipeline")
+    assert lines is not None
+    summary, addresses = lines.split("\n\n")
+    assert [line.split()[-1] for line in summary.splitlines()[1:]] == ["3", "7", "2.33", "1", "2"]
+    rows = [[cell.strip() for cell in line.split(" | ")[:3]] for line in addresses.splitlines()[1:]]
+    assert rows == [["0x1", "1", "0"], ["0x2", "0", "2"]]
+
+
+def test_info_cache() -> None:
+    # MOVE RB 0x40, LOAD RA (RB), LOAD RC (RB), JUMPU 3
+    cpu = simulators.CPU1d([0x0440, 0xF102, 0xF902, 0x8003])
+    debugger = runner.CPU1dInteractiveDebugger(cpu)
+    assert debugger.execute_command("info cache") == (
+        "Cache simulation not enabled - run with --icache or --dcache to simulate caches."
+    )
+
+    cpu.cache = cache.CacheSimulator(cpu, data=cache.CacheConfig(16))
+    debugger.run(4)
+
+    lines = debugger.execute_command("info cache")
+    assert lines is not None
+    caches, regions, instructions = lines.split("\n\n")
+    assert [cell.strip() for cell in caches.splitlines()[1].split(" | ")] == [
+        "data",
+        "16",
+        "4",
+        "1",
+        "lru",
+        "1",
+        "1",
+        "50.0%",
+    ]
+    assert regions.splitlines()[1].split(" | ")[1].strip() == "0x0-0xff"
+    rows = [[cell.strip() for cell in line.split(" | ")[:4]] for line in instructions.splitlines()[1:]]
+    assert rows == [["0x1", "0", "0", "1"], ["0x2", "0", "1", "0"]]
+
+
+def test_info_branches() -> None:
+    # MOVE RB 4, SUB RB 1, JUMPNZ 1, JUMPU 3
+    cpu = simulators.CPU1d([0x0404, 0x2401, 0xA001, 0x8003])
+    debugger = runner.CPU1dInteractiveDebugger(cpu)
+    assert debugger.execute_command("info branches") == (
+        "Branch statistics not enabled - run with --branch-stats to profile conditional jumps."
+    )
+
+    cpu.branches = branches.BranchProfiler(cpu)
+    debugger.run(100)
+
+    lines = debugger.execute_command("info branches")
+    assert lines is not None
+    rows = [[cell.strip() for cell in line.split(" | ")] for line in lines.splitlines()]
+    assert rows == [
+        ["Addr", "Taken", "Not taken", "Static", "1-bit", "2-bit", "gshare", "Disassembled"],
+        ["0x2", "3", "1", "75.0%", "50.0%", "50.0%", "25.0%", "jumpnz 0x1"],
+        ["Total", "3", "1", "75.0%", "50.0%", "50.0%", "25.0%", ""],
+    ]
+
+
+def test_info_accesses() -> None:
+    # MOVE RB 0x40, MOVE RD 3, LOAD RA (RB), STORE RA (RB), ADD RB 1, SUB RD 1, JUMPNZ 2, JUMPU 7
+    cpu = simulators.CPU1d([0x0440, 0x0C03, 0xF102, 0xF103, 0x1401, 0x2C01, 0xA002, 0x8007])
+    debugger = runner.CPU1dInteractiveDebugger(cpu)
+    assert debugger.execute_command("info accesses") == (
+        "Memory access profiling not enabled - run with --profile-accesses to count data accesses."
+    )
+
+    cpu.access_profiler = accesses.AccessProfiler(cpu)
+    assert debugger.execute_command("info accesses") == "No data memory accesses have been made."
+    debugger.run(100)
+
+    out = debugger.execute_command("info accesses")
+    assert out is not None
+    heat, histogram, streams = (
+        [[cell.strip() for cell in line.split(" | ")] for line in section.splitlines()] for section in out.split("\n\n")
+    )
+    assert heat == [
+        ["Addr", "Reads", "Writes", "Hex"],
+        ["0x40", "1", "1", "0x0"],
+        ["0x41", "1", "1", "0x0"],
+        ["0x42", "1", "1", "0x0"],
+    ]
+    assert histogram == [["Region", "Reads", "Writes", ""], ["0x40-0x4f", "3", "3", "#" * runner.HISTOGRAM_WIDTH]]
+    assert streams == [
+        ["Addr", "Accesses", "Pattern", "Stride", "Coverage", "Disassembled"],
+        ["0x2", "3", "sequential", "1", "100.0%", "load RA (RB)"],
+        ["0x3", "3", "sequential", "1", "100.0%", "store RA (RB)"],
+    ]
@@ -0,0 +1,62 @@
+import pytest
+
+from cpusim.backend import simulators
+from cpusim.frontend.cli.interactive import runner
+from cpusim.frontend.cli.interactive import script
+
+PROGRAM = [0x0003, 0x1004, 0x8002]  # MOVE RA 3, ADD RA 4, JUMPU 2
+
+
+@pytest.fixture
+def debugger() -> runner.CPU1dInteractiveDebugger:
+    return runner.CPU1dInteractiveDebugger(simulators.CPU1d(PROGRAM))
+
+
+def test_parse_script_skips_blank_lines_and_comments(debugger: runner.CPU1dInteractiveDebugger) -> None:
+    commands = script.parse_script("# comment\n\nstep 2\ncontinue\n", debugger)
+
+    assert [(c.lineno, c.arguments.command) for c in commands] == [(3, "step"), (4, "continue")]
+
+
+def test_parse_script_reports_bad_line(debugger: runner.CPU1dInteractiveDebugger) -> None:
+    with pytest.raises(script.ScriptError, match="line 2"):
+        script.parse_script("step\nnotacommand\n", debugger)
+
+
+def test_run_script_passes(debugger: runner.CPU1dInteractiveDebugger) -> None:
+    commands = script.parse_script("breakpoint create --line 2\ncontinue\nassert ra == 7\n", debugger)
+
+    passed, out = script.run_script(debugger, commands)
+    assert passed
+    assert "Triggered breakpoint ID 0" in out
+    assert "Assertion passed: ra == 7" in out
+
+
+def test_run_script_fails_on_failed_assertion(debugger: runner.CPU1dInteractiveDebugger) -> None:
+    commands = script.parse_script("continue\nassert ra == 3\nassert ra == 7\n", debugger)
+
+    passed, out = script.run_script(debugger, commands)
+    assert not passed
+    assert "Assertion failed: ra == 3" in out
+    assert debugger.failed_assertions == 1
+
+
+def test_upper_case_names_are_in_scope(debugger: runner.CPU1dInteractiveDebugger) -> None:
+    commands = script.parse_script("breakpoint create --expr PC == 1\ncontinue\nstep\nassert RA == 7\n", debugger)
+
+    passed, out = script.run_script(debugger, commands)
+    assert passed, out
+    assert "Triggered breakpoint ID 0" in out
+    assert "Assertion passed: RA == 7" in out
+
+
+def test_expressions_keep_their_case(debugger: runner.CPU1dInteractiveDebugger) -> None:
+    commands = script.parse_script(
+        "BREAKPOINT CREATE --expr ra == 7 and True\nContinue\nASSERT ra == 7 and True\nassert not False\n", debugger
+    )
+
+    passed, out = script.run_script(debugger, commands)
+    assert passed, out
+    assert "Triggered breakpoint ID 0" in out
+    assert "Assertion passed: ra == 7 and True" in out
+    assert "Assertion passed: not False" in out